@@ -0,0 +1,69 @@
+"""
+Benchmark the single-pass directory classifier.
+
+Usage:
+    python benchmarks/bench_scan.py [--sizes 10000 100000 1000000] [--on-disk]
+
+Every media file gets a description and a thumbnail, plus one unrelated
+file, i.e. a directory of N media files has 4N entries. The time per entry
+should stay flat as N grows, since the classifier is linear.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from lbry_batch_uploader.scanner import classify_entries
+
+
+def synthetic_names(n_media: int):
+    """Yield the names of a synthetic directory with 'n_media' media files."""
+    for i in range(n_media):
+        yield f"episode {i:07d}.mp4"
+        yield f"episode {i:07d}.txt"
+        yield f"episode {i:07d}.JPG"
+        yield f"notes {i:07d}.md"
+
+
+def bench_in_memory(n_media: int) -> None:
+    """Time the classifier alone over a list of names."""
+    names = list(synthetic_names(n_media))
+    start = time.perf_counter()
+    files_valid = classify_entries(names)
+    elapsed = time.perf_counter() - start
+    assert len(files_valid) == n_media
+    per_entry = elapsed / len(names) * 1e9
+    print(
+        f"in-memory {len(names):>9} entries {elapsed:8.3f} s {per_entry:7.1f} ns/entry"
+    )
+
+
+def bench_on_disk(n_media: int) -> None:
+    """Time os.scandir plus the classifier over a real directory."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in synthetic_names(n_media):
+            open(os.path.join(tmp_dir, name), "w").close()
+
+        start = time.perf_counter()
+        with os.scandir(tmp_dir) as entries:
+            files_valid = classify_entries(e.name for e in entries if e.is_file())
+        elapsed = time.perf_counter() - start
+        assert len(files_valid) == n_media
+        per_entry = elapsed / (4 * n_media) * 1e9
+        print(
+            f"on-disk   {4 * n_media:>9} entries {elapsed:8.3f} s {per_entry:7.1f} ns/entry"
+        )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    argparser.add_argument(
+        "--sizes", nargs="+", type=int, default=[2500, 25000, 250000]
+    )
+    argparser.add_argument("--on-disk", action="store_true")
+    args = argparser.parse_args()
+
+    for n_media in args.sizes:
+        bench_in_memory(n_media)
+        if args.on_disk:
+            bench_on_disk(n_media)
@@ -0,0 +1,85 @@
+"""
+Benchmark the startup of the command line, i.e. --help and argument errors.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--top 10] [--target-ms 100]
+
+Every case runs in a fresh interpreter under -X importtime. The import time
+of the package is the cumulative time of its top-level imports, and the
+wall time includes the interpreter itself, which is reported separately
+as the baseline of an empty script. The slowest imports of the last run are
+listed, to see what to load lazily next.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+CASES = {
+    "--help": ["--help"],
+    "argument error": ["path/to/dir", "@channel", "--languages", "xx"],
+}
+
+
+def run(cmd_args: List[str]) -> Tuple[float, List[Tuple[int, str]]]:
+    """Run the command line once, return the wall time in ms and the imports."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + cmd_args,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            imports.append((int(cumulative), name.rstrip()))
+    return elapsed, imports
+
+
+def package_ms(imports: List[Tuple[int, str]]) -> float:
+    """Return the cumulative import time of the package in ms."""
+    return (
+        sum(us for us, name in imports if name.startswith(" lbry_batch_uploader"))
+        / 1000
+    )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    argparser.add_argument("--runs", type=int, default=10)
+    argparser.add_argument("--top", type=int, default=10)
+    argparser.add_argument("--target-ms", type=float, default=100.0)
+    args = argparser.parse_args()
+
+    baseline = statistics.median(run(["-c", "pass"])[0] for _ in range(args.runs))
+    print(f"{'empty script':<16} wall {baseline:7.1f} ms")
+
+    exceeded = False
+    for case, case_args in CASES.items():
+        walls, imports_ms = [], []
+        for _ in range(args.runs):
+            wall, imports = run(["-m", "lbry_batch_uploader"] + case_args)
+            walls.append(wall)
+            imports_ms.append(package_ms(imports))
+        wall = statistics.median(walls)
+        import_ms = statistics.median(imports_ms)
+        exceeded |= wall > args.target_ms
+        print(
+            f"{case:<16} wall {wall:7.1f} ms "
+            + f"({wall - baseline:+7.1f} ms over the empty script), "
+            + f"package imports {import_ms:6.1f} ms"
+        )
+        for us, name in sorted(imports, reverse=True)[: args.top]:
+            print(f"    {us / 1000:7.1f} ms {name.strip()}")
+
+    status = "over" if exceeded else "within"
+    print(f"\n{status} the target of {args.target_ms:g} ms")
+    sys.exit(1 if exceeded else 0)
@@ -0,0 +1,209 @@
+"""
+Benchmark the uploader end to end against fake lbrynet and spee.ch servers.
+
+Usage:
+    python benchmarks/bench_upload.py [--sizes 1000 10000 100000] [--workers 8]
+        [--async] [--latency 0.005] [--error-rate 0.01] [--thumbnail-ratio 0.1]
+        [--output results.json] [--compare baseline.json]
+
+Every size runs in a fresh process over a synthetic directory of empty
+media files, a fraction of which have a thumbnail, so that the peak RSS is
+that of a single run. The servers run in the parent process, and answer
+after 'latency' seconds on average, i.e. the numbers measure the uploader,
+not lbrynet. The results are written as json together with the version,
+so that two versions are compared with --compare.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional
+from fake_lbry import FakeDaemonHandler, FakeServer, FakeSpeechHandler
+
+
+def make_directory(path: str, n_files: int, thumbnail_ratio: float) -> None:
+    """Write 'n_files' empty media files, every 1 / ratio of them with a thumbnail."""
+    every = round(1 / thumbnail_ratio) if thumbnail_ratio > 0 else 0
+    for i in range(n_files):
+        open(os.path.join(path, f"episode {i:07d}.mp4"), "w").close()
+        if every and i % every == 0:
+            with open(os.path.join(path, f"episode {i:07d}.jpg"), "wb") as f:
+                f.write(i.to_bytes(4, "big") * 256)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile of the values, by nearest rank."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[idx]
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MiB."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def run_once(cmd_args: List[str], state_dir: str) -> dict:
+    """Upload a directory in this process, return the throughput and latencies."""
+    from lbry_batch_uploader.parser import Parser
+    from lbry_batch_uploader.uploader import Uploader
+
+    parser = Parser()
+    parser.parse(cmd_args)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        uploader = Uploader(parser.args)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        elapsed = time.perf_counter() - start
+
+    with open(os.path.join(state_dir, "journal.jsonl"), encoding="utf-8") as f:
+        latencies = [json.loads(line)["elapsed"] for line in f]
+    n_files = uploader._n_pending
+    return {
+        "files": n_files,
+        "uploaded": len(uploader.claim_ids),
+        "failed": len(uploader.failures),
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(n_files / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def bench(n_files: int, args: argparse.Namespace) -> dict:
+    """Time a single run over a fresh directory, with fresh servers."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_dir = os.path.join(tmp_dir, "files")
+        state_dir = os.path.join(tmp_dir, "state")
+        os.makedirs(file_dir)
+        make_directory(file_dir, n_files, args.thumbnail_ratio)
+
+        daemon = FakeServer(FakeDaemonHandler, args.latency, args.error_rate)
+        speech = FakeServer(FakeSpeechHandler, args.latency, args.error_rate)
+        with daemon, speech:
+            cmd_args = [
+                file_dir,
+                "@benchmark",
+                "--port",
+                str(daemon.port),
+                "--speech-url",
+                f"http://127.0.0.1:{speech.port}/api/claim/publish",
+                "--state-dir",
+                state_dir,
+                "--workers",
+                str(args.workers),
+                # Measure the uploader, not the pacing
+                "--rate",
+                "1000000",
+                "--burst",
+                str(args.workers),
+                "--retry-delay",
+                "0.01",
+                # Every run probes its own fresh daemon
+                "--capability-ttl",
+                "0",
+            ]
+            if args.use_async:
+                cmd_args.append("--async")
+
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(run_once, cmd_args, state_dir).result()
+
+        result["daemon"] = daemon.stats
+        result["speech"] = speech.stats
+    return result
+
+
+def get_version() -> str:
+    """Return the version of the package, and the git commit if any."""
+    try:
+        from importlib.metadata import version
+
+        pkg_version = version("lbry_batch_uploader")
+    except Exception:
+        pkg_version = "unknown"
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return f"{pkg_version}+{commit}" if commit else pkg_version
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    """Print the relative change of every size also in the baseline."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {str(r["files"]): r for r in baseline["results"]}
+    print(f"\ncompared to {baseline['version']}")
+    for result in results["results"]:
+        old: Optional[dict] = before.get(str(result["files"]))
+        if old is None:
+            continue
+        changes = []
+        for key in ("files_per_sec", "p50_ms", "p99_ms", "peak_rss_mb"):
+            change = (result[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            changes.append(f"{key} {change:+6.1f}%")
+        print(f"{result['files']:>7} files  " + "  ".join(changes))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    argparser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1000, 10000, 100000]
+    )
+    argparser.add_argument("--workers", type=int, default=8)
+    argparser.add_argument("--async", dest="use_async", action="store_true")
+    argparser.add_argument("--latency", type=float, default=0.005)
+    argparser.add_argument("--error-rate", type=float, default=0.0)
+    argparser.add_argument("--thumbnail-ratio", type=float, default=0.1)
+    argparser.add_argument("--output", type=str)
+    argparser.add_argument("--compare", type=str)
+    args = argparser.parse_args()
+
+    results = {
+        "version": get_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            k: v for k, v in vars(args).items() if k not in ("output", "compare")
+        },
+        "results": [],
+    }
+    for n_files in args.sizes:
+        result = bench(n_files, args)
+        results["results"].append(result)
+        print(
+            f"{n_files:>7} files {result['seconds']:8.2f} s "
+            + f"{result['files_per_sec']:8.1f} files/s "
+            + f"p50 {result['p50_ms']:7.1f} ms p99 {result['p99_ms']:7.1f} ms "
+            + f"rss {result['peak_rss_mb']:6.1f} MiB "
+            + f"failed {result['failed']}"
+        )
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.compare is not None:
+        compare(results, args.compare)
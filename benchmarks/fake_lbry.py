@@ -0,0 +1,155 @@
+"""
+Local stand-ins for the lbrynet JSON-RPC API and the spee.ch publish endpoint.
+
+Both servers answer like the real ones as far as the uploader is concerned,
+after a configurable latency, and fail a configurable fraction of requests
+with 503, which the uploader retries. Neither touches the published files.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Type
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Base class for the request handlers, with latency and errors."""
+
+    # http/1.1, so that the clients keep their connections alive
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    error_rate = 0.0
+    rng = random.Random(0)
+    lock = threading.Lock()
+    n_requests = 0
+    n_errors = 0
+
+    def do_POST(self) -> None:
+        """Answer a post request, after the latency, unless it fails."""
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            type(self).n_requests += 1
+            jitter = self.rng.uniform(0.5, 1.5)
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                type(self).n_errors += 1
+        if self.latency:
+            time.sleep(self.latency * jitter)
+        if failed:
+            self._reply(503, {"error": "Service Unavailable"})
+            return
+        self._reply(200, self.answer(body))
+
+    def answer(self, body: bytes) -> dict:
+        """Return the json response to a request body."""
+        raise NotImplementedError
+
+    def log_message(self, *args) -> None:
+        """Do not log every request to stderr."""
+
+    def _reply(self, status: int, payload: dict) -> None:
+        """Send a json response with a Content-Length."""
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeDaemonHandler(FakeHandler):
+    """Handler for the lbrynet methods called by the uploader."""
+
+    def answer(self, body: bytes) -> dict:
+        """Return the json response to a JSON-RPC request."""
+        request = json.loads(body)
+        method = request.get("method")
+        params = request.get("params") or {}
+        if method == "version":
+            return {"result": {"version": "0.113.0"}}
+        if method == "ffmpeg_find":
+            return {"result": {"available": True}}
+        if method == "publish":
+            claim_id = hashlib.sha1(params["name"].encode()).hexdigest()
+            txid = hashlib.sha256(params["file_path"].encode()).hexdigest()
+            return {"result": {"outputs": [{"claim_id": claim_id}], "txid": txid}}
+        if method == "resolve":
+            urls = params.get("urls") or []
+            not_found = {"error": {"name": "NOT_FOUND"}}
+            return {"result": {url: not_found for url in urls}}
+        if method == "txo_list":
+            # A publish failed on purpose never went through, nothing to find
+            txids = params.get("txid") or []
+            items = [{"txid": txid, "confirmations": 1} for txid in txids]
+            return {"result": {"items": items}}
+
+        message = f"Invalid method requested: {method}."
+        return {"error": {"data": {"name": "Exception"}, "message": message}}
+
+
+class FakeSpeechHandler(FakeHandler):
+    """Handler for the spee.ch publish endpoint."""
+
+    def answer(self, body: bytes) -> dict:
+        """Return the url of the uploaded thumbnail."""
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        return {"success": True, "data": {"serveUrl": f"https://spee.ch/{digest}.jpg"}}
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    """Threaded server that takes many connections at once."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class FakeServer:
+    """Class for running a fake server on a background thread."""
+
+    def __init__(
+        self,
+        handler: Type[FakeHandler],
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = 0,
+    ) -> None:
+        """Initialize the server, answering after 'latency' seconds on average."""
+        # A subclass per server, so that two servers never share their counts
+        self.handler = type(
+            handler.__name__,
+            (handler,),
+            {
+                "latency": latency,
+                "error_rate": error_rate,
+                "rng": random.Random(seed),
+                "lock": threading.Lock(),
+                "n_requests": 0,
+                "n_errors": 0,
+            },
+        )
+        self.httpd = _HTTPServer(("127.0.0.1", 0), self.handler)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        """Return the port the server listens to."""
+        return int(self.httpd.server_address[1])
+
+    @property
+    def stats(self) -> dict:
+        """Return the number of requests served and failed on purpose."""
+        return {"requests": self.handler.n_requests, "errors": self.handler.n_errors}
+
+    def __enter__(self) -> "FakeServer":
+        """Start serving in the background."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread.join()
@@ -1,11 +1,16 @@
 import sys
 from lbry_batch_uploader.parser import Parser
-from lbry_batch_uploader.uploader import Uploader
-
 
 parser = Parser()
 parser.parse(sys.argv[1:])
 
+# Imported once the arguments are valid, so that --help and argument errors
+# do not wait for requests and asyncio to load
+from lbry_batch_uploader.uploader import Uploader  # noqa: E402
+
 uploader = Uploader(parser.args)
-uploader.get_all_files()
-uploader.upload_all_files()
+with uploader.profiler:
+    with uploader.profiler.phase("get_all_files"):
+        uploader.get_all_files()
+    with uploader.profiler.phase("upload_all_files"):
+        uploader.upload_all_files()
@@ -0,0 +1,212 @@
+import asyncio
+import json as jsonlib
+import ssl
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+from lbry_batch_uploader.client import check_timeout
+from lbry_batch_uploader.multipart import MultipartEncoder
+from lbry_batch_uploader.retry import TRANSIENT_STATUS_CODES
+from lbry_batch_uploader.utils import ConnectFailedError, TransientError
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+_HostKey = Tuple[str, str, int]
+
+
+class AsyncHttpClient:
+    """
+    Class for a minimal asyncio http/1.1 client with keep-alive.
+
+    It only implements what the Uploader needs, i.e. json and multipart post
+    requests with json responses, so that hundreds of requests could be in
+    flight on a single event loop without one thread per request. As with
+    HttpClient, 'timeout' is the (connect, read) timeouts in seconds, the read
+    timeout applies to sending the request and to reading its response.
+    """
+
+    def __init__(
+        self, pool_size: int = 100, timeout: Tuple[float, float] = (10.0, 300.0)
+    ) -> None:
+        """Initialize the client with at most 'pool_size' connections per host."""
+        if pool_size < 1:
+            err_msg = f"The pool size {pool_size} is not a positive integer."
+            raise ValueError(err_msg)
+        check_timeout(timeout)
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: Dict[_HostKey, List[_Connection]] = {}
+        self._slots: Dict[_HostKey, asyncio.Semaphore] = {}
+        self._ssl_context: Optional[ssl.SSLContext] = None
+
+    async def post(
+        self,
+        url: str,
+        json: Optional[dict] = None,
+        data: Optional[MultipartEncoder] = None,
+    ) -> dict:
+        """Submit a post request through the pool, return json response."""
+        body: Union[bytes, MultipartEncoder]
+        if data is not None:
+            # Streamed from disk while sending
+            body = data
+            content_type = data.content_type
+        else:
+            body = jsonlib.dumps(json).encode()
+            content_type = "application/json"
+
+        url_parts = urlsplit(url)
+        scheme = url_parts.scheme
+        host = url_parts.hostname or "localhost"
+        port = url_parts.port or (443 if scheme == "https" else 80)
+        path = url_parts.path or "/"
+        if url_parts.query:
+            path += f"?{url_parts.query}"
+
+        head = (
+            f"POST {path} HTTP/1.1\r\n"
+            + f"Host: {url_parts.netloc}\r\n"
+            + f"Content-Type: {content_type}\r\n"
+            + f"Content-Length: {len(body)}\r\n"
+            + "Accept: application/json\r\n"
+            + "Connection: keep-alive\r\n\r\n"
+        )
+        key = (scheme, host, port)
+        slot = self._slots.setdefault(key, asyncio.Semaphore(self.pool_size))
+        async with slot:
+            status, resp_body = await self._send(key, head.encode(), body)
+        if status in TRANSIENT_STATUS_CODES:
+            raise TransientError(f"HTTP {status} from {url}")
+        return dict(jsonlib.loads(resp_body))
+
+    async def close(self) -> None:
+        """Close all idle connections."""
+        for conns in self._idle.values():
+            for _, writer in conns:
+                writer.close()
+        self._idle.clear()
+
+    async def _send(
+        self, key: _HostKey, head: bytes, body: Union[bytes, MultipartEncoder]
+    ) -> Tuple[int, bytes]:
+        """Send a raw request, return the status code and body of the response."""
+        idle = self._idle.setdefault(key, [])
+        conn: Optional[_Connection] = None
+        while idle and conn is None:
+            conn = idle.pop()
+            if conn[0].at_eof():
+                # Closed by the server while idle
+                conn[1].close()
+                conn = None
+        reused = conn is not None
+        if conn is None:
+            conn = await self._connect(key)
+
+        read_timeout = self.timeout[1]
+        try:
+            await asyncio.wait_for(_write_body(conn[1], head, body), read_timeout)
+        except asyncio.TimeoutError:
+            conn[1].close()
+            raise ConnectionError(f"Sending to {key[1]}:{key[2]} timed out")
+        except OSError as e:
+            conn[1].close()
+            if reused:
+                # A stale connection, the request could not have been handled
+                return await self._send(key, head, body)
+            raise ConnectionError(f"Connection to {key[1]}:{key[2]} failed: {e}")
+        try:
+            status, resp_body, keep_alive = await asyncio.wait_for(
+                _read_response(conn[0]), read_timeout
+            )
+        except asyncio.TimeoutError:
+            conn[1].close()
+            raise asyncio.TimeoutError(f"Reading from {key[1]}:{key[2]} timed out")
+        except (OSError, asyncio.IncompleteReadError) as e:
+            conn[1].close()
+            # Sent, so it might have been handled, e.g. a publish must not be
+            # sent again before checking whether it went through
+            raise ConnectionError(f"Connection to {key[1]}:{key[2]} failed: {e}")
+
+        if keep_alive:
+            idle.append(conn)
+        else:
+            conn[1].close()
+        return status, resp_body
+
+    async def _connect(self, key: _HostKey) -> _Connection:
+        """Open a new connection to the host."""
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=ssl_context), self.timeout[0]
+            )
+        except asyncio.TimeoutError:
+            err_msg = f"Connection to {host}:{port} timed out"
+            raise ConnectFailedError(err_msg) from None
+        except OSError as e:
+            raise ConnectFailedError(f"Connection to {host}:{port} failed: {e}")
+
+
+async def _write_body(
+    writer: asyncio.StreamWriter, head: bytes, body: Union[bytes, MultipartEncoder]
+) -> None:
+    """Write the head and body of a request, stream a multipart body in chunks."""
+    if isinstance(body, bytes):
+        writer.write(head + body)
+        await writer.drain()
+        return
+
+    loop = asyncio.get_event_loop()
+    # Start over, in case the body is sent again on a new connection
+    body.seek(0)
+    writer.write(head)
+    while True:
+        chunk = await loop.run_in_executor(None, body.read, body.chunk_size)
+        if not chunk:
+            break
+        writer.write(chunk)
+        # Wait for the chunk to be sent, so that at most one is buffered
+        await writer.drain()
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes, bool]:
+    """Read a http/1.1 response, return its status, body and keep-alive flag."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise asyncio.IncompleteReadError(b"", None)
+    version, status = status_line.split(b" ", 2)[:2]
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    conn_header = headers.get("connection", "").lower()
+    keep_alive = conn_header != "close" and version == b"HTTP/1.1"
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Skip the trailers until the final empty line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+
+    return int(status), body, keep_alive
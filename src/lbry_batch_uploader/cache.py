@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator
+
+
+class JsonStore:
+    """
+    Class for a small persistent dict, saved atomically as a json file.
+
+    The whole dict is kept in memory, and 'save' replaces the file through a
+    temporary file, so that a crash never leaves a half-written store behind.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the store, load the file if it exists."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.data: Dict[str, Any] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            # A corrupted store is only a cache, start from scratch
+            self._dirty = True
+
+    def __contains__(self, key: str) -> bool:
+        """Return whether the key is in the store."""
+        return key in self.data
+
+    def __len__(self) -> int:
+        """Return the number of keys in the store."""
+        return len(self.data)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over a snapshot of the keys."""
+        with self._lock:
+            return iter(list(self.data))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get the value of the key, return 'default' if it does not exist."""
+        return self.data.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        """Set the value of the key."""
+        with self._lock:
+            self.data[key] = value
+            self._dirty = True
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        """Remove the key, return its value or 'default'."""
+        with self._lock:
+            if key in self.data:
+                self._dirty = True
+            return self.data.pop(key, default)
+
+    def save(self) -> None:
+        """Write the store to disk if it has been changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
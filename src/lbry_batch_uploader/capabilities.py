@@ -0,0 +1,112 @@
+import os
+import socket
+import time
+from typing import Optional
+from lbry_batch_uploader.cache import JsonStore
+
+# How long the answers of lbrynet are trusted, in seconds
+CAPABILITY_TTL = 60 * 60
+# lbrynet runs locally, so a connection is either accepted at once or never
+LIVENESS_TIMEOUT = 2.0
+
+
+def default_cache_path() -> str:
+    """
+    Get the path of the capability cache, which is shared by all runs.
+
+    Returns
+    -------
+    str
+        capabilities.json in the lbry_batch_uploader directory of
+        XDG_CACHE_HOME, or of ~/.cache if XDG_CACHE_HOME is not set.
+
+    """
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "lbry_batch_uploader", "capabilities.json")
+
+
+def check_alive(host: str, port: int, timeout: float = LIVENESS_TIMEOUT) -> None:
+    """
+    Check that lbrynet is listening, without a JSON-RPC round trip.
+
+    Parameters
+    ----------
+    host: str
+        The host of lbrynet
+    port: int
+        The port that lbrynet listens to
+    timeout: float
+        The maximum number of seconds to wait for the connection
+
+    Raises
+    ------
+    ConnectionError
+        If the connection is refused or times out, i.e. lbrynet is down.
+
+    """
+
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            pass
+    except OSError as e:
+        err_msg = f"lbrynet is not listening on {host}:{port}: {e}"
+        raise ConnectionError(err_msg) from None
+
+
+class CapabilityCache(JsonStore):
+    """
+    Class for a persistent cache of what lbrynet answered to the probes.
+
+    The version is keyed by the port, and whether ffmpeg is available by the
+    port and the version the daemon had when probed. A cache hit only checks
+    that the port is listening, which cannot tell a restarted or upgraded
+    daemon from the one probed, so both are trusted for 'ttl' seconds unless
+    'invalidate' forgets the port, e.g. once lbrynet is found down.
+    """
+
+    def __init__(self, path: str, ttl: float = CAPABILITY_TTL) -> None:
+        """Initialize the cache, the answers expire after 'ttl' seconds."""
+        if ttl <= 0:
+            err_msg = f"The capability cache ttl {ttl} is not a positive number."
+            raise ValueError(err_msg)
+
+        super().__init__(path)
+        self.ttl = ttl
+
+    def version(self, port: int) -> Optional[str]:
+        """Return the version of lbrynet on the port, or None if unknown or expired."""
+        cached = self._lookup(str(port))
+        return None if cached is None else str(cached["version"])
+
+    def store_version(self, port: int, version: str) -> None:
+        """Cache the version of lbrynet on the port."""
+        self.set(str(port), {"version": version, "checked": round(time.time(), 3)})
+
+    def ffmpeg(self, port: int, version: str) -> Optional[bool]:
+        """Return whether lbrynet has ffmpeg, or None if unknown or expired."""
+        cached = self._lookup(f"{port}:{version}")
+        return None if cached is None else bool(cached["ffmpeg"])
+
+    def store_ffmpeg(self, port: int, version: str, available: bool) -> None:
+        """Cache whether lbrynet has ffmpeg."""
+        checked = round(time.time(), 3)
+        self.set(f"{port}:{version}", {"ffmpeg": available, "checked": checked})
+
+    def invalidate(self, port: int) -> None:
+        """Forget everything about the port."""
+        for key in self:
+            if key.split(":", 1)[0] == str(port):
+                self.pop(key)
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        """Return an entry, or None if unknown or expired."""
+        cached: Optional[dict] = self.get(key)
+        if cached is None:
+            return None
+        if time.time() - cached["checked"] > self.ttl:
+            self.pop(key)
+            return None
+        return cached
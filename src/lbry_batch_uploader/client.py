@@ -0,0 +1,83 @@
+from typing import Tuple
+import requests
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+from lbry_batch_uploader.multipart import MultipartEncoder
+from lbry_batch_uploader.retry import TRANSIENT_STATUS_CODES
+from lbry_batch_uploader.utils import TransientError
+
+
+class HttpClient:
+    """
+    Class for a connection-pooled http client with keep-alive.
+
+    A single requests.Session is shared by all threads. The connection pools
+    of urllib3 are thread-safe, and 'pool_block' makes a thread wait for a free
+    connection instead of opening (and then discarding) an extra one.
+    Every request times out after 'timeout', the (connect, read) timeouts in
+    seconds, instead of hanging forever on a daemon that never answers.
+    """
+
+    def __init__(
+        self, pool_size: int = 10, timeout: Tuple[float, float] = (10.0, 300.0)
+    ) -> None:
+        """Initialize the client with at most 'pool_size' connections per host."""
+        if pool_size < 1:
+            err_msg = f"The pool size {pool_size} is not a positive integer."
+            raise ValueError(err_msg)
+        check_timeout(timeout)
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, url: str, **kwargs) -> dict:
+        """Submit a post request through the pool, return json response."""
+        data = kwargs.get("data")
+        if isinstance(data, MultipartEncoder):
+            # requests streams any file-like body with a known length
+            kwargs["headers"] = dict(
+                kwargs.get("headers") or {}, **{"Content-Type": data.content_type}
+            )
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            resp = self.session.post(url, **kwargs)
+        except RequestException as e:
+            raise e from None
+        if resp.status_code in TRANSIENT_STATUS_CODES:
+            raise TransientError(f"HTTP {resp.status_code} from {url}")
+
+        try:
+            req_json: dict = resp.json()
+            return req_json
+        except RequestException as e:
+            raise e from None
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+
+def check_timeout(timeout: Tuple[float, float]) -> None:
+    """
+    Check the timeouts of a http client.
+
+    Parameters
+    ----------
+    timeout: Tuple[float, float]
+        The connect and read timeouts in seconds
+
+    Raises
+    ------
+    ValueError
+        If either timeout is not a positive number.
+
+    """
+
+    for name, value in zip(("connect", "read"), timeout):
+        if not value > 0:
+            err_msg = f"The {name} timeout {value} is not a positive number."
+            raise ValueError(err_msg)
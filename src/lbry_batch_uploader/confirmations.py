@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Checks a batch of txids, returns the confirmations of those in the wallet
+CheckFunc = Callable[[List[str]], Dict[str, int]]
+
+
+class ConfirmationTracker:
+    """
+    Class for tracking the confirmations of the publish transactions.
+
+    The transactions are checked on a background thread, 'batch_size' txids
+    per call of 'check'. Every transaction is first checked 'interval'
+    seconds after it has been added, and the wait between two checks of an
+    unconfirmed transaction doubles up to 'max_interval', so that a slow
+    block does not cost more calls. A transaction that is no longer in the
+    wallet has been dropped, i.e. it failed.
+    """
+
+    def __init__(
+        self,
+        check: CheckFunc,
+        batch_size: int = 100,
+        interval: float = 5.0,
+        max_interval: float = 120.0,
+    ) -> None:
+        """Initialize the tracker, the thread is started by 'start'."""
+        if batch_size < 1:
+            err_msg = f"The batch size {batch_size} is not a positive integer."
+            raise ValueError(err_msg)
+        if interval <= 0 or max_interval < interval:
+            err_msg = (
+                f"The intervals {interval} and {max_interval} are not positive "
+                + "and in ascending order."
+            )
+            raise ValueError(err_msg)
+
+        self.check = check
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_interval = max_interval
+        # txid -> file name, for the reports
+        self.confirmed: Dict[str, str] = {}
+        self.failed: Dict[str, str] = {}
+        self.errors = 0
+        # txid -> [file name, current interval, time of the next check]
+        self._pending: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> Dict[str, str]:
+        """Return the file names of the unconfirmed txids."""
+        with self._lock:
+            return {txid: entry[0] for txid, entry in self._pending.items()}
+
+    def start(self) -> None:
+        """Start checking the transactions on a background thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="confirmation-tracker", daemon=True
+        )
+        self._thread.start()
+
+    def add(self, txid: str, file_name: str) -> None:
+        """Track a new transaction, which never blocks the caller."""
+        with self._wakeup:
+            next_check = time.monotonic() + self.interval
+            self._pending[txid] = [file_name, self.interval, next_check]
+            self._wakeup.notify_all()
+
+    def close(self, timeout: float = 0.0) -> None:
+        """Wait at most 'timeout' seconds for the pending txids, then stop."""
+        deadline = time.monotonic() + timeout
+        with self._wakeup:
+            while self._pending and self._thread is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.wait(remaining)
+            self._closed = True
+            self._wakeup.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        """Check the due transactions in batches until closed."""
+        while True:
+            with self._wakeup:
+                due = self._wait_due()
+                if due is None:
+                    return
+
+            for idx in range(0, len(due), self.batch_size):
+                end = idx + self.batch_size
+                batch = due[idx:end]
+                try:
+                    confirmations = self.check(batch)
+                except Exception as e:
+                    # Try again later, as if none of them had been confirmed
+                    self.errors += 1
+                    print(f"Failed to check the transactions\n{e}", end="\n\n")
+                    confirmations = {txid: 0 for txid in batch}
+                self._update(batch, confirmations)
+
+    def _wait_due(self) -> Optional[List[str]]:
+        """Wait for the txids to be checked, None if closed, lock is held."""
+        while not self._closed:
+            now = time.monotonic()
+            next_checks = [entry[2] for entry in self._pending.values()]
+            due = [txid for txid, entry in self._pending.items() if entry[2] <= now]
+            if due:
+                return due
+            self._wakeup.wait(min(next_checks) - now if next_checks else None)
+
+        return None
+
+    def _update(self, batch: List[str], confirmations: Dict[str, int]) -> None:
+        """Record the outcome of a checked batch, back off the pending ones."""
+        with self._wakeup:
+            now = time.monotonic()
+            for txid in batch:
+                entry = self._pending.get(txid)
+                if entry is None:
+                    continue
+                n_confirmations = confirmations.get(txid)
+                if n_confirmations is None:
+                    self.failed[txid] = entry[0]
+                    del self._pending[txid]
+                elif n_confirmations > 0:
+                    self.confirmed[txid] = entry[0]
+                    del self._pending[txid]
+                else:
+                    entry[1] = min(entry[1] * 2, self.max_interval)
+                    entry[2] = now + entry[1]
+            # Wake up 'close', which waits for the pending ones
+            self._wakeup.notify_all()
@@ -0,0 +1,68 @@
+import hashlib
+import os
+from typing import Optional
+from lbry_batch_uploader.cache import JsonStore
+
+HASH_ALGORITHMS = ("sha256", "blake2b")
+
+
+def hash_file(path: str, algorithm: str = "sha256", buffer_size: int = 1 << 20) -> str:
+    """
+    Hash the content of a file in a streaming manner.
+
+    Parameters
+    ----------
+    path: str
+        The path of the file to be hashed
+    algorithm: str
+        Either "sha256" or "blake2b"
+    buffer_size: int
+        The size of the read buffer, which bounds the memory used
+
+    Returns
+    -------
+    str
+        The hex digest of the file content
+
+    """
+
+    if algorithm not in HASH_ALGORITHMS:
+        err_msg = f"The hash algorithm should be one of {HASH_ALGORITHMS}."
+        raise ValueError(err_msg)
+
+    hasher = hashlib.new(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n_read = f.readinto(buffer)
+            if not n_read:
+                break
+            hasher.update(view[:n_read])
+
+    return hasher.hexdigest()
+
+
+class HashCache(JsonStore):
+    """
+    Class for a persistent cache of file hashes.
+
+    The hashes are keyed by the inode, size and mtime of the files, so that
+    unchanged files are never hashed twice, even if they have been renamed.
+    """
+
+    def __init__(self, path: str, algorithm: str = "sha256") -> None:
+        """Initialize the cache for hashes computed with 'algorithm'."""
+        super().__init__(path)
+        self.algorithm = algorithm
+
+    def digest(self, path: str) -> str:
+        """Return the hash of the file, compute it on a cache miss."""
+        st = os.stat(path)
+        key = f"{self.algorithm}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+        digest: Optional[str] = self.get(key)
+        if digest is None:
+            digest = hash_file(path, self.algorithm)
+            self.set(key, digest)
+
+        return digest
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+from typing import Dict, IO, Optional
+
+
+class UploadJournal:
+    """
+    Class for an append-only journal of the uploaded files.
+
+    Every record is a single json line, which is flushed and fsync'd before
+    'record' returns, so that a crash loses at most the line being written.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the journal, the file is created on the first record."""
+        self.path = path
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, dict]:
+        """Load the journal, return the records keyed by the file name."""
+        index: Dict[str, dict] = {}
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return index
+
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partially written line from a crash, ignore it
+                    continue
+                index[entry["file_name"]] = entry
+
+        return index
+
+    def record(
+        self,
+        file_name: str,
+        claim_name: str,
+        claim_id: str,
+        claim_url: str,
+        started: float,
+        elapsed: float,
+    ) -> None:
+        """Append the record of an uploaded file and sync it to disk."""
+        entry = {
+            "file_name": file_name,
+            "claim_name": claim_name,
+            "claim_id": claim_id,
+            "claim_url": claim_url,
+            "started": round(started, 3),
+            "elapsed": round(elapsed, 3),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+                if _ends_torn(self.path):
+                    # End the line cut short by a crash, which load ignores
+                    line = "\n" + line
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Close the journal file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _ends_torn(path: str) -> bool:
+    """Helper function for telling whether a file ends without a newline."""
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
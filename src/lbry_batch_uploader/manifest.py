@@ -0,0 +1,107 @@
+import csv
+import json
+import os
+from typing import Dict, Iterator, Tuple
+
+# Map each manifest extension to its format
+MANIFEST_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def iter_manifest(path: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    Stream the files to be uploaded from a CSV or JSONL manifest.
+
+    Parameters
+    ----------
+    path: str
+        The path of the manifest, whose format is told by its extension,
+        i.e. ".csv", or ".jsonl" / ".ndjson" for one json object per line.
+        Every row has a "path", and optionally a "title", "description",
+        "tags", "bid" and "thumbnail" (a path or an url). Tags are either
+        a json list or comma-separated. Other columns are ignored.
+
+    Returns
+    -------
+    Iterator[Tuple[str, Dict[str, str]]]
+        The media path without extension, and its parameters, i.e. the
+        "file_name" and "thumbnail_name" paths and the "desc_name" as in
+        classify_entries, plus the overrides given by the row. Tags are
+        joined by commas, and a thumbnail url is given as "thumbnail_url".
+        Rows are read one at a time, so memory use does not grow with the
+        manifest. Invalid rows are printed and skipped.
+
+    """
+
+    ext = os.path.splitext(path)[1].lower()
+    manifest_format = MANIFEST_FORMATS.get(ext)
+    if manifest_format is None:
+        err_msg = (
+            f"The manifest {path} is neither a CSV nor a JSONL file, "
+            + f"i.e. its extension is not one of {', '.join(MANIFEST_FORMATS)}."
+        )
+        raise ValueError(err_msg)
+
+    # utf-8-sig also reads the CSV files exported by spreadsheets with a BOM
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if manifest_format == "csv":
+            rows = _iter_csv_rows(f)
+        else:
+            rows = _iter_json_lines(f)
+
+        for line_no, row in rows:
+            try:
+                yield _parse_row(row)
+            except ValueError as e:
+                print(f"Skipped line {line_no} of {path}\n{e}", end="\n\n")
+
+
+def _iter_csv_rows(f: Iterator[str]) -> Iterator[Tuple[int, object]]:
+    """Helper function for reading the CSV rows with their line numbers."""
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _iter_json_lines(f: Iterator[str]) -> Iterator[Tuple[int, object]]:
+    """Helper function for decoding the json lines, skip blank lines."""
+    for line_no, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            # Report the line number in iter_manifest instead of raising
+            row = ValueError(f"The line is not valid json: {e}")
+        yield line_no, row
+
+
+def _parse_row(row: object) -> Tuple[str, Dict[str, str]]:
+    """Helper function for converting a single row to the file parameters."""
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("The line is not a json object.")
+
+    file_name = str(row.get("path") or "").strip()
+    if not file_name:
+        raise ValueError("The row has no path.")
+
+    params = {"file_name": file_name, "desc_name": "", "thumbnail_name": ""}
+    for field in ("title", "description", "bid"):
+        value = row.get(field)
+        if value not in (None, ""):
+            params[field] = str(value)
+
+    tags = row.get("tags")
+    if isinstance(tags, list):
+        tags = ",".join(str(tag) for tag in tags)
+    if tags:
+        params["tags"] = str(tags)
+
+    thumbnail = str(row.get("thumbnail") or "").strip()
+    if thumbnail.startswith(("http://", "https://")):
+        params["thumbnail_url"] = thumbnail
+    elif thumbnail:
+        params["thumbnail_name"] = thumbnail
+
+    return os.path.splitext(file_name)[0], params
@@ -0,0 +1,270 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# The upper bounds in seconds of the latency buckets, from a local hash to a
+# slow publish
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+# A metric is identified by its name and its sorted labels
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """Class for a monotonically increasing counter."""
+
+    def __init__(self) -> None:
+        """Initialize the counter at 0."""
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter by 'amount'."""
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Class for a value that is set, e.g. the duration of the run."""
+
+    def __init__(self) -> None:
+        """Initialize the gauge at 0."""
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the value of the gauge."""
+        self.value = value
+
+
+class Histogram:
+    """
+    Class for a histogram of observations with fixed buckets.
+
+    Only the bucket counts, the sum, the minimum and the maximum are kept, so
+    that an observation costs a binary search and an increment, whatever the
+    number of observations.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Initialize the empty histogram with the bucket upper bounds."""
+        self.buckets = tuple(sorted(buckets))
+        # The last bucket is +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile, i.e. the upper bound of its bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    Class for the counters, gauges and histograms of a run.
+
+    The metrics are created on first use and identified by their name and
+    labels, e.g. the "rpc_seconds" histogram with method="publish". They are
+    exported as a Prometheus textfile, for the textfile collector of the
+    node exporter, or as a json summary.
+    """
+
+    def __init__(self, namespace: str = "lbry_batch_uploader") -> None:
+        """Initialize the empty registry, all names are prefixed by 'namespace'."""
+        self.namespace = namespace
+        self.started = time.time()
+        self._help: Dict[str, str] = {}
+        self._counters: Dict[Tuple[str, _Labels], Counter] = {}
+        self._gauges: Dict[Tuple[str, _Labels], Gauge] = {}
+        self._histograms: Dict[Tuple[str, _Labels], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        """Set the help text of a metric, shown in the Prometheus textfile."""
+        self._help[name] = help_text
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        """Get the counter, create it on first use."""
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+        return counter
+
+    def gauge(self, name: str, **labels: str) -> Gauge:
+        """Get the gauge, create it on first use."""
+        key = (name, tuple(sorted(labels.items())))
+        gauge = self._gauges.get(key)
+        if gauge is None:
+            with self._lock:
+                gauge = self._gauges.setdefault(key, Gauge())
+        return gauge
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        """Get the histogram, create it on first use."""
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    @contextmanager
+    def time(
+        self, name: str, errors: Optional[str] = None, **labels: str
+    ) -> Iterator[None]:
+        """Observe the seconds spent in the block, count the errors in 'errors'."""
+        histogram = self.histogram(name, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if errors is not None:
+                self.counter(errors, **labels).inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for kind, metrics in (
+            ("counter", self._counters),
+            ("gauge", self._gauges),
+            ("histogram", self._histograms),
+        ):
+            names = sorted({name for name, _ in metrics})
+            for name in names:
+                full_name = f"{self.namespace}_{name}"
+                if name in self._help:
+                    lines.append(f"# HELP {full_name} {self._help[name]}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for (metric_name, labels), metric in sorted(metrics.items()):
+                    if metric_name != name:
+                        continue
+                    if isinstance(metric, Histogram):
+                        lines += _histogram_lines(full_name, labels, metric)
+                    else:
+                        value = metric.value  # type: ignore
+                        lines.append(f"{full_name}{_format_labels(labels)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> dict:
+        """Return a summary of the metrics, with estimated quantiles."""
+        summary: dict = {
+            "started": round(self.started, 3),
+            "duration_seconds": round(time.time() - self.started, 3),
+            "counters": {},
+            "gauges": {},
+            "histograms": {},
+        }
+        for (name, labels), counter in sorted(self._counters.items()):
+            summary["counters"].setdefault(name, []).append(
+                {"labels": dict(labels), "value": counter.value}
+            )
+        for (name, labels), gauge in sorted(self._gauges.items()):
+            summary["gauges"].setdefault(name, []).append(
+                {"labels": dict(labels), "value": gauge.value}
+            )
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            count = histogram.count
+            summary["histograms"].setdefault(name, []).append(
+                {
+                    "labels": dict(labels),
+                    "count": count,
+                    "sum": round(histogram.sum, 6),
+                    "mean": round(histogram.sum / count, 6) if count else 0.0,
+                    "min": round(histogram.min, 6) if count else 0.0,
+                    "max": round(histogram.max, 6),
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                }
+            )
+        return summary
+
+    def write_textfile(self, path: str) -> None:
+        """Write the Prometheus textfile atomically, as the collector expects."""
+        _write_atomic(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        """Write the json summary atomically."""
+        _write_atomic(path, json.dumps(self.to_json(), indent=2) + "\n")
+
+
+def _format_labels(labels: _Labels, extra: str = "") -> str:
+    """Helper function for formatting the labels of a sample."""
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    """Helper function for escaping a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _histogram_lines(name: str, labels: _Labels, histogram: Histogram) -> List[str]:
+    """Helper function for the samples of a histogram, with cumulative buckets."""
+    lines = []
+    cumulative = 0
+    bounds = [f"{bound:g}" for bound in histogram.buckets] + ["+Inf"]
+    for bound, count in zip(bounds, histogram.counts):
+        cumulative += count
+        le_label = _format_labels(labels, f'le="{bound}"')
+        lines.append(f"{name}_bucket{le_label} {cumulative}")
+    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return lines
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Helper function for replacing a file through a temporary file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
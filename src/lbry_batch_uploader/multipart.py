@@ -0,0 +1,153 @@
+import os
+import uuid
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+# The number of bytes read from the files at a time when iterated
+CHUNK_SIZE = 64 * 1024
+
+# A part of the body, either bytes in memory or the path of a file
+_Segment = Tuple[int, int, Union[bytes, str]]
+
+
+class MultipartEncoder:
+    """
+    Class for a multipart/form-data body streamed from the files on disk.
+
+    It is a read-only file-like object with a known length, so that requests
+    and AsyncHttpClient send it chunk by chunk with a Content-Length header,
+    instead of building the whole body in memory. Only the small headers
+    of the parts are kept in memory, the files are read while sending, i.e.
+    the memory of an upload is bounded by the chunk size, not the file size.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        files: Dict[str, str],
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        """Initialize the encoder with form fields, and files given by path."""
+        if chunk_size < 1:
+            err_msg = f"The chunk size {chunk_size} is not a positive integer."
+            raise ValueError(err_msg)
+
+        self.fields = fields
+        self.files = files
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        self._segments: List[_Segment] = []
+        self._length = 0
+        for name, value in fields.items():
+            self._add(
+                (
+                    f"--{self.boundary}\r\n"
+                    + f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                    + f"{value}\r\n"
+                ).encode()
+            )
+        for name, path in files.items():
+            self._add(
+                (
+                    f"--{self.boundary}\r\n"
+                    + f'Content-Disposition: form-data; name="{name}"; '
+                    + f'filename="{name}"\r\n\r\n'
+                ).encode()
+            )
+            self._add(path, os.path.getsize(path))
+            self._add(b"\r\n")
+        self._add(f"--{self.boundary}--\r\n".encode())
+
+        self._pos = 0
+        # The file being read, only one is open at a time
+        self._file: Optional[BinaryIO] = None
+        self._file_path = ""
+
+    @property
+    def content_type(self) -> str:
+        """Return the content type, which carries the boundary."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        """Return the total length of the body in bytes."""
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate over the rest of the body in chunks."""
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __enter__(self) -> "MultipartEncoder":
+        """Return the encoder itself."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the file being read."""
+        self.close()
+
+    def read(self, size: int = -1) -> bytes:
+        """Read at most 'size' bytes of the body, or the rest of it if negative."""
+        if size < 0:
+            size = self._length - self._pos
+
+        buf = bytearray()
+        for start, end, payload in self._segments:
+            if len(buf) >= size or self._pos >= self._length:
+                break
+            if end <= self._pos:
+                continue
+
+            n_bytes = min(size - len(buf), end - self._pos)
+            if isinstance(payload, bytes):
+                begin = self._pos - start
+                stop = begin + n_bytes
+                buf += payload[begin:stop]
+            else:
+                buf += self._read_file(payload, self._pos - start, n_bytes)
+            self._pos += n_bytes
+
+        if self._pos >= self._length:
+            self.close()
+        return bytes(buf)
+
+    def tell(self) -> int:
+        """Return the current position in the body."""
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """Move to a position in the body, e.g. to send it again."""
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._pos = min(max(offset, 0), self._length)
+        return self._pos
+
+    def close(self) -> None:
+        """Close the file being read, it is reopened if read again."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _add(self, payload: Union[bytes, str], size: Optional[int] = None) -> None:
+        """Append a segment, i.e. bytes or a file of 'size' bytes."""
+        if size is None:
+            size = len(payload)
+        self._segments.append((self._length, self._length + size, payload))
+        self._length += size
+
+    def _read_file(self, path: str, offset: int, n_bytes: int) -> bytes:
+        """Read exactly 'n_bytes' of a file from 'offset'."""
+        if self._file is None or self._file_path != path:
+            self.close()
+            self._file = open(path, "rb")
+            self._file_path = path
+        if self._file.tell() != offset:
+            self._file.seek(offset)
+
+        data = self._file.read(n_bytes)
+        if len(data) != n_bytes:
+            raise OSError(f"{path} has been changed while being uploaded.")
+        return data
@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from typing import Any, Iterable, Iterator, List, Optional
+from lbry_batch_uploader.cache import JsonStore
+
+CHECK_NAMES_MODES = ("off", "report", "suffix")
+
+# Marks the end of the items in the queue of iter_batches
+_END = object()
+
+
+def channel_claim_url(channel_name: str, claim_name: str) -> str:
+    """Return the url of a claim name within a channel, e.g. lbry://@ch/name."""
+    return f"lbry://{channel_name}/{claim_name}"
+
+
+def iter_suffixed_names(claim_name: str, start: int = 2) -> Iterator[str]:
+    """Yield the claim name with the suffixes -2, -3 and so on."""
+    idx = start
+    while True:
+        yield f"{claim_name}-{idx}"
+        idx += 1
+
+
+def iter_batches(items: Iterable[Any], size: int, delay: float) -> Iterator[List[Any]]:
+    """
+    Yield the items in batches, without waiting long for a batch to fill up.
+
+    Parameters
+    ----------
+    items: Iterable[Any]
+        The items to be batched, which are iterated on a background thread
+    size: int
+        The maximum number of items in a batch
+    delay: float
+        The number of seconds to wait for the next item, after which a
+        partial batch is yielded, e.g. while a watcher waits for new files
+
+    Returns
+    -------
+    Iterator[List[Any]]
+        The batches in order. An exception raised while iterating 'items' is
+        re-raised after the batches of the items before it.
+
+    """
+
+    # At most a batch ahead, so that the items are still consumed lazily
+    q: queue.Queue = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    errors: List[Exception] = []
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(_END)
+
+    threading.Thread(target=feed, name="batch-source", daemon=True).start()
+    batch: List[Any] = []
+    try:
+        while True:
+            try:
+                item = q.get(timeout=delay if batch else None)
+            except queue.Empty:
+                # The items stalled, do not keep the batch waiting for them
+                yield batch
+                batch = []
+                continue
+            if item is _END:
+                break
+            batch.append(item)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        stop.set()
+
+    if errors:
+        raise errors[0]
+
+
+class NameCache(JsonStore):
+    """
+    Class for a persistent cache of resolved claim urls.
+
+    Every url stores the id of the claim that takes it, or "" if it was free
+    when resolved. A free url is only trusted for 'free_ttl' seconds, as it
+    might be taken by another client afterwards, while a taken url is kept.
+    """
+
+    def __init__(self, path: str, free_ttl: float = 24 * 60 * 60) -> None:
+        """Initialize the cache, free urls expire after 'free_ttl' seconds."""
+        super().__init__(path)
+        self.free_ttl = free_ttl
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Return the claim id, "" if free, or None if unknown or expired."""
+        cached = self.get(url)
+        if cached is None:
+            return None
+
+        claim_id: str = cached["claim_id"]
+        if not claim_id and time.time() - cached["resolved"] > self.free_ttl:
+            return None
+        return claim_id
+
+    def store(self, url: str, claim_id: str) -> None:
+        """Cache the claim id that takes the url, "" if it is free."""
+        self.set(url, {"claim_id": claim_id, "resolved": round(time.time(), 3)})
@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Class for pacing requests with a thread-safe token bucket.
+
+    It is also the interface of all pacers used by the Uploader, i.e. a pacer
+    is anything with the 'acquire', 'reserve', 'on_success' and 'on_error'
+    methods. A plain token bucket ignores the outcome of the requests.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize the bucket with 'rate' tokens per second."""
+        if rate <= 0:
+            raise ValueError(f"The rate {rate} is not a positive number.")
+        if burst < 1:
+            raise ValueError(f"The burst {burst} is not a positive integer.")
+
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token, return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last = now
+
+            # Tokens may go negative, so that concurrent callers queue up
+            # behind each other instead of all waking up at the same time.
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self) -> None:
+        """Feedback hook called after a successful request."""
+        pass
+
+    def on_error(self) -> None:
+        """Feedback hook called after a failed request."""
+        pass
+
+
+class AimdRateLimiter(TokenBucket):
+    """
+    Token bucket with additive-increase/multiplicative-decrease of its rate.
+
+    Every error multiplies the rate by 'decrease', and every success adds
+    'increase' back to it, so that the uploader backs off quickly when the
+    daemon struggles and recovers slowly up to the configured rate.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: Optional[float] = None,
+        increase: Optional[float] = None,
+        decrease: float = 0.5,
+    ) -> None:
+        """Initialize the limiter, 'rate' being the maximum rate as well."""
+        super().__init__(rate, burst)
+        if not 0 < decrease < 1:
+            raise ValueError(f"The decrease {decrease} is not between 0 and 1.")
+
+        self.max_rate = rate
+        self.min_rate = rate / 16 if min_rate is None else min_rate
+        self.increase = rate / 10 if increase is None else increase
+        self.decrease = decrease
+
+    def on_success(self) -> None:
+        """Increase the rate additively, up to 'max_rate'."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_error(self) -> None:
+        """Decrease the rate multiplicatively, down to 'min_rate'."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
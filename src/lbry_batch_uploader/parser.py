@@ -1,6 +1,10 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, ArgumentTypeError
 from typing import Sequence
-from lbry_batch_uploader.utils import RFC5646_LANGUAGE_TAGS, LICENSES
+from lbry_batch_uploader.hashing import HASH_ALGORITHMS
+from lbry_batch_uploader.names import CHECK_NAMES_MODES
+from lbry_batch_uploader.profiling import PROFILE_MODES, SAMPLE_INTERVAL
+from lbry_batch_uploader.thumbnails import COMPRESS_FORMATS
+from lbry_batch_uploader.utils import LICENSES
 
 
 class Parser:
@@ -49,6 +53,32 @@ class Parser:
                     in the LBRY Desktop.""",
         )
 
+        self.argparser.add_argument(
+            "--transcode",
+            action="store_true",
+            help="""Whether to transcode the videos locally with ffmpeg \
+                        before publishing them or not, \
+                        instead of --optimize-file, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--transcode-workers",
+            type=int,
+            help="""The number of videos transcoded concurrently \
+                        with --transcode, default to the number of CPUs \
+                        if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--transcode-budget",
+            default=10.0,
+            type=float,
+            help="""The maximum disk space in GB taken by the transcoded \
+                        videos waiting to be published with --transcode, \
+                        default to 10.0 if not specified.""",
+        )
+
         self.argparser.add_argument(
             "--port",
             default=5279,
@@ -57,6 +87,341 @@ class Parser:
                         default to 5279 if not specified.""",
         )
 
+        self.argparser.add_argument(
+            "--speech-url",
+            type=str,
+            help="""The publish endpoint of spee.ch the thumbnails are \
+                        uploaded to, e.g. of a self-hosted instance, default to \
+                        https://spee.ch/api/claim/publish if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--capability-ttl",
+            default=3600.0,
+            type=float,
+            help="""The number of seconds the version of lbrynet and whether \
+                        it has ffmpeg are cached for across runs, 0 to probe \
+                        lbrynet every time, default to 3600 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--refresh-capabilities",
+            action="store_true",
+            help="""Probe lbrynet again, even if its version and whether it \
+                        has ffmpeg are cached, e.g. after upgrading lbrynet, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--manifest",
+            type=str,
+            help="""The CSV or JSONL file that lists the files to be uploaded \
+                        and their metadata, instead of scanning file_directory, \
+                        default to None if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--recursive",
+            action="store_true",
+            help="""Whether to look for files in the subdirectories \
+                        of file_directory as well or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--scan-workers",
+            default=4,
+            type=int,
+            help="""The number of directories scanned concurrently \
+                        with --recursive, default to 4 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--scan-cache",
+            action="store_true",
+            help="""Whether to cache the scanned directories in --state-dir \
+                        and only scan again those that have changed or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--watch",
+            action="store_true",
+            help="""Whether to keep watching file_directory \
+                        and upload the new files as they land or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--settle-seconds",
+            default=5.0,
+            type=float,
+            help="""The number of seconds that the size and mtime \
+                        of a new file should stay unchanged before it is \
+                        uploaded with --watch, default to 5.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--workers",
+            default=1,
+            type=int,
+            help="""The maximum number of files to publish concurrently, \
+                        i.e. the number of threads, or coroutines with --async, \
+                        default to 1 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--async",
+            dest="use_async",
+            action="store_true",
+            help="""Whether to run the uploads as coroutines \
+                        on a single event loop or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--rate",
+            default=1.0,
+            type=float,
+            help="""The maximum number of publish requests per second, \
+                        default to 1.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--burst",
+            default=3,
+            type=int,
+            help="""The number of publish requests that could be sent \
+                        at once before --rate applies, \
+                        default to 3 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--no-adaptive",
+            dest="adaptive",
+            action="store_false",
+            help="""Do not slow down when lbrynet returns errors, \
+                        i.e. always publish at --rate, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--track-confirmations",
+            action="store_true",
+            help="""Whether to check in the background that the publish \
+                        transactions confirm, and report them at the end or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--confirm-timeout",
+            default=600.0,
+            type=float,
+            help="""The maximum number of seconds to wait for the pending \
+                        transactions after the last publish \
+                        with --track-confirmations, \
+                        default to 600.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--metrics-textfile",
+            type=str,
+            help="""The path of the Prometheus textfile the timing metrics \
+                        are written to at the end of the run, \
+                        e.g. in the directory of the textfile collector, \
+                        default to None if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--metrics-json",
+            type=str,
+            help="""The path of the json summary the timing metrics \
+                        are written to at the end of the run, \
+                        default to None if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--profile",
+            type=str,
+            help="""The run directory the profiles of the run are written to, \
+                        on python 3.12+ the stages are not profiled with \
+                        --profile-mode cprofile, \
+                        default to None, i.e. no profiling, if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--profile-mode",
+            default="cprofile",
+            type=str,
+            choices=PROFILE_MODES,
+            help="""Whether to profile every phase and stage with cProfile \
+                        ("cprofile") or to sample the stacks of all threads \
+                        ("sampling"), which is cheap enough for long runs, \
+                        default to cprofile if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--profile-interval",
+            default=SAMPLE_INTERVAL,
+            type=float,
+            help="""The interval in seconds between two samples \
+                        with --profile-mode sampling, \
+                        default to 0.01 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--retries",
+            default=3,
+            type=int,
+            help="""The number of times a request is retried after a \
+                        transient error, e.g. a dropped connection or a busy \
+                        wallet, default to 3 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--retry-delay",
+            default=1.0,
+            type=float,
+            help="""The base delay in seconds between the retries, which \
+                        doubles with every retry and is jittered, \
+                        default to 1.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--connect-timeout",
+            default=10.0,
+            type=float,
+            help="""The number of seconds to wait for a connection to lbrynet                         or spee.ch, default to 10.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--read-timeout",
+            default=300.0,
+            type=float,
+            help="""The number of seconds to wait for lbrynet or spee.ch                         to answer a request, default to 300.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--resume",
+            action="store_true",
+            help="""Whether to skip the files that have been uploaded \
+                        according to the journal or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--state-dir",
+            type=str,
+            help="""The directory that keeps the journal of uploaded files, \
+                        default to file_directory/.lbry_batch_uploader \
+                        if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--dedup",
+            action="store_true",
+            help="""Whether to skip the files whose content has been \
+                        published to the channel or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--hash-algorithm",
+            default="sha256",
+            type=str,
+            choices=HASH_ALGORITHMS,
+            help="""The algorithm for hashing the file content with --dedup, \
+                        default to sha256 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--generate-thumbnails",
+            action="store_true",
+            help="""Whether to generate the thumbnails with ffmpeg \
+                        for the files that have none or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-workers",
+            type=int,
+            help="""The number of ffmpeg processes generating or compressing \
+                        thumbnails concurrently, default to the number of CPUs \
+                        if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--compress-thumbnails",
+            action="store_true",
+            help="""Whether to downsize and recompress the thumbnails \
+                        with ffmpeg before uploading them or not, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-max-size",
+            default=1280,
+            type=int,
+            help="""The maximum width and height in pixels of the thumbnails \
+                        compressed with --compress-thumbnails, \
+                        default to 1280 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-format",
+            default="jpeg",
+            type=str,
+            choices=tuple(COMPRESS_FORMATS),
+            help="""The format of the thumbnails compressed with \
+                        --compress-thumbnails, default to jpeg if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-quality",
+            default=85,
+            type=int,
+            help="""The quality from 1 to 100 of the thumbnails compressed \
+                        with --compress-thumbnails, \
+                        default to 85 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-cache",
+            action="store_true",
+            help="""Whether to cache the urls of the uploaded thumbnails \
+                        by their content hash or not, so that identical \
+                        thumbnails are uploaded once per channel, \
+                        default to False if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-cache-ttl",
+            default=30.0,
+            type=float,
+            help="""The number of days the cached thumbnail urls are trusted \
+                        with --thumbnail-cache, default to 30.0 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--thumbnail-cache-size",
+            default=10000,
+            type=int,
+            help="""The maximum number of cached thumbnail urls \
+                        with --thumbnail-cache, the oldest ones are evicted, \
+                        default to 10000 if not specified.""",
+        )
+
+        self.argparser.add_argument(
+            "--check-names",
+            default="off",
+            type=str,
+            choices=CHECK_NAMES_MODES,
+            help="""Whether to resolve the claim names in the channel \
+                        before uploading, and skip ("report") or rename \
+                        ("suffix") the files whose name is taken, \
+                        default to off if not specified.""",
+        )
+
         self.argparser.add_argument(
             "--bid",
             default="0.0001",
@@ -86,8 +451,7 @@ class Parser:
             "--languages",
             nargs="+",
             default=["en"],
-            type=str,
-            choices=list(RFC5646_LANGUAGE_TAGS.keys()),
+            type=language_tag,
             help="""The languages of the claims in RFC5646 format, \
                         default to ["en"] if not specified. \
                         More than one could be specified. \
@@ -112,3 +476,28 @@ class Parser:
                         This option should be specified \
                         if and only if --license='Other'.""",
         )
+
+
+def language_tag(value: str) -> str:
+    """
+    Check a language tag of --languages, the argparse type of the argument.
+
+    Parameters
+    ----------
+    value: str
+        The language tag given on the command line
+
+    Returns
+    -------
+    str
+        The language tag, if it is in RFC5646_LANGUAGE_TAGS. The table is only
+        imported here, so that neither --help nor the other arguments pay
+        for it.
+
+    """
+
+    from lbry_batch_uploader.languages import RFC5646_LANGUAGE_TAGS
+
+    if value not in RFC5646_LANGUAGE_TAGS:
+        raise ArgumentTypeError(f"invalid choice: '{value}'")
+    return value
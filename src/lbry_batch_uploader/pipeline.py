@@ -0,0 +1,216 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Marks the end of the items in a queue, one per downstream worker
+_DONE = object()
+
+
+class Stage:
+    """Class for a single stage of the Pipeline, run by 'workers' threads."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int) -> None:
+        """Initialize the stage, 'func' maps the output of the previous stage."""
+        if workers < 1:
+            err_msg = f"The number of workers {workers} is not a positive integer."
+            raise ValueError(err_msg)
+
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class Pipeline:
+    """
+    Class for running items through stages connected by bounded queues.
+
+    Every stage runs on its own threads, so that e.g. the thumbnails of the
+    upcoming files are uploaded while the earlier files are being published.
+    The bounded queues apply backpressure, so that the faster stages never
+    run more than 'maxsize' items ahead of the slower ones. Once closed, e.g.
+    by Ctrl-C, no new item is taken, but the items already taken still run
+    through all stages, and 'on_close' is called to end a blocking source.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Stage],
+        maxsize: int,
+        on_close: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Initialize the pipeline with the stages in order."""
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        if maxsize < 1:
+            err_msg = f"The queue size {maxsize} is not a positive integer."
+            raise ValueError(err_msg)
+
+        self.stages = stages
+        self.maxsize = maxsize
+        self.on_close = on_close
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Future]]:
+        """
+        Run the items through all stages.
+
+        Parameters
+        ----------
+        items: Iterable[Any]
+            The items to be processed, which are consumed lazily
+
+        Returns
+        -------
+        Iterator[Tuple[Any, Future]]
+            The items and the futures of their final outputs, in the order
+            of completion. An exception raised by any stage is set on the
+            future, and the remaining stages are skipped for that item.
+            An exception raised while iterating 'items' is re-raised after
+            the items before it have been processed. A KeyboardInterrupt
+            closes the pipeline, and is re-raised once the items already
+            taken have been yielded, unless interrupted again.
+
+        """
+
+        self._stop.clear()
+        self._closed.clear()
+        interrupted = False
+        self._source_error: Optional[Exception] = None
+        queues: List[queue.Queue] = [
+            queue.Queue(maxsize=self.maxsize) for _ in range(len(self.stages) + 1)
+        ]
+        threads = [
+            threading.Thread(
+                target=self._feed,
+                args=(items, queues[0]),
+                name="pipeline-source",
+                daemon=True,
+            )
+        ]
+        for idx, stage in enumerate(self.stages):
+            n_next = self.stages[idx + 1].workers if idx + 1 < len(self.stages) else 1
+            n_left = [stage.workers]
+            lock = threading.Lock()
+            for worker_idx in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(
+                            stage,
+                            queues[idx],
+                            queues[idx + 1],
+                            n_next,
+                            n_left,
+                            lock,
+                        ),
+                        name=f"{stage.name}-{worker_idx}",
+                        daemon=True,
+                    )
+                )
+
+        for thread in threads:
+            try:
+                thread.start()
+            except KeyboardInterrupt:
+                # Only waiting for the thread to start was interrupted
+                interrupted = True
+                self.close()
+        try:
+            while True:
+                try:
+                    job = self._get(queues[-1])
+                except KeyboardInterrupt:
+                    # A second one abandons the items still in the stages
+                    if interrupted:
+                        raise
+                    interrupted = True
+                    self.close()
+                    continue
+                if job is _DONE:
+                    break
+                yield job[0], job[1]
+        finally:
+            self._stop.set()
+
+        if interrupted:
+            raise KeyboardInterrupt
+        if self._source_error is not None:
+            raise self._source_error
+
+    def close(self) -> None:
+        """Stop taking new items, let the items already taken finish."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self.on_close is not None:
+            self.on_close()
+
+    def _feed(self, items: Iterable[Any], q_out: queue.Queue) -> None:
+        """Put the items into the first queue, then signal the end."""
+        try:
+            for item in items:
+                if self._closed.is_set():
+                    break
+                future: Future = Future()
+                future.set_running_or_notify_cancel()
+                if not self._put(q_out, [item, future, item]):
+                    return
+        except Exception as e:
+            self._source_error = e
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._put(q_out, _DONE)
+
+    def _work(
+        self,
+        stage: Stage,
+        q_in: queue.Queue,
+        q_out: queue.Queue,
+        n_next: int,
+        n_left: List[int],
+        lock: threading.Lock,
+    ) -> None:
+        """Apply the stage to every job, the last worker signals the end."""
+        while not self._stop.is_set():
+            job = self._get(q_in)
+            if job is _DONE or job is None:
+                break
+
+            item, future, value = job
+            if not future.done():
+                try:
+                    job[2] = stage.func(value)
+                except Exception as e:
+                    future.set_exception(e)
+            if stage is self.stages[-1] and not future.done():
+                future.set_result(job[2])
+            if not self._put(q_out, job):
+                return
+
+        with lock:
+            n_left[0] -= 1
+            is_last = n_left[0] == 0
+        if is_last:
+            for _ in range(n_next):
+                self._put(q_out, _DONE)
+
+    def _get(self, q: queue.Queue) -> Any:
+        """Get from the queue, return None if the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _put(self, q: queue.Queue, job: Any) -> bool:
+        """Put into the queue, return False if the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                q.put(job, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,212 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from types import FrameType
+from typing import ContextManager, Dict, Iterator, List, Optional, Set, Tuple
+
+PROFILE_MODES = ("cprofile", "sampling")
+# The interval in seconds between two samples, i.e. 100 samples per second
+SAMPLE_INTERVAL = 0.01
+# The deepest stack kept by a sample, the frames near the root are dropped
+MAX_DEPTH = 128
+
+# Returned when there is nothing to profile, a nullcontext could be reused
+_NOTHING = nullcontext()
+# The numbered suffix of the threads of a stage, e.g. "publish-3"
+_THREAD_SUFFIX = re.compile(r"[-_]\d+$")
+
+
+class Profiler:
+    """
+    Class for profiling a run, writing the results into a run directory.
+
+    In "cprofile" mode, every phase of the main thread, e.g. upload_all_files,
+    and every stage across its threads is profiled deterministically, and
+    written as a .pstats file. In "sampling" mode, a background thread takes
+    the stacks of all threads every 'interval' seconds instead, which costs
+    little enough for long runs, and writes them as collapsed stacks, i.e.
+    the input of flamegraph.pl and speedscope, rooted at the thread group.
+    A Profiler without a run directory does nothing. On python 3.12+, only
+    one cProfile could be enabled at a time, so the stages running during a
+    phase are skipped, with a warning.
+    """
+
+    def __init__(
+        self,
+        run_dir: Optional[str] = None,
+        mode: str = "cprofile",
+        interval: float = SAMPLE_INTERVAL,
+    ) -> None:
+        """Initialize the profiler, writing into 'run_dir' once closed."""
+        if mode not in PROFILE_MODES:
+            err_msg = f"The profile mode {mode} is not one of {PROFILE_MODES}."
+            raise ValueError(err_msg)
+        if interval <= 0:
+            err_msg = f"The sampling interval {interval} is not a positive number."
+            raise ValueError(err_msg)
+
+        self.run_dir = run_dir
+        self.mode = mode
+        self.interval = interval
+        self.samples: Counter = Counter()
+        # The profiles of the phases, and of the stages by thread
+        self._phases: Dict[str, cProfile.Profile] = {}
+        self._stages: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._profiled_threads: Dict[int, str] = {}
+        self._skipped: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether there is anything to profile."""
+        return self.run_dir is not None
+
+    def __enter__(self) -> "Profiler":
+        """Start sampling in sampling mode."""
+        if self.enabled and self.mode == "sampling":
+            self._stop.clear()
+            self._sampler = threading.Thread(
+                target=self._sample, name="profiler", daemon=True
+            )
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop sampling, and write the results."""
+        self.close()
+
+    def phase(self, name: str) -> ContextManager:
+        """Profile the block on the current thread as the phase 'name'."""
+        if not self.enabled or self.mode != "cprofile":
+            return _NOTHING
+        return self._profile_phase(name)
+
+    def stage(self, name: str) -> ContextManager:
+        """Profile the block on the current thread as part of the stage 'name'."""
+        if not self.enabled or self.mode != "cprofile":
+            return _NOTHING
+        # A thread already profiled as a phase, e.g. the event loop
+        if threading.get_ident() in self._profiled_threads:
+            return _NOTHING
+        return self._profile_stage(name)
+
+    def close(self) -> None:
+        """Stop sampling, and write the results into the run directory."""
+        if not self.enabled:
+            return
+
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+        # Only needed to merge the profiles, and slow to import
+        import pstats
+
+        assert self.run_dir is not None
+        os.makedirs(self.run_dir, exist_ok=True)
+        for name, profile in self._phases.items():
+            profile.dump_stats(os.path.join(self.run_dir, f"{name}.pstats"))
+        stage_stats: Dict[str, pstats.Stats] = {}
+        for (name, _), profile in self._stages.items():
+            if not profile.getstats():
+                # Never enabled, pstats rejects an empty profile
+                continue
+            if name in stage_stats:
+                stage_stats[name].add(profile)
+            else:
+                stage_stats[name] = pstats.Stats(profile)
+        for name, stats in stage_stats.items():
+            stats.dump_stats(os.path.join(self.run_dir, f"stage_{name}.pstats"))
+        if self.samples:
+            lines = [f"{stack} {count}\n" for stack, count in self.samples.items()]
+            with open(
+                os.path.join(self.run_dir, "samples.collapsed"), "w", encoding="utf-8"
+            ) as f:
+                f.writelines(sorted(lines))
+
+    @contextmanager
+    def _profile_phase(self, name: str) -> Iterator[None]:
+        """Profile a phase, the same name accumulates into the same profile."""
+        profile = self._phases.setdefault(name, cProfile.Profile())
+        ident = threading.get_ident()
+        self._profiled_threads[ident] = name
+        try:
+            with _enabled(profile) as enabled:
+                if not enabled:
+                    self._warn_skipped(name)
+                yield
+        finally:
+            del self._profiled_threads[ident]
+
+    @contextmanager
+    def _profile_stage(self, name: str) -> Iterator[None]:
+        """Profile a stage, with one profile per thread."""
+        key = (name, threading.get_ident())
+        profile = self._stages.get(key)
+        if profile is None:
+            with self._lock:
+                profile = self._stages.setdefault(key, cProfile.Profile())
+        with _enabled(profile) as enabled:
+            if not enabled:
+                self._warn_skipped(f"stage {name}")
+            yield
+
+    def _warn_skipped(self, name: str) -> None:
+        """Print once that a phase or stage could not be profiled."""
+        with self._lock:
+            if name in self._skipped:
+                return
+            self._skipped.add(name)
+        print(
+            f"Skipped profiling {name}, as another profile is already enabled\n"
+            + "Only one profile is enabled at a time on python 3.12+, "
+            + "use --profile-mode sampling to profile every thread",
+            end="\n\n",
+        )
+
+    def _sample(self) -> None:
+        """Take the stacks of all other threads until stopped."""
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                group = _THREAD_SUFFIX.sub("", names.get(ident, "unknown"))
+                self.samples[_collapse(group, frame)] += 1
+
+
+@contextmanager
+def _enabled(profile: cProfile.Profile) -> Iterator[bool]:
+    """Helper function for enabling a profile around a block, if possible."""
+    try:
+        profile.enable()
+        enabled = True
+    except ValueError:
+        # Only one profile at a time on python 3.12+, skip the nested one
+        enabled = False
+    try:
+        yield enabled
+    finally:
+        if enabled:
+            profile.disable()
+
+
+def _collapse(group: str, frame: Optional[FrameType]) -> str:
+    """Helper function for formatting a stack as a single collapsed line."""
+    frames: List[str] = []
+    while frame is not None and len(frames) < MAX_DEPTH:
+        code = frame.f_code
+        file_name = os.path.basename(code.co_filename)
+        frames.append(f"{code.co_name} ({file_name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.append(group)
+    # The root first, the count is appended after the last space
+    return ";".join(reversed(frames))
@@ -0,0 +1,263 @@
+import asyncio
+import random
+import threading
+import time
+import requests
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from urllib3.exceptions import NewConnectionError
+from lbry_batch_uploader.utils import (
+    CircuitOpenError,
+    ConnectFailedError,
+    TransientDaemonError,
+    TransientError,
+)
+
+T = TypeVar("T")
+# Called with the error, the number of failed attempts and the delay in seconds
+RetryHook = Callable[[BaseException, int, float], None]
+
+# The daemon errors that might go away on their own, matched by name
+TRANSIENT_DAEMON_ERRORS = (
+    "ConnectionError",
+    "TimeoutError",
+    "ResolveTimeoutError",
+    "DownloadSDTimeoutError",
+    "DownloadDataTimeoutError",
+    "ServerPaymentWalletLockedError",
+)
+# The http status codes of overloaded or unavailable servers
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Tell whether an error is transient, i.e. worth retrying.
+
+    Parameters
+    ----------
+    error: BaseException
+        The error raised by a request
+
+    Returns
+    -------
+    bool
+        True for dropped or refused connections, timeouts, 5xx and 429
+        responses and busy daemons. False for everything else, e.g. invalid
+        claim names or insufficient funds, which fail again if retried.
+
+    """
+
+    return isinstance(
+        error,
+        (
+            TransientError,
+            CircuitOpenError,
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            # Raised by AsyncHttpClient
+            ConnectionError,
+            TimeoutError,
+            asyncio.TimeoutError,
+        ),
+    )
+
+
+def is_unsent(error: BaseException) -> bool:
+    """
+    Tell whether a failed request surely had no effect, i.e. is safe to send again.
+
+    Parameters
+    ----------
+    error: BaseException
+        The error raised by a request
+
+    Returns
+    -------
+    bool
+        True for connections that could not be opened, open circuits and
+        errors answered by lbrynet. False for everything else, e.g. a
+        connection dropped while waiting for the response, or a 502 of a
+        proxy, after which a request that is not idempotent, e.g. publish,
+        might have gone through.
+
+    """
+
+    if isinstance(
+        error,
+        (
+            CircuitOpenError,
+            TransientDaemonError,
+            requests.ConnectTimeout,
+            # Raised by AsyncHttpClient
+            ConnectFailedError,
+        ),
+    ):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        # e.g. refused, urllib3 wraps the reason in a MaxRetryError
+        reason = getattr(error.args[0], "reason", error.args[0])
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class CircuitBreaker:
+    """
+    Class for a circuit breaker around a single endpoint.
+
+    After 'threshold' transient failures in a row, the circuit opens and the
+    calls fail fast with CircuitOpenError for 'reset_timeout' seconds, so that
+    a daemon or spee.ch that is down is not hammered by every worker. Then a
+    single trial call is let through, i.e. half-open, which either closes the
+    circuit again or opens it for another 'reset_timeout' seconds.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, reset_timeout: float = 30.0):
+        """Initialize the closed circuit of the endpoint 'name'."""
+        if threshold < 1:
+            err_msg = f"The failure threshold {threshold} is not a positive integer."
+            raise ValueError(err_msg)
+        if reset_timeout <= 0:
+            err_msg = f"The reset timeout {reset_timeout} is not a positive number."
+            raise ValueError(err_msg)
+
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return the state, i.e. "closed", "open" or "half-open"."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call is allowed right now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            if retry_after <= 0 and not self._trial:
+                self._trial = True
+                return
+
+        err_msg = f"The circuit of {self.name} is open after repeated failures."
+        raise CircuitOpenError(err_msg, max(retry_after, 0.0))
+
+    def on_success(self) -> None:
+        """Close the circuit."""
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def on_failure(self) -> None:
+        """Count a transient failure, open the circuit if there are too many."""
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class RetryPolicy:
+    """
+    Class for retrying the transient errors with jittered exponential backoff.
+
+    A call is tried at most 'max_attempts' times. The n-th retry waits a
+    random delay between 0 and base_delay * 2 ** (n - 1), capped at
+    'max_delay', so that the workers failing together do not retry together.
+    Permanent errors are raised right away.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        on_retry: Optional[RetryHook] = None,
+    ) -> None:
+        """Initialize the policy, 'on_retry' is called before every retry."""
+        if max_attempts < 1:
+            err_msg = (
+                f"The number of attempts {max_attempts} is not a positive integer."
+            )
+            raise ValueError(err_msg)
+        if base_delay < 0 or max_delay < base_delay:
+            err_msg = (
+                f"The delays {base_delay} and {max_delay} are not non-negative "
+                + "and in ascending order."
+            )
+            raise ValueError(err_msg)
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_retry = on_retry
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay in seconds before the retry after 'attempt' failures."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def call(self, breaker: CircuitBreaker, func: Callable[..., T], *args: Any) -> T:
+        """Call 'func' through the circuit breaker, retry the transient errors."""
+        attempt = 0
+        while True:
+            try:
+                breaker.before_call()
+                result = func(*args)
+            except Exception as e:
+                attempt += 1
+                delay = self._on_error(breaker, e, attempt)
+                time.sleep(delay)
+                continue
+
+            breaker.on_success()
+            return result
+
+    async def call_async(
+        self, breaker: CircuitBreaker, func: Callable[..., Awaitable[T]], *args: Any
+    ) -> T:
+        """Coroutine version of 'call'."""
+        attempt = 0
+        while True:
+            try:
+                breaker.before_call()
+                result = await func(*args)
+            except Exception as e:
+                attempt += 1
+                delay = self._on_error(breaker, e, attempt)
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.on_success()
+            return result
+
+    def _on_error(
+        self, breaker: CircuitBreaker, error: Exception, attempt: int
+    ) -> float:
+        """Return the delay before retrying, raise the error if it is final."""
+        if not is_transient(error):
+            # The endpoint did answer, the request itself is wrong
+            breaker.on_success()
+            raise error
+        if not isinstance(error, CircuitOpenError):
+            breaker.on_failure()
+        if attempt >= self.max_attempts:
+            raise error
+
+        delay = self.backoff(attempt)
+        if isinstance(error, CircuitOpenError):
+            delay = max(delay, error.retry_after)
+        if self.on_retry is not None:
+            self.on_retry(error, attempt, delay)
+        return delay
@@ -0,0 +1,259 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from lbry_batch_uploader.cache import JsonStore
+
+MEDIA_EXTS = ("mp4", "mkv", "webm", "mp3", "opus")
+DESC_EXTS = ("txt", "description")
+THUMBNAIL_EXTS = ("gif", "jpg", "png", "webp")
+
+# The relative path, classified entries and subdirectories of a directory
+ScanResult = Tuple[str, Dict[str, Dict[str, str]], List[str]]
+
+# Map each lower-cased extension to its kind and its priority within the kind
+_EXT_KINDS: Dict[str, Tuple[str, int]] = {}
+for _kind, _exts in (
+    ("file_name", MEDIA_EXTS),
+    ("desc_name", DESC_EXTS),
+    ("thumbnail_name", THUMBNAIL_EXTS),
+):
+    for _rank, _ext in enumerate(_exts):
+        _EXT_KINDS[_ext] = (_kind, _rank)
+
+
+def classify_name(name: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Classify a single file name by its extension.
+
+    Parameters
+    ----------
+    name: str
+        The name of the file
+
+    Returns
+    -------
+    Optional[Tuple[str, str, int]]
+        The name without extension, the kind of the file, i.e. "file_name",
+        "desc_name" or "thumbnail_name", and the priority of the extension
+        within the kind (lower is better), or None for any other file.
+
+    """
+
+    stem, dot, ext = name.rpartition(".")
+    if not dot:
+        return None
+    kind_rank = _EXT_KINDS.get(ext.lower())
+    if kind_rank is None:
+        return None
+
+    return stem, kind_rank[0], kind_rank[1]
+
+
+def classify_entries(names: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Classify the file names of a directory in a single pass.
+
+    Parameters
+    ----------
+    names: Iterable[str]
+        The names of the files in the directory
+
+    Returns
+    -------
+    Dict[str, Dict[str, str]]
+        The media files keyed by their names without extension, sorted by
+        their file names. Each of them holds its "file_name", "desc_name"
+        and "thumbnail_name", the latter two being "" if not found.
+        Extensions are matched case-insensitively, and if more than one
+        sidecar file matches, the extension listed first in DESC_EXTS or
+        THUMBNAIL_EXTS wins.
+
+    """
+
+    # stem -> kind -> (rank, name)
+    index: Dict[str, Dict[str, Tuple[int, str]]] = {}
+    for name in names:
+        classified = classify_name(name)
+        if classified is None:
+            continue
+
+        stem, kind, rank = classified
+        if kind == "file_name":
+            # Same as sorting all media files, the last one of a stem wins
+            rank = 0
+        found = index.setdefault(stem, {})
+        best = found.get(kind)
+        if best is None or rank < best[0] or (rank == best[0] and name > best[1]):
+            found[kind] = (rank, name)
+
+    files_valid = {}
+    media = [
+        (found["file_name"][1], stem)
+        for stem, found in index.items()
+        if "file_name" in found
+    ]
+    for name, stem in sorted(media):
+        found = index[stem]
+        files_valid[stem] = {
+            "file_name": name,
+            "desc_name": found["desc_name"][1] if "desc_name" in found else "",
+            "thumbnail_name": (
+                found["thumbnail_name"][1] if "thumbnail_name" in found else ""
+            ),
+        }
+
+    return files_valid
+
+
+class ScanCache(JsonStore):
+    """
+    Class for a persistent cache of classified directories.
+
+    Every directory is keyed by its path relative to the top directory, and
+    stores its inode, mtime, classified entries and subdirectories. Adding,
+    removing or renaming an entry changes the mtime of a directory, so an
+    unchanged directory could be reused with a single stat call.
+    """
+
+    # Directories modified this recently might be modified again within the
+    # mtime granularity of the file system, so they are not cached
+    RACY_SECONDS = 2.0
+
+    def lookup(self, rel_dir: str, st: os.stat_result) -> Optional[ScanResult]:
+        """Return the cached scan result if the directory is unchanged."""
+        cached = self.get(rel_dir)
+        if cached is None:
+            return None
+        if cached["ino"] != st.st_ino or cached["mtime_ns"] != st.st_mtime_ns:
+            return None
+
+        return rel_dir, cached["files"], cached["subdirs"]
+
+    def store(self, st: os.stat_result, result: ScanResult) -> None:
+        """Cache the scan result of a directory, unless it is racy."""
+        if time.time() - st.st_mtime < self.RACY_SECONDS:
+            return
+
+        rel_dir, files_valid, subdirs = result
+        self.set(
+            rel_dir,
+            {
+                "ino": st.st_ino,
+                "mtime_ns": st.st_mtime_ns,
+                "files": files_valid,
+                "subdirs": subdirs,
+            },
+        )
+
+    def prune(self, rel_dirs: Set[str]) -> None:
+        """Remove the directories not in 'rel_dirs', e.g. deleted ones."""
+        for rel_dir in self:
+            if rel_dir not in rel_dirs:
+                self.pop(rel_dir)
+
+
+def scan_directory(
+    root: str, rel_dir: str = "", cache: Optional[ScanCache] = None
+) -> ScanResult:
+    """
+    Scan and classify a single directory.
+
+    Parameters
+    ----------
+    root: str
+        The path of the top directory
+    rel_dir: str
+        The path of the directory to be scanned relative to 'root'
+    cache: Optional[ScanCache]
+        The scan cache, if any, which is looked up and updated
+
+    Returns
+    -------
+    ScanResult
+        'rel_dir', its classified entries as returned by classify_entries,
+        and its subdirectories relative to 'root'. Hidden directories and
+        symlinks to directories are skipped.
+
+    """
+
+    path = os.path.join(root, rel_dir)
+    if cache is not None:
+        st = os.stat(path)
+        result = cache.lookup(rel_dir, st)
+        if result is not None:
+            return result
+
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith("."):
+                    subdirs.append(os.path.join(rel_dir, entry.name))
+            elif entry.is_file():
+                files.append(entry.name)
+
+    result = (rel_dir, classify_entries(files), sorted(subdirs))
+    if cache is not None:
+        cache.store(st, result)
+    return result
+
+
+def walk_directories(
+    root: str, workers: int = 4, cache: Optional[ScanCache] = None
+) -> Iterator[Tuple[str, Dict[str, Dict[str, str]]]]:
+    """
+    Walk a directory tree with a pool of scandir workers.
+
+    Parameters
+    ----------
+    root: str
+        The path of the top directory
+    workers: int
+        The number of directories scanned concurrently, which hides the
+        latency of slow file systems, e.g. a NAS
+    cache: Optional[ScanCache]
+        The scan cache, if any, so that only the directories whose mtime
+        has changed are listed again. Deleted directories are pruned from
+        it once the whole tree has been walked.
+
+    Returns
+    -------
+    Iterator[Tuple[str, Dict[str, Dict[str, str]]]]
+        The path of each directory relative to 'root' ("" for 'root' itself),
+        and its classified entries as returned by classify_entries, yielded
+        as soon as the directory has been scanned. Hidden directories and
+        symlinks to directories are skipped.
+
+    """
+
+    # Errors on the top directory are raised, those on subdirectories are not
+    results = [scan_directory(root, "", cache)]
+    visited: Set[str] = set()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending: Set[Future] = set()
+    try:
+        while results or pending:
+            for rel_dir, files_valid, subdirs in results:
+                visited.add(rel_dir)
+                # Keep the workers busy while the caller handles this directory
+                for subdir in subdirs:
+                    pending.add(executor.submit(scan_directory, root, subdir, cache))
+                yield rel_dir, files_valid
+
+            results = []
+            if pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        results.append(future.result())
+                    except OSError as e:
+                        print(f"Failed to scan {e.filename}\n{e}", end="\n\n")
+
+        if cache is not None:
+            cache.prune(visited)
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,406 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from lbry_batch_uploader.cache import JsonStore
+from lbry_batch_uploader.hashing import HashCache
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+# Seek into the media, as the first frames are often black or a title card
+SEEK_FRACTION = 0.1
+# The number of frames from which the thumbnail filter picks the most typical
+THUMBNAIL_FRAMES = 100
+THUMBNAIL_WIDTH = 1280
+FFMPEG_TIMEOUT = 120
+# The formats the thumbnails could be recompressed to, and their extensions
+COMPRESS_FORMATS = {"jpeg": "jpg", "webp": "webp"}
+
+
+def probe_duration(media_path: str, ffprobe: str = "ffprobe") -> Optional[float]:
+    """
+    Get the duration of a media file with ffprobe.
+
+    Parameters
+    ----------
+    media_path: str
+        The path of the media file
+    ffprobe: str
+        The ffprobe executable
+
+    Returns
+    -------
+    Optional[float]
+        The duration in seconds, or None if it could not be probed
+
+    """
+
+    cmd = [
+        ffprobe,
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        media_path,
+    ]
+    try:
+        proc = subprocess.run(
+            cmd, capture_output=True, text=True, timeout=FFMPEG_TIMEOUT
+        )
+        return float(proc.stdout.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def extract_frame(
+    media_path: str,
+    out_path: str,
+    seek: float = 0.0,
+    ffmpeg: str = "ffmpeg",
+) -> bool:
+    """
+    Extract a representative frame of a media file as a jpg with ffmpeg.
+
+    Parameters
+    ----------
+    media_path: str
+        The path of the media file
+    out_path: str
+        The path of the jpg to be written
+    seek: float
+        The position in seconds from which the frame is picked
+    ffmpeg: str
+        The ffmpeg executable
+
+    Returns
+    -------
+    bool
+        Whether the frame has been written. Audio files without cover art
+        have no frame at all.
+
+    """
+
+    video_filter = f"thumbnail={THUMBNAIL_FRAMES},scale='min({THUMBNAIL_WIDTH},iw)':-2"
+    cmd: List[str] = [ffmpeg, "-v", "error", "-y"]
+    if seek > 0:
+        # Seeking before the input is fast, as it skips decoding
+        cmd += ["-ss", f"{seek:.3f}"]
+    cmd += [
+        "-i",
+        media_path,
+        "-an",
+        "-vf",
+        video_filter,
+        "-frames:v",
+        "1",
+        "-q:v",
+        "3",
+        "-f",
+        "image2",
+        out_path,
+    ]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+    return proc.returncode == 0 and os.path.exists(out_path)
+
+
+def compress_command(
+    image_path: str,
+    out_path: str,
+    max_size: int = THUMBNAIL_WIDTH,
+    image_format: str = "jpeg",
+    quality: int = 85,
+    ffmpeg: str = "ffmpeg",
+) -> List[str]:
+    """
+    Build the ffmpeg command that downsizes and recompresses an image.
+
+    Parameters
+    ----------
+    image_path: str
+        The path of the source image, only the first frame of an animated
+        image is kept
+    out_path: str
+        The path of the image to be written
+    max_size: int
+        The maximum width and height, the aspect ratio is kept and smaller
+        images are never upscaled
+    image_format: str
+        Either "jpeg" or "webp"
+    quality: int
+        The quality from 1 (smallest) to 100 (best)
+    ffmpeg: str
+        The ffmpeg executable
+
+    Returns
+    -------
+    List[str]
+        The command
+
+    """
+
+    if image_format not in COMPRESS_FORMATS:
+        err_msg = f"The thumbnail format should be one of {tuple(COMPRESS_FORMATS)}."
+        raise ValueError(err_msg)
+    if not 1 <= quality <= 100:
+        err_msg = f"The thumbnail quality {quality} is not between 1 and 100."
+        raise ValueError(err_msg)
+
+    scale = (
+        f"scale='if(gte(iw,ih),min({max_size},iw),-2)'"
+        + f":'if(lt(iw,ih),min({max_size},ih),-2)'"
+    )
+    if image_format == "jpeg":
+        # The qscale of mjpeg goes from 2 (best) to 31 (smallest)
+        codec = ["-c:v", "mjpeg", "-q:v", str(round(31 - quality * 29 / 100))]
+    else:
+        codec = ["-c:v", "libwebp", "-quality", str(quality)]
+    return (
+        [ffmpeg, "-v", "error", "-y", "-i", image_path, "-vf", scale]
+        + ["-frames:v", "1"]
+        + codec
+        + ["-f", "image2", out_path]
+    )
+
+
+class ThumbnailGenerator:
+    """
+    Class for generating the missing thumbnails with ffmpeg.
+
+    The thumbnails are cached in 'cache_dir', named after the content hash
+    of their media files, so that they are never generated twice, even if
+    the media files have been renamed or copied. A media file without any
+    frame, e.g. audio without cover art, leaves an empty marker instead, so
+    that ffmpeg is not run on it again.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        hash_cache: HashCache,
+        ffmpeg: str = "ffmpeg",
+        ffprobe: str = "ffprobe",
+    ) -> None:
+        """Initialize the generator, check that ffmpeg and ffprobe exist."""
+        self.cache_dir = cache_dir
+        self.hash_cache = hash_cache
+        self.ffmpeg = shutil.which(ffmpeg)
+        self.ffprobe = shutil.which(ffprobe)
+
+    @property
+    def available(self) -> bool:
+        """Return whether ffmpeg and ffprobe are found."""
+        return self.ffmpeg is not None and self.ffprobe is not None
+
+    def thumbnail(self, media_path: str) -> Optional[str]:
+        """Return the path of the cached thumbnail, generate it on a miss."""
+        if self.ffmpeg is None or self.ffprobe is None:
+            return None
+
+        digest = self.hash_cache.digest(media_path)
+        out_path = os.path.join(self.cache_dir, f"{digest}.jpg")
+        if os.path.exists(out_path):
+            return out_path
+        no_frame_path = os.path.join(self.cache_dir, f"{digest}.noframe")
+        if os.path.exists(no_frame_path):
+            return None
+
+        duration = probe_duration(media_path, self.ffprobe)
+        seek = duration * SEEK_FRACTION if duration else 0.0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary file, so that an interrupted run never caches
+        # a truncated thumbnail
+        tmp_path = f"{out_path}.{threading.get_ident()}.tmp.jpg"
+        try:
+            if not extract_frame(media_path, tmp_path, seek, self.ffmpeg):
+                open(no_frame_path, "w").close()
+                return None
+            os.replace(tmp_path, out_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return out_path
+
+
+class ThumbnailCompressor:
+    """
+    Class for downsizing and recompressing the thumbnails with ffmpeg.
+
+    The compressed thumbnails are cached in 'cache_dir', named after the
+    content hash of their sources and the settings, so that repeated runs
+    reuse them, while changing the settings produces new ones. A compressed
+    thumbnail that turns out larger than its source is never used.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        hash_cache: HashCache,
+        max_size: int = THUMBNAIL_WIDTH,
+        image_format: str = "jpeg",
+        quality: int = 85,
+        ffmpeg: str = "ffmpeg",
+    ) -> None:
+        """Initialize the compressor, check the settings and that ffmpeg exists."""
+        if max_size < 2:
+            err_msg = f"The thumbnail size {max_size} is smaller than 2 pixels."
+            raise ValueError(err_msg)
+        # Fail early on invalid settings
+        compress_command("", "", max_size, image_format, quality)
+
+        self.cache_dir = cache_dir
+        self.hash_cache = hash_cache
+        self.max_size = max_size
+        self.image_format = image_format
+        self.quality = quality
+        self.ffmpeg = shutil.which(ffmpeg)
+
+    @property
+    def available(self) -> bool:
+        """Return whether ffmpeg is found."""
+        return self.ffmpeg is not None
+
+    def compress(self, image_path: str) -> str:
+        """Return the path of the thumbnail to upload, compress it on a miss."""
+        if self.ffmpeg is None:
+            return image_path
+
+        digest = self.hash_cache.digest(image_path)
+        ext = COMPRESS_FORMATS[self.image_format]
+        out_name = f"{digest}_{self.max_size}_q{self.quality}.{ext}"
+        out_path = os.path.join(self.cache_dir, out_name)
+        if not os.path.exists(out_path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{out_path}.{threading.get_ident()}.tmp.{ext}"
+            cmd = compress_command(
+                image_path,
+                tmp_path,
+                self.max_size,
+                self.image_format,
+                self.quality,
+                self.ffmpeg,
+            )
+            try:
+                proc = subprocess.run(cmd, capture_output=True, timeout=FFMPEG_TIMEOUT)
+                if proc.returncode != 0 or not os.path.exists(tmp_path):
+                    # Upload the source as is, e.g. a format ffmpeg could not read
+                    return image_path
+                os.replace(tmp_path, out_path)
+            except (OSError, subprocess.SubprocessError):
+                return image_path
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        if os.path.getsize(out_path) >= os.path.getsize(image_path):
+            return image_path
+        return out_path
+
+
+class ThumbnailUrlCache(JsonStore):
+    """
+    Class for a persistent cache of the urls of the uploaded thumbnails.
+
+    The urls are keyed by the channel and the content hash of the thumbnails,
+    so that a cover art shared by a whole series is uploaded once per channel.
+    A url is only trusted for 'ttl' seconds, and the oldest ones are evicted
+    once there are more than 'max_entries'. 'begin_upload' also lets a single
+    caller upload a thumbnail, while the others wait for its url.
+    """
+
+    def __init__(
+        self, path: str, ttl: float = 30 * 24 * 60 * 60, max_entries: int = 10000
+    ) -> None:
+        """Initialize the cache, urls expire after 'ttl' seconds."""
+        if ttl <= 0:
+            err_msg = f"The thumbnail cache ttl {ttl} is not a positive number."
+            raise ValueError(err_msg)
+        if max_entries < 1:
+            err_msg = (
+                f"The thumbnail cache size {max_entries} is not a positive integer."
+            )
+            raise ValueError(err_msg)
+
+        super().__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> the future url of the thumbnail being uploaded
+        self._inflight: Dict[str, "Future[str]"] = {}
+        self._inflight_lock = threading.Lock()
+
+    @staticmethod
+    def key(channel_name: str, digest: str) -> str:
+        """Return the key of a thumbnail within a channel."""
+        return f"{channel_name}:{digest}"
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the url of the thumbnail, or None if unknown or expired."""
+        cached = self.get(key)
+        if cached is None:
+            return None
+        if time.time() - cached["uploaded"] > self.ttl:
+            self.pop(key)
+            return None
+
+        url: str = cached["url"]
+        return url
+
+    def store(self, key: str, url: str) -> None:
+        """Cache the url of the thumbnail, evict the oldest ones if full."""
+        self.set(key, {"url": url, "uploaded": round(time.time(), 3)})
+        if len(self) <= self.max_entries:
+            return
+
+        # Evict a tenth at once, so that a full cache is not sorted every time
+        n_evict = len(self) - self.max_entries + self.max_entries // 10
+        with self._lock:
+            by_age = sorted(self.data.items(), key=lambda item: item[1]["uploaded"])
+        for old_key, _ in by_age[:n_evict]:
+            self.pop(old_key)
+
+    def begin_upload(self, key: str) -> Tuple["Future[str]", bool]:
+        """
+        Return the future url of the thumbnail, and whether to upload it.
+
+        The future is already done if the url is cached. Otherwise only the
+        first caller is told to upload the thumbnail and call 'end_upload',
+        the others get the same future.
+        """
+        # Imported here, as it is slow and the parser imports this module
+        from concurrent.futures import Future
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+
+            future = Future()
+            url = self.lookup(key)
+            if url is not None:
+                future.set_result(url)
+                return future, False
+            self._inflight[key] = future
+            return future, True
+
+    def end_upload(
+        self, key: str, url: Optional[str], exc: Optional[BaseException] = None
+    ) -> None:
+        """Cache the uploaded url, or pass the exception to the waiting callers."""
+        with self._inflight_lock:
+            future = self._inflight.pop(key)
+            if url is not None:
+                self.store(key, url)
+
+        if url is not None:
+            future.set_result(url)
+        else:
+            future.set_exception(exc or RuntimeError("The upload did not return."))
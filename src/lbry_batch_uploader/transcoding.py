@@ -0,0 +1,191 @@
+import os
+import shutil
+import subprocess
+import threading
+from typing import Dict, List, Optional
+from lbry_batch_uploader.utils import TranscodingError
+
+# Only the video files are transcoded, the audio files are published as is
+VIDEO_EXTS = ("mp4", "mkv", "webm")
+# Long videos could take a while on slow machines, but never forever
+TRANSCODE_TIMEOUT = 6 * 60 * 60
+
+
+def transcode_command(
+    src_path: str, dst_path: str, ffmpeg: str = "ffmpeg"
+) -> List[str]:
+    """
+    Build the ffmpeg command that transcodes a video for streaming.
+
+    Parameters
+    ----------
+    src_path: str
+        The path of the source video
+    dst_path: str
+        The path of the mp4 to be written
+    ffmpeg: str
+        The ffmpeg executable
+
+    Returns
+    -------
+    List[str]
+        The command, which produces h264 and aac in an mp4 container with
+        the index at the front, scaled down to at most 1080p, i.e. the same
+        kind of output as the optimize_file option of lbrynet.
+
+    """
+
+    scale = "scale='if(gte(iw,ih),min(1920,iw),-2)':'if(lt(iw,ih),min(1920,ih),-2)'"
+    return [
+        ffmpeg,
+        "-v",
+        "error",
+        "-y",
+        "-i",
+        src_path,
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-crf",
+        "24",
+        "-maxrate",
+        "5500K",
+        "-bufsize",
+        "5000K",
+        "-pix_fmt",
+        "yuv420p",
+        "-vf",
+        scale,
+        "-c:a",
+        "aac",
+        "-b:a",
+        "160k",
+        "-movflags",
+        "+faststart",
+        "-f",
+        "mp4",
+        dst_path,
+    ]
+
+
+class DiskBudget:
+    """
+    Class for limiting the disk space taken by the intermediate files.
+
+    'acquire' blocks until the bytes fit within the limit, so that the
+    transcoding never runs more than 'limit' bytes ahead of the publishing.
+    A single file larger than the limit is still let through on its own.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Initialize the budget with 'limit' bytes."""
+        if limit < 1:
+            err_msg = f"The disk budget {limit} is not a positive integer."
+            raise ValueError(err_msg)
+
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n_bytes: int) -> None:
+        """Reserve the bytes, wait until they fit within the limit."""
+        with self._cond:
+            while self.used and self.used + n_bytes > self.limit:
+                self._cond.wait()
+            self.used += n_bytes
+
+    def release(self, n_bytes: int) -> None:
+        """Give back the reserved bytes."""
+        with self._cond:
+            self.used = max(self.used - n_bytes, 0)
+            self._cond.notify_all()
+
+
+class Transcoder:
+    """
+    Class for transcoding the videos locally with ffmpeg.
+
+    Every transcoded file is reserved in the disk budget by the size of its
+    source until it is written, then by its own size until 'release' removes
+    it, i.e. once it has been published.
+    """
+
+    def __init__(self, out_dir: str, budget: int, ffmpeg: str = "ffmpeg") -> None:
+        """Initialize the transcoder, writing to 'out_dir' within 'budget' bytes."""
+        self.out_dir = out_dir
+        self.budget = DiskBudget(budget)
+        self.ffmpeg = shutil.which(ffmpeg)
+        # The transcoded files and their reserved bytes
+        self._outputs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Return whether ffmpeg is found."""
+        return self.ffmpeg is not None
+
+    def transcode(self, src_path: str, dst_path: str) -> None:
+        """Transcode the video, raise TranscodingError if ffmpeg fails."""
+        if self.ffmpeg is None:
+            raise TranscodingError("ffmpeg is not found in PATH.")
+
+        reserved = os.path.getsize(src_path)
+        self.budget.acquire(reserved)
+        os.makedirs(self.out_dir, exist_ok=True)
+        if shutil.disk_usage(self.out_dir).free < reserved:
+            self.budget.release(reserved)
+            err_msg = (
+                f"Not enough disk space in {self.out_dir} to transcode {src_path}."
+            )
+            raise TranscodingError(err_msg)
+
+        tmp_path = f"{dst_path}.tmp"
+        ffmpeg_err = _run_ffmpeg(transcode_command(src_path, tmp_path, self.ffmpeg))
+        if ffmpeg_err is not None:
+            self.budget.release(reserved)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise TranscodingError(
+                f"ffmpeg failed to transcode {src_path}: {ffmpeg_err}"
+            )
+        os.replace(tmp_path, dst_path)
+
+        # Reserve the actual size from now on, which might be a bit larger
+        size = os.path.getsize(dst_path)
+        self.budget.release(reserved - size)
+        with self._lock:
+            self._outputs[dst_path] = size
+
+    def release(self, dst_path: str) -> None:
+        """Remove a transcoded file, and give back its disk budget."""
+        with self._lock:
+            size = self._outputs.pop(dst_path, None)
+        if size is None:
+            return
+
+        try:
+            os.remove(dst_path)
+        except FileNotFoundError:
+            pass
+        self.budget.release(size)
+
+    def release_all(self) -> None:
+        """Remove all transcoded files, e.g. those not published."""
+        with self._lock:
+            dst_paths = list(self._outputs)
+        for dst_path in dst_paths:
+            self.release(dst_path)
+
+
+def _run_ffmpeg(cmd: List[str]) -> Optional[str]:
+    """Helper function for running ffmpeg, return the error message if any."""
+    try:
+        proc = subprocess.run(cmd, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except (OSError, subprocess.SubprocessError) as e:
+        return str(e)
+    if proc.returncode == 0:
+        return None
+
+    err_lines = proc.stderr.decode(errors="replace").strip().splitlines()
+    return err_lines[-1] if err_lines else f"exit code {proc.returncode}"
@@ -1,10 +1,76 @@
+import asyncio
+import hashlib
 import os
+import signal
+import threading
 import time
-import requests
 from requests import RequestException
 from argparse import Namespace
-from typing import Dict, List
-from lbry_batch_uploader.utils import get_file_name_no_ext, get_file_name_no_ext_clean
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+from lbry_batch_uploader.async_client import AsyncHttpClient
+from lbry_batch_uploader.cache import JsonStore
+from lbry_batch_uploader.capabilities import (
+    CapabilityCache,
+    check_alive,
+    default_cache_path,
+)
+from lbry_batch_uploader.client import HttpClient
+from lbry_batch_uploader.confirmations import ConfirmationTracker
+from lbry_batch_uploader.hashing import HashCache
+from lbry_batch_uploader.journal import UploadJournal
+from lbry_batch_uploader.manifest import iter_manifest
+from lbry_batch_uploader.metrics import MetricsRegistry
+from lbry_batch_uploader.multipart import MultipartEncoder
+from lbry_batch_uploader.names import (
+    NameCache,
+    channel_claim_url,
+    iter_batches,
+    iter_suffixed_names,
+)
+from lbry_batch_uploader.pacing import AimdRateLimiter, TokenBucket
+from lbry_batch_uploader.pipeline import Pipeline, Stage
+from lbry_batch_uploader.profiling import Profiler
+from lbry_batch_uploader.retry import (
+    TRANSIENT_DAEMON_ERRORS,
+    CircuitBreaker,
+    RetryPolicy,
+    is_transient,
+    is_unsent,
+)
+from lbry_batch_uploader.scanner import ScanCache, scan_directory, walk_directories
+from lbry_batch_uploader.thumbnails import (
+    ThumbnailCompressor,
+    ThumbnailGenerator,
+    ThumbnailUrlCache,
+)
+from lbry_batch_uploader.transcoding import VIDEO_EXTS, Transcoder
+from lbry_batch_uploader.utils import (
+    DuplicateFileError,
+    Error,
+    TransientDaemonError,
+    UncertainPublishError,
+    get_file_name_no_ext_clean,
+)
+from lbry_batch_uploader.watcher import DirectoryWatcher
+
+SPEECH_PUBLISH_URL = "https://spee.ch/api/claim/publish"
+STATE_DIR_NAME = ".lbry_batch_uploader"
+# The number of claim names checked by a single resolve call
+RESOLVE_BATCH_SIZE = 200
+# The number of seconds a partial batch waits for more files before it is resolved
+RESOLVE_BATCH_DELAY = 0.5
+# The number of suffixes tried at once for each name that is taken
+SUFFIX_CANDIDATES = 5
+# The transient failures in a row after which an endpoint is left alone,
+# and for how many seconds
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+# A file to be uploaded, i.e. its name without extension and its file names
+_FileItem = Tuple[str, Dict[str, str]]
+_T = TypeVar("_T")
 
 
 class Uploader:
@@ -13,10 +79,103 @@ class Uploader:
     def __init__(self, args: Namespace) -> None:
         """Initialize the class with parsed arguments."""
         self._set_base_path(args.file_directory)
-        self._set_port_url(args.port)
+        self._set_state_dir(args.state_dir)
+        self._set_metrics(args.metrics_textfile, args.metrics_json)
+        self.profiler = Profiler(args.profile, args.profile_mode, args.profile_interval)
+        self.journal = UploadJournal(os.path.join(self.state_dir, "journal.jsonl"))
+        self.resume = args.resume
+        self.dedup = args.dedup
+        self.generate_thumbnails = args.generate_thumbnails
+        self.compress_thumbnails = args.compress_thumbnails
+        self.thumbnail_cache = args.thumbnail_cache
+        self.hash_cache: Optional[HashCache] = None
+        if (
+            self.dedup
+            or self.generate_thumbnails
+            or self.compress_thumbnails
+            or self.thumbnail_cache
+        ):
+            self.hash_cache = HashCache(
+                os.path.join(self.state_dir, "hashes.json"), args.hash_algorithm
+            )
+        if self.dedup:
+            self.content_index = JsonStore(
+                os.path.join(self.state_dir, "contents.json")
+            )
+        self._set_thumbnailer(args.thumbnail_workers)
+        self._set_compressor(
+            args.thumbnail_max_size, args.thumbnail_format, args.thumbnail_quality
+        )
+        self._set_transcoder(
+            args.transcode, args.transcode_workers, args.transcode_budget
+        )
+        if self.thumbnail_cache:
+            self.thumbnail_urls = ThumbnailUrlCache(
+                os.path.join(self.state_dir, "thumbnail_urls.json"),
+                args.thumbnail_cache_ttl * 24 * 60 * 60,
+                args.thumbnail_cache_size,
+            )
+        self.check_names = args.check_names
+        if self.check_names != "off":
+            self.name_cache = NameCache(os.path.join(self.state_dir, "names.json"))
+        self.track_confirmations = args.track_confirmations
+        if args.confirm_timeout < 0:
+            err_msg = (
+                f"The confirmation timeout {args.confirm_timeout} "
+                + "is not a non-negative number."
+            )
+            raise ValueError(err_msg)
+        self.confirm_timeout = args.confirm_timeout
+        self._set_pacer(args.rate, args.burst, args.adaptive)
+        if args.retries < 0:
+            err_msg = (
+                f"The number of retries {args.retries} is not a non-negative integer."
+            )
+            raise ValueError(err_msg)
+        self.retry_policy = RetryPolicy(
+            args.retries + 1, args.retry_delay, on_retry=self._print_retry
+        )
+        self.breakers = {
+            endpoint: CircuitBreaker(endpoint, BREAKER_THRESHOLD, BREAKER_RESET_TIMEOUT)
+            for endpoint in ("lbrynet", "spee.ch")
+        }
+        self._set_workers(args.workers)
+        self.use_async = args.use_async
+        self.recursive = args.recursive
+        if args.scan_workers < 1:
+            err_msg = (
+                f"The number of scan workers {args.scan_workers} "
+                + "is not a positive integer."
+            )
+            raise ValueError(err_msg)
+        self.scan_workers = args.scan_workers
+        self.watch = args.watch
+        if self.watch and self.recursive:
+            raise ValueError("--watch could not be combined with --recursive.")
+        self._set_manifest(args.manifest)
+        if args.settle_seconds < 0:
+            err_msg = (
+                f"The settle time {args.settle_seconds} "
+                + "is not a non-negative number."
+            )
+            raise ValueError(err_msg)
+        self.settle_seconds = args.settle_seconds
+        self.scan_cache: Optional[ScanCache] = None
+        if args.scan_cache:
+            self.scan_cache = ScanCache(os.path.join(self.state_dir, "scan_cache.json"))
+        self.timeout = (args.connect_timeout, args.read_timeout)
+        # One pooled connection per worker, plus one for the main thread
+        self.client = HttpClient(pool_size=self.workers + 1, timeout=self.timeout)
+        self._set_capabilities(
+            args.capability_ttl, args.refresh_capabilities, args.port
+        )
+        # Transcoding locally replaces the optimize_file of lbrynet
+        check_ffmpeg = args.optimize_file and not self.transcode
+        has_ffmpeg = self._set_port_url(args.port, check_ffmpeg)
+        self.speech_url = args.speech_url or SPEECH_PUBLISH_URL
         self.base_params = {
             "channel_name": args.channel_name,
-            "optimize_file": args.optimize_file and self._has_ffmpeg(),
+            "optimize_file": has_ffmpeg,
             "bid": args.bid,
             "tags": args.tags,
             "languages": args.languages,
@@ -31,62 +190,653 @@ class Uploader:
             self.base_params["license_url"] = args.license_url
 
     def get_all_files(self) -> None:
-        """Get all valid files, and their descriptions and thumbnails."""
-        files_name_all = os.listdir(self.base_path)
-        files_name_valid = self._get_valid_files(files_name_all)
-        files_name_valid_no_ext = [
-            get_file_name_no_ext(name) for name in files_name_valid
-        ]
+        """
+        Get all valid files, and their descriptions and thumbnails.
 
+        With --recursive, the directory tree is instead walked lazily by
+        upload_all_files, which adds the files to 'files_valid' as they are
+        found, so that uploading starts before the walk has finished.
+        With --watch, only the files that have settled are returned here,
+        and the rest are added by upload_all_files as they settle.
+        With --manifest, the manifest is streamed by upload_all_files and
+        'files_valid' stays empty, so that memory does not grow with it.
+        """
         self.files_valid: Dict[str, Dict[str, str]] = {}
-        for fn, fn_no_ext in zip(files_name_valid, files_name_valid_no_ext):
-            self.files_valid[fn_no_ext] = {
-                "file_name": fn,
-                "desc_name": "",
-                "thumbnail_name": "",
-            }
-
-        self._get_valid_ftypes(files_name_all, "descriptions", ("txt", "description"))
+        if self.recursive or self.manifest is not None:
+            return
+        if self.watch:
+            self.watcher = DirectoryWatcher(self.base_path, self.settle_seconds)
+            self.files_valid = self.watcher.start()
+            return
 
-        self._get_valid_ftypes(files_name_all, "thumbnails", ("gif", "jpg", "png"))
+        with self.metrics.time("stage_seconds", "stage_errors_total", stage="scan"):
+            _, self.files_valid, _ = scan_directory(self.base_path, "", self.scan_cache)
+        if self.scan_cache is not None:
+            self.scan_cache.save()
 
     def upload_all_files(self) -> None:
-        """Upload all valid files to lbrynet."""
-        for idx, (name_no_ext, params) in enumerate(self.files_valid.items()):
-            file_params = self.base_params.copy()
-            file_params["title"] = name_no_ext
-            file_params["name"] = get_file_name_no_ext_clean(name_no_ext)
-
-            if file_params["optimize_file"]:
-                file_ext = params["file_name"].split(".")[-1]
-                file_name = f"{name_no_ext}_fixed.{file_ext}"
+        """Upload all valid files to lbrynet, up to 'workers' files at a time."""
+        self.claim_ids: Dict[str, str] = {}
+        self.failures: Dict[str, str] = {}
+        self.skipped: Dict[str, str] = {}
+        self.collisions: Dict[str, str] = {}
+        self._planned_names: Dict[str, str] = {}
+        self._started: Dict[str, float] = {}
+        self._digests: Dict[str, str] = {}
+        self._digests_pending: Dict[str, str] = {}
+        self._digests_lock = threading.Lock()
+        self._transcoded: Dict[str, str] = {}
+        self._transcoded_lock = threading.Lock()
+
+        self._n_pending = 0
+        self._n_uploaded_before = 0
+        if self.track_confirmations:
+            self.tracker = ConfirmationTracker(self._check_confirmations)
+            self.tracker.start()
+
+        finished = False
+        try:
+            if self.use_async:
+                if asyncio.run(self._upload_all_files_async()):
+                    # Drained after Ctrl-C, as the threaded pipeline does
+                    raise KeyboardInterrupt
+            else:
+                self._upload_all_files_threaded()
+            finished = True
+        except KeyboardInterrupt:
+            if not self.watch:
+                raise
+            finished = True
+            print(f"Stopped watching {self.base_path}", end="\n\n")
+        finally:
+            if self.track_confirmations:
+                # Only wait for the confirmations if all files were published
+                self._wait_confirmations(self.confirm_timeout if finished else 0)
+            if self.watch:
+                self.watcher.close()
+            self.journal.close()
+            if self.transcode:
+                # The files that have not been published are removed too
+                self.transcoder.release_all()
+            if self.hash_cache is not None:
+                self.hash_cache.save()
+            if self.dedup:
+                self.content_index.save()
+            if self.check_names != "off":
+                self.name_cache.save()
+            if self.thumbnail_cache:
+                self.thumbnail_urls.save()
+            self._export_metrics()
+
+        if self.resume:
+            skip_msg = (
+                f"Skipped {self._n_uploaded_before} files already in the journal."
+            )
+            print(skip_msg, end="\n\n")
+        if self.skipped:
+            skip_msg = f"Skipped {len(self.skipped)} files with duplicate content."
+            print(skip_msg, end="\n\n")
+        if self.collisions:
+            skip_msg = (
+                f"Skipped {len(self.collisions)} files "
+                + "whose claim name is already taken."
+            )
+            print(skip_msg, end="\n\n")
+
+        summary_msg = (
+            f"Uploaded {len(self.claim_ids)} of {self._n_pending} files, "
+            + f"{len(self.failures)} failed."
+        )
+        print(summary_msg, end="\n\n")
+
+        if self.track_confirmations:
+            n_txs = (
+                len(self.tracker.confirmed)
+                + len(self.tracker.failed)
+                + len(self.tracker.pending)
+            )
+            confirm_msg = (
+                f"Confirmed {len(self.tracker.confirmed)} of {n_txs} transactions, "
+                + f"{len(self.tracker.failed)} failed, "
+                + f"{len(self.tracker.pending)} still pending."
+            )
+            print(confirm_msg, end="\n\n")
+
+    def _wait_confirmations(self, timeout: float) -> None:
+        """Wait for the publish transactions, then save their final status."""
+        n_pending = len(self.tracker.pending)
+        if n_pending and timeout:
+            wait_msg = (
+                f"Waiting up to {timeout:g} seconds "
+                + f"for {n_pending} transactions to confirm."
+            )
+            print(wait_msg, end="\n\n")
+        self.tracker.close(timeout)
+
+        report = JsonStore(os.path.join(self.state_dir, "confirmations.json"))
+        for status, txids in (
+            ("confirmed", self.tracker.confirmed),
+            ("failed", self.tracker.failed),
+            ("pending", self.tracker.pending),
+        ):
+            for txid, file_name in txids.items():
+                report.set(file_name, {"txid": txid, "status": status})
+        report.save()
+
+        for txid, file_name in self.tracker.failed.items():
+            fail_msg = (
+                f"Failed to confirm {file_name}\n"
+                + f"The transaction {txid} is no longer in the wallet."
+            )
+            print(fail_msg, end="\n\n")
+
+    def _check_confirmations(self, txids: List[str]) -> Dict[str, int]:
+        """Get the confirmations of the publish transactions in the wallet."""
+        json_txo = {
+            "method": "txo_list",
+            "params": {"txid": txids, "type": "stream", "page_size": len(txids)},
+        }
+        with self.metrics.time("rpc_seconds", "rpc_errors_total", method="txo_list"):
+            req_json: dict = self.client.post(self.port_url, json=json_txo)
+            req_result: dict = self._get_req_info(req_json, "result")
+        return {item["txid"]: item["confirmations"] for item in req_result["items"]}
+
+    def _iter_files(self) -> Iterator[_FileItem]:
+        """Iterate over all valid files, as soon as they are found."""
+        if self.manifest is not None:
+            yield from iter_manifest(self.manifest)
+            return
+
+        if not self.recursive:
+            yield from list(self.files_valid.items())
+            if self.watch:
+                for name_no_ext, params in self.watcher:
+                    self.files_valid[name_no_ext] = params
+                    yield name_no_ext, params
+            return
+
+        walker = walk_directories(self.base_path, self.scan_workers, self.scan_cache)
+        try:
+            for rel_dir, files_dir in walker:
+                for name_no_ext, params in files_dir.items():
+                    key = os.path.join(rel_dir, name_no_ext)
+                    params = {
+                        k: os.path.join(rel_dir, name) if name else ""
+                        for k, name in params.items()
+                    }
+                    self.files_valid[key] = params
+                    yield key, params
+        finally:
+            if self.scan_cache is not None:
+                self.scan_cache.save()
+
+    def _iter_pending_files(self) -> Iterator[_FileItem]:
+        """Iterate over the files to be uploaded, check their claim names."""
+        files = self._iter_unrecorded_files()
+        if self.check_names == "off":
+            return files
+
+        return self._iter_checked_files(files)
+
+    def _iter_unrecorded_files(self) -> Iterator[_FileItem]:
+        """Iterate over all valid files, skip those in the journal."""
+        uploaded = self.journal.load() if self.resume else {}
+        for name_no_ext, params in self._iter_files():
+            if params["file_name"] in uploaded:
+                self._n_uploaded_before += 1
+                continue
+            self._n_pending += 1
+            yield name_no_ext, params
+
+    def _iter_checked_files(self, files: Iterator[_FileItem]) -> Iterator[_FileItem]:
+        """Iterate over the files, resolve their claim names in batches."""
+        # A partial batch is resolved once the files stall, e.g. with --watch
+        for batch in iter_batches(files, RESOLVE_BATCH_SIZE, RESOLVE_BATCH_DELAY):
+            yield from self._check_names(batch)
+
+    def _check_names(self, batch: List[_FileItem]) -> Iterator[_FileItem]:
+        """Report or suffix the taken claim names of a batch of files."""
+        names = [
+            self._get_claim_name(name_no_ext, params) for name_no_ext, params in batch
+        ]
+        taken = self._resolve_names(names)
+
+        # index -> the reason why its claim name could not be used
+        collided: Dict[int, str] = {}
+        for idx, name in enumerate(names):
+            if name in taken:
+                collided[idx] = (
+                    f"The claim name {name} is already taken "
+                    + f"by claim {taken[name]} in the channel."
+                )
+            elif name in self._planned_names:
+                collided[idx] = (
+                    f"The claim name {name} is also used "
+                    + f"by {self._planned_names[name]}."
+                )
             else:
-                file_name = params["file_name"]
-            file_params["file_path"] = os.path.join(self.base_path, file_name)
+                self._planned_names[name] = batch[idx][1]["file_name"]
 
-            if params["desc_name"]:
-                full_path = os.path.join(self.base_path, params["desc_name"])
-                with open(full_path, "r") as f:
-                    file_params["description"] = f.read()
+        if self.check_names == "suffix":
+            self._suffix_names(batch, names, list(collided))
+
+        for idx, (name_no_ext, params) in enumerate(batch):
+            if idx not in collided:
+                yield name_no_ext, params
+            elif self.check_names == "report":
+                self.collisions[params["file_name"]] = collided[idx]
+                print(f"Skipped {params['file_name']}\n{collided[idx]}", end="\n\n")
+            else:
+                rename_msg = (
+                    f"Renamed {params['file_name']}\n{collided[idx]}\n"
+                    + f"The claim name is {names[idx]} instead."
+                )
+                print(rename_msg, end="\n\n")
+                yield name_no_ext, dict(params, claim_name=names[idx])
+
+    def _suffix_names(
+        self, batch: List[_FileItem], names: List[str], indices: List[int]
+    ) -> None:
+        """Replace the collided names with the first free suffixed names."""
+        suffixes = {idx: iter_suffixed_names(names[idx]) for idx in indices}
+        while suffixes:
+            # A single resolve call checks a few suffixes of every name
+            candidates = {
+                idx: list(islice(names_iter, SUFFIX_CANDIDATES))
+                for idx, names_iter in suffixes.items()
+            }
+            taken = self._resolve_names(
+                [name for names_idx in candidates.values() for name in names_idx]
+            )
+            for idx, names_idx in candidates.items():
+                for name in names_idx:
+                    if name not in taken and name not in self._planned_names:
+                        names[idx] = name
+                        self._planned_names[name] = batch[idx][1]["file_name"]
+                        del suffixes[idx]
+                        break
+
+    def _resolve_names(self, names: List[str]) -> Dict[str, str]:
+        """Resolve the claim names in the channel, return the taken ones."""
+        channel_name = self.base_params["channel_name"]
+        taken: Dict[str, str] = {}
+        unknown = []
+        for name in dict.fromkeys(names):
+            claim_id = self.name_cache.lookup(channel_claim_url(channel_name, name))
+            if claim_id is None:
+                unknown.append(name)
+            elif claim_id:
+                taken[name] = claim_id
+        if not unknown:
+            return taken
+
+        urls = [channel_claim_url(channel_name, name) for name in unknown]
+        json_resolve = {"method": "resolve", "params": {"urls": urls}}
+        req_result = self._call_daemon(json_resolve)
+        for name, url in zip(unknown, urls):
+            resolved: dict = req_result.get(url) or {}
+            claim_id = resolved.get("claim_id", "")
+            if claim_id:
+                taken[name] = claim_id
+            # Only cache the urls that are known to be free, not other errors
+            error_name = (resolved.get("error") or {}).get("name")
+            if claim_id or error_name == "NOT_FOUND":
+                self.name_cache.store(url, claim_id)
+
+        return taken
+
+    def _upload_all_files_threaded(self) -> None:
+        """Upload the files through a pipeline of worker threads."""
+        funcs: List[Tuple[str, Callable[..., Any], int]] = [
+            ("metadata", self._prepare_one, self.workers),
+            ("publish", self._publish_one, self.workers),
+        ]
+        if self.transcode:
+            funcs.insert(0, ("transcode", self._transcode_one, self.transcode_workers))
+        if self.generate_thumbnails or self.compress_thumbnails:
+            funcs.insert(
+                0, ("thumbnail", self._process_thumbnail, self.thumbnail_workers)
+            )
+        if self.dedup:
+            funcs.insert(0, ("hash", self._check_duplicate, self.workers))
+        # Every stage records the latency of its files
+        stages = [
+            Stage(name, self._timed_stage(name, func), workers)
+            for name, func, workers in funcs
+        ]
+
+        # On Ctrl-C, the files already being processed are still reported
+        pipeline = Pipeline(stages, maxsize=self.workers, on_close=self._stop_feeding)
+        for (_, params), future in pipeline.run(self._iter_pending_files()):
+            self._report_upload(params, future)
+
+    def _stop_feeding(self) -> None:
+        """Stop looking for new files, once the pipeline has been closed."""
+        print(
+            "Finishing the files in progress, press Ctrl-C again to abort.",
+            end="\n\n",
+        )
+        if self.watch:
+            # Otherwise the source thread keeps waiting for new files
+            self.watcher.close()
+
+    async def _upload_all_files_async(self) -> bool:
+        """Upload the files with 'workers' coroutines on one event loop.
+
+        Return True if Ctrl-C stopped it, once the files in progress are done.
+        """
+        self.aclient = AsyncHttpClient(pool_size=self.workers, timeout=self.timeout)
+        loop = asyncio.get_event_loop()
+        files_iter = self._iter_pending_files()
+        # Iterate over the files on a single thread, so that scanning the
+        # directories never blocks the event loop
+        source_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="source")
+        if self.generate_thumbnails or self.compress_thumbnails:
+            self._thumbnail_executor = ThreadPoolExecutor(
+                max_workers=self.thumbnail_workers, thread_name_prefix="thumbnail"
+            )
+        if self.transcode:
+            self._transcode_executor = ThreadPoolExecutor(
+                max_workers=self.transcode_workers, thread_name_prefix="transcode"
+            )
+
+        interrupted = False
+
+        def on_interrupt() -> None:
+            nonlocal interrupted
+            interrupted = True
+            # A second Ctrl-C raises KeyboardInterrupt, which cancels the uploads
+            loop.remove_signal_handler(signal.SIGINT)
+            self._stop_feeding()
+
+        try:
+            # Otherwise Ctrl-C cancels the uploads before they are journaled
+            loop.add_signal_handler(signal.SIGINT, on_interrupt)
+            handles_interrupt = True
+        except (NotImplementedError, RuntimeError):
+            # On Windows or outside the main thread
+            handles_interrupt = False
+
+        async def worker() -> None:
+            while True:
+                item = await loop.run_in_executor(
+                    source_executor, next, files_iter, None
+                )
+                if item is None or interrupted:
+                    break
+                name_no_ext, params = item
+                task = asyncio.ensure_future(
+                    self._upload_one_async(name_no_ext, params)
+                )
+                await asyncio.wait([task])
+                self._report_upload(params, task)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.workers)))
+        finally:
+            if handles_interrupt and not interrupted:
+                loop.remove_signal_handler(signal.SIGINT)
+            if self.watch:
+                # Otherwise the source thread keeps waiting for new files
+                self.watcher.close()
+            source_executor.shutdown(wait=True)
+            if self.generate_thumbnails or self.compress_thumbnails:
+                self._thumbnail_executor.shutdown(wait=True)
+            if self.transcode:
+                self._transcode_executor.shutdown(wait=True)
+            await self.aclient.close()
+
+        return interrupted
+
+    def _check_duplicate(self, item: _FileItem) -> _FileItem:
+        """Hash a single file, raise DuplicateFileError if already published."""
+        params = item[1]
+        file_path = os.path.join(self.base_path, params["file_name"])
+        assert self.hash_cache is not None
+        digest = self.hash_cache.digest(file_path)
+        content_key = f"{self.base_params['channel_name']}:{digest}"
+
+        with self._digests_lock:
+            claim_id = self.content_index.get(content_key)
+            if claim_id is not None:
+                err_msg = f"The same content has been published as claim {claim_id}."
+                raise DuplicateFileError(err_msg)
+
+            file_name_dup = self._digests_pending.get(content_key)
+            if file_name_dup is not None:
+                err_msg = f"The same content is being uploaded as {file_name_dup}."
+                raise DuplicateFileError(err_msg)
+
+            self._digests_pending[content_key] = params["file_name"]
+            self._digests[params["file_name"]] = content_key
+
+        return item
+
+    def _release_duplicate(self, file_name: str) -> None:
+        """Let the next file with the same content be uploaded, as this one failed."""
+        with self._digests_lock:
+            content_key = self._digests.pop(file_name, "")
+            if self._digests_pending.get(content_key) == file_name:
+                del self._digests_pending[content_key]
+
+    def _process_thumbnail(self, item: _FileItem) -> _FileItem:
+        """Generate the missing thumbnail of a single file, then compress it."""
+        if self.generate_thumbnails:
+            item = self._generate_thumbnail(item)
+        if self.compress_thumbnails:
+            item = self._compress_thumbnail(item)
+        return item
+
+    def _generate_thumbnail(self, item: _FileItem) -> _FileItem:
+        """Generate the thumbnail of a single file if it has none."""
+        name_no_ext, params = item
+        if params["thumbnail_name"] or "thumbnail_url" in params:
+            return item
+
+        file_path = os.path.join(self.base_path, params["file_name"])
+        thumbnail_path = self.thumbnailer.thumbnail(file_path)
+        if thumbnail_path is None:
+            return item
+
+        # An absolute path is kept as is when joined with 'base_path'
+        return name_no_ext, dict(params, thumbnail_name=thumbnail_path)
+
+    def _compress_thumbnail(self, item: _FileItem) -> _FileItem:
+        """Downsize and recompress the thumbnail of a single file if it has one."""
+        name_no_ext, params = item
+        if not params["thumbnail_name"] or "thumbnail_url" in params:
+            return item
+
+        thumbnail_path = os.path.join(self.base_path, params["thumbnail_name"])
+        compressed_path = self.compressor.compress(thumbnail_path)
+        if compressed_path == thumbnail_path:
+            return item
+
+        return name_no_ext, dict(params, thumbnail_name=compressed_path)
+
+    def _transcode_one(self, item: _FileItem) -> _FileItem:
+        """Transcode a single video, raise TranscodingError if it fails."""
+        name_no_ext, params = item
+        file_ext = params["file_name"].rsplit(".", 1)[-1].lower()
+        if file_ext not in VIDEO_EXTS:
+            return item
+
+        # Flatten the relative path, a short hash keeps the names unique
+        path_hash = hashlib.sha1(params["file_name"].encode()).hexdigest()[:8]
+        file_name = f"{os.path.basename(name_no_ext)}_{path_hash}_fixed.mp4"
+        transcoded_path = os.path.join(self.transcoder.out_dir, file_name)
+        self.transcoder.transcode(
+            os.path.join(self.base_path, params["file_name"]), transcoded_path
+        )
+        with self._transcoded_lock:
+            self._transcoded[params["file_name"]] = transcoded_path
+
+        return name_no_ext, dict(params, transcoded_path=transcoded_path)
+
+    def _prepare_one(self, item: _FileItem) -> dict:
+        """Get the publish parameters of a single file, upload its thumbnail."""
+        name_no_ext, params = item
+        self._started[params["file_name"]] = time.time()
+        file_params = self._get_file_params(name_no_ext, params)
+
+        if "thumbnail_url" in params:
+            file_params["thumbnail_url"] = params["thumbnail_url"]
+        elif params["thumbnail_name"]:
+            full_path = os.path.join(self.base_path, params["thumbnail_name"])
+            file_params["thumbnail_url"] = self._upload_thumbnail(
+                file_params["name"], full_path
+            )
+
+        return file_params
+
+    def _publish_one(self, file_params: dict) -> Tuple[str, str, str]:
+        """Publish a single file, return claim name, id and txid."""
+        # Space out the publish requests according to the pacer
+        with self.metrics.time("pacing_wait_seconds"):
+            self.pacer.acquire()
+        claim_id, txid = self._upload_file(file_params)
+
+        return file_params["name"], claim_id, txid
+
+    async def _upload_one_async(
+        self, name_no_ext: str, params: Dict[str, str]
+    ) -> Tuple[str, str, str]:
+        """Upload a single file with its thumbnail, return claim name, id and txid."""
+        loop = asyncio.get_event_loop()
+        if self.dedup:
+            await loop.run_in_executor(
+                None,
+                self._timed_stage("hash", self._check_duplicate),
+                (name_no_ext, params),
+            )
+        if self.generate_thumbnails or self.compress_thumbnails:
+            name_no_ext, params = await loop.run_in_executor(
+                self._thumbnail_executor,
+                self._timed_stage("thumbnail", self._process_thumbnail),
+                (name_no_ext, params),
+            )
+        if self.transcode:
+            name_no_ext, params = await loop.run_in_executor(
+                self._transcode_executor,
+                self._timed_stage("transcode", self._transcode_one),
+                (name_no_ext, params),
+            )
 
-            if params["thumbnail_name"]:
+        with self.metrics.time("stage_seconds", "stage_errors_total", stage="metadata"):
+            self._started[params["file_name"]] = time.time()
+            file_params = await loop.run_in_executor(
+                None, self._get_file_params, name_no_ext, params
+            )
+
+            if "thumbnail_url" in params:
+                file_params["thumbnail_url"] = params["thumbnail_url"]
+            elif params["thumbnail_name"]:
                 full_path = os.path.join(self.base_path, params["thumbnail_name"])
-                file_params["thumbnail_url"] = self._upload_thumbnail(
+                file_params["thumbnail_url"] = await self._upload_thumbnail_async(
                     file_params["name"], full_path
                 )
 
-            claim_id = self._upload_file(file_params)
-            claim_url = f"lbry://{file_params['name']}#{claim_id}"
-            upload_msg = (
-                f"Sucessfully uploaded {params['file_name']}\n"
-                + f"The claim id is {claim_id}\n"
-                + f"The claim url is {claim_url}"
-            )
-            print(upload_msg, end="\n\n")
+        with self.metrics.time("stage_seconds", "stage_errors_total", stage="publish"):
+            delay = self.pacer.reserve()
+            self.metrics.histogram("pacing_wait_seconds").observe(delay)
+            await asyncio.sleep(delay)
+            claim_id, txid = await self._upload_file_async(file_params)
+
+        return file_params["name"], claim_id, txid
+
+    def _get_file_params(self, name_no_ext: str, params: Dict[str, str]) -> dict:
+        """Get the publish parameters of a single file, except the thumbnail."""
+        file_params = self.base_params.copy()
+        file_params["title"] = params.get("title") or os.path.basename(name_no_ext)
+        file_params["name"] = self._get_claim_name(name_no_ext, params)
+        if "bid" in params:
+            file_params["bid"] = params["bid"]
+        if "tags" in params:
+            tags = (tag.strip() for tag in params["tags"].split(","))
+            file_params["tags"] = [tag for tag in tags if tag]
+
+        if "transcoded_path" in params:
+            file_name = params["transcoded_path"]
+        elif file_params["optimize_file"]:
+            file_ext = params["file_name"].split(".")[-1]
+            file_name = f"{name_no_ext}_fixed.{file_ext}"
+        else:
+            file_name = params["file_name"]
+        file_params["file_path"] = os.path.join(self.base_path, file_name)
+
+        if "description" in params:
+            file_params["description"] = params["description"]
+        elif params["desc_name"]:
+            full_path = os.path.join(self.base_path, params["desc_name"])
+            with open(full_path, "r") as f:
+                file_params["description"] = f.read()
+
+        return file_params
+
+    def _get_claim_name(self, name_no_ext: str, params: Dict[str, str]) -> str:
+        """Get the claim name of a single file, i.e. its cleaned title."""
+        if "claim_name" in params:
+            return params["claim_name"]
+        if self.recursive and not params.get("title"):
+            # e.g. show-season1-episode1, as every season has an episode 1
+            parts = [get_file_name_no_ext_clean(p) for p in name_no_ext.split(os.sep)]
+            return "-".join(part for part in parts if part)
+
+        title = params.get("title") or os.path.basename(name_no_ext)
+        return get_file_name_no_ext_clean(title)
+
+    def _report_upload(
+        self, params: Dict[str, str], future: Union[Future, asyncio.Future]
+    ) -> None:
+        """Record and print the outcome of a finished upload."""
+        if self.transcode:
+            # The transcoded file is no longer needed, whatever the outcome
+            with self._transcoded_lock:
+                transcoded_path = self._transcoded.pop(params["file_name"], None)
+            if transcoded_path is not None:
+                self.transcoder.release(transcoded_path)
+
+        try:
+            claim_name, claim_id, txid = future.result()
+        except DuplicateFileError as e:
+            self.metrics.counter("files_total", outcome="skipped").inc()
+            self.skipped[params["file_name"]] = str(e)
+            print(f"Skipped {params['file_name']}\n{e}", end="\n\n")
+            return
+        except (RequestException, KeyError, ValueError, OSError, Error) as e:
+            if self.dedup:
+                self._release_duplicate(params["file_name"])
+            self.metrics.counter("files_total", outcome="failed").inc()
+            err_desc = f"{type(e).__name__}: {e}"
+            self.failures[params["file_name"]] = err_desc
+            print(f"Failed to upload {params['file_name']}\n{err_desc}", end="\n\n")
+            return
 
-            if idx != len(self.files_valid) - 1:
-                print("Wait 10 seconds to space out uploads...", end="\n\n")
-                time.sleep(10)
+        self.metrics.counter("files_total", outcome="uploaded").inc()
+        self.claim_ids[params["file_name"]] = claim_id
+        if self.track_confirmations and txid:
+            self.tracker.add(txid, params["file_name"])
+        if params["file_name"] in self._digests:
+            self.content_index.set(self._digests[params["file_name"]], claim_id)
+        if self.check_names != "off":
+            channel_name = self.base_params["channel_name"]
+            self.name_cache.store(channel_claim_url(channel_name, claim_name), claim_id)
+        claim_url = f"lbry://{claim_name}#{claim_id}"
+        started = self._started.pop(params["file_name"])
+        self.journal.record(
+            params["file_name"],
+            claim_name,
+            claim_id,
+            claim_url,
+            started,
+            time.time() - started,
+        )
+        upload_msg = (
+            f"Sucessfully uploaded {params['file_name']}\n"
+            + f"The claim id is {claim_id}\n"
+            + f"The claim url is {claim_url}"
+        )
+        print(upload_msg, end="\n\n")
 
     def _get_req_info(self, req_json: dict, info_type: str) -> dict:
         """Get 'result' from json, except error occured in the post request."""
@@ -97,55 +847,38 @@ class Uploader:
         try:
             req_info: dict = req_json[info_type]
         except KeyError as e:
+            if info_type == "result":
+                self.pacer.on_error()
             req_err = req_json["error"]
             req_err_name = req_err["data"]["name"]
             if req_err_name == "ValueError":
                 raise ValueError(req_err["message"]) from None
+            elif _is_transient_daemon_error(req_err_name, req_err["message"]):
+                err_msg = f"{req_err_name}: {req_err['message']}"
+                raise TransientDaemonError(err_msg) from None
             else:
                 print(
                     f"Error msg from lbrynet api:\n {req_err_name}: {req_err['message']}\n\n"
                 )
                 raise e from None
 
+        if info_type == "result":
+            self.pacer.on_success()
         return req_info
 
-    def _get_valid_files(self, files_name_all) -> List[str]:
-        """Get all valid files for upload in the specified directory."""
-        target_ext = ("mp4", "mkv", "webm", "mp3", "opus")
-        files_name_valid = []
-        for name in files_name_all:
-            ext = name.split(".")[-1]
-            if ext in target_ext:
-                files_name_valid.append(name)
-        return sorted(files_name_valid)
-
-    def _get_valid_ftypes(self, files_name_all, f_type, target_ext) -> None:
-        """Get all valid desc/thumbnails for the corresponding files."""
-        if (f_type != "descriptions") and (f_type != "thumbnails"):
-            err_msg = "Only support getting thumbnails or descriptions."
-            raise ValueError(err_msg)
-
-        for name_no_ext, finfos in self.files_valid.items():
-            target_names = [f"{name_no_ext}.{ext}" for ext in target_ext]
-            for name in target_names:
-                if name in files_name_all:
-                    if f_type == "descriptions":
-                        finfos["desc_name"] = name
-                    else:
-                        finfos["thumbnail_name"] = name
-                    break
+    def _get_version(self) -> str:
+        """Get the version of lbrynet, raise ConnectionError if unreachable."""
+        with self.metrics.time("rpc_seconds", "rpc_errors_total", method="version"):
+            req_json: dict = self.client.post(self.port_url, json={"method": "version"})
+        return str((req_json.get("result") or {}).get("version", ""))
 
     def _has_ffmpeg(self) -> bool:
         """Helper function for verifying proper configuration of ffmpeg."""
         json_ffmpeg = {"method": "ffmpeg_find"}
-        req_json: dict = post_req(self.port_url, json=json_ffmpeg)
-        req_result: dict = self._get_req_info(req_json, "result")
+        with self.metrics.time("rpc_seconds", "rpc_errors_total", method="ffmpeg_find"):
+            req_json: dict = self.client.post(self.port_url, json=json_ffmpeg)
+            req_result: dict = self._get_req_info(req_json, "result")
         req_result_avail: bool = req_result["available"]
-
-        if not req_result_avail:
-            msg = "ffmpeg is not configured properly." + "--optimize-file set to False."
-            print(msg)
-
         return req_result_avail
 
     def _set_base_path(self, path: str) -> None:
@@ -157,45 +890,426 @@ class Uploader:
             err_msg = f"The directory {path_abs} does not exist."
             raise FileNotFoundError(err_msg)
 
-    def _set_port_url(self, port: int) -> None:
-        """Set 'path_url', check value and availability."""
+    def _set_manifest(self, path: Optional[str]) -> None:
+        """Set 'manifest', check existence and convert to absolute."""
+        if path is None:
+            self.manifest: Optional[str] = None
+            return
+        if self.recursive or self.watch:
+            err_msg = "--manifest could not be combined with --recursive or --watch."
+            raise ValueError(err_msg)
+
+        path_abs = os.path.abspath(path)
+        if not os.path.isfile(path_abs):
+            err_msg = f"The manifest {path_abs} does not exist."
+            raise FileNotFoundError(err_msg)
+        self.manifest = path_abs
+
+    def _set_capabilities(self, ttl: float, refresh: bool, port: int) -> None:
+        """Set 'capabilities', which caches the probes of lbrynet across runs."""
+        if ttl < 0:
+            err_msg = f"The capability ttl {ttl} is not a non-negative number."
+            raise ValueError(err_msg)
+        self.capabilities: Optional[CapabilityCache] = None
+        if not ttl:
+            return
+
+        self.capabilities = CapabilityCache(default_cache_path(), ttl)
+        if refresh:
+            # Probed again, and cached again afterwards
+            self.capabilities.invalidate(port)
+
+    def _save_capabilities(self) -> None:
+        """Save the capability cache, which is only an optimization."""
+        if self.capabilities is None:
+            return
+        try:
+            self.capabilities.save()
+        except OSError:
+            # e.g. a read-only home directory, probe every time instead
+            pass
+
+    def _set_metrics(self, textfile: Optional[str], json_path: Optional[str]) -> None:
+        """Set 'metrics', which times the stages and requests of the run."""
+        self.metrics_textfile = textfile
+        self.metrics_json = json_path
+        self.metrics = MetricsRegistry()
+        for name, help_text in (
+            ("stage_seconds", "Seconds spent on a file by a pipeline stage."),
+            ("stage_errors_total", "Files that failed in a pipeline stage."),
+            ("rpc_seconds", "Seconds spent on a request to lbrynet or spee.ch."),
+            ("rpc_errors_total", "Requests to lbrynet or spee.ch that failed."),
+            ("pacing_wait_seconds", "Seconds a publish waited for the pacer."),
+            ("files_total", "Files by outcome, i.e. uploaded, failed or skipped."),
+            ("run_seconds", "Seconds since the start of the run."),
+        ):
+            self.metrics.describe(name, help_text)
+
+    def _set_pacer(self, rate: float, burst: int, adaptive: bool) -> None:
+        """Set 'pacer', which spaces out the publish requests."""
+        if adaptive:
+            self.pacer: TokenBucket = AimdRateLimiter(rate, burst)
+        else:
+            self.pacer = TokenBucket(rate, burst)
+
+    def _set_port_url(self, port: int, check_ffmpeg: bool = False) -> bool:
+        """Set 'port_url', check value and availability, return whether ffmpeg is."""
         if (port < 0) or (port > 65353):
             err_msg = f"The port {port} is not between 0 and 65353."
             raise TypeError(err_msg)
 
-        # Check that the provided port is accessible
-        port_url = f"http://localhost:{port}"
-        _ = post_req(port_url, json={"method": "version"})
+        self.port_url = f"http://localhost:{port}"
+        cache = self.capabilities
+        version = None if cache is None else cache.version(port)
+        has_ffmpeg: Optional[bool] = None
+        if version is not None:
+            assert cache is not None
+            # lbrynet answered recently, only check that it is still up
+            try:
+                check_alive("localhost", port)
+            except ConnectionError:
+                # Forget it, the probes below fail as usual if it is down
+                cache.invalidate(port)
+                self._save_capabilities()
+                version = None
+            if version is not None and check_ffmpeg:
+                has_ffmpeg = cache.ffmpeg(port, version)
 
-        self.port_url = port_url
+        if version is None and check_ffmpeg:
+            # Both are round trips to lbrynet, which could be slow to answer
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                version_future = executor.submit(self._get_version)
+                ffmpeg_future = executor.submit(self._has_ffmpeg)
+            version = version_future.result()
+            has_ffmpeg = ffmpeg_future.result()
+            if cache is not None and version:
+                cache.store_version(port, version)
+                cache.store_ffmpeg(port, version, has_ffmpeg)
+        elif version is None:
+            # Check that the provided port is accessible
+            version = self._get_version()
+            if cache is not None and version:
+                cache.store_version(port, version)
 
-    def _upload_file(self, file_params: dict) -> str:
-        """Upload a single file to LBRY, return claim id."""
-        json_uploadfile = {"method": "publish", "params": file_params}
-        req_json: dict = post_req(self.port_url, json=json_uploadfile)
-        req_result: dict = self._get_req_info(req_json, "result")
+        if check_ffmpeg and has_ffmpeg is None:
+            # The version is cached, but ffmpeg has not been asked about yet
+            has_ffmpeg = self._has_ffmpeg()
+            if cache is not None:
+                cache.store_ffmpeg(port, version, has_ffmpeg)
+        self._save_capabilities()
+
+        if check_ffmpeg and not has_ffmpeg:
+            msg = "ffmpeg is not configured properly." + "--optimize-file set to False."
+            print(msg)
+        return bool(has_ffmpeg)
+
+    def _set_state_dir(self, path: Optional[str]) -> None:
+        """Set 'state_dir', which keeps the journal, default to base_path."""
+        if path is None:
+            self.state_dir = os.path.join(self.base_path, STATE_DIR_NAME)
+        else:
+            self.state_dir = os.path.abspath(path)
+
+    def _set_thumbnailer(self, workers: Optional[int]) -> None:
+        """Set 'thumbnailer', check that ffmpeg and ffprobe are installed."""
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            err_msg = (
+                f"The number of thumbnail workers {workers} is not a positive integer."
+            )
+            raise ValueError(err_msg)
+        self.thumbnail_workers = workers
+        if not self.generate_thumbnails:
+            return
+
+        assert self.hash_cache is not None
+        self.thumbnailer = ThumbnailGenerator(
+            os.path.join(self.state_dir, "thumbnails"), self.hash_cache
+        )
+        if not self.thumbnailer.available:
+            msg = (
+                "ffmpeg or ffprobe is not found in PATH. "
+                + "--generate-thumbnails set to False."
+            )
+            print(msg)
+            self.generate_thumbnails = False
+
+    def _set_compressor(self, max_size: int, image_format: str, quality: int) -> None:
+        """Set 'compressor', which downsizes and recompresses the thumbnails."""
+        if not self.compress_thumbnails:
+            return
+
+        assert self.hash_cache is not None
+        self.compressor = ThumbnailCompressor(
+            os.path.join(self.state_dir, "compressed"),
+            self.hash_cache,
+            max_size,
+            image_format,
+            quality,
+        )
+        if not self.compressor.available:
+            print("ffmpeg is not found in PATH. --compress-thumbnails set to False.")
+            self.compress_thumbnails = False
+
+    def _set_transcoder(
+        self, transcode: bool, workers: Optional[int], budget_gb: float
+    ) -> None:
+        """Set 'transcoder', which transcodes the videos within a disk budget."""
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            err_msg = (
+                f"The number of transcode workers {workers} is not a positive integer."
+            )
+            raise ValueError(err_msg)
+        if budget_gb <= 0:
+            err_msg = f"The transcode budget {budget_gb} GB is not a positive number."
+            raise ValueError(err_msg)
+        self.transcode_workers = workers
+        self.transcode = transcode
+        if not self.transcode:
+            return
+
+        self.transcoder = Transcoder(
+            os.path.join(self.state_dir, "transcoded"), int(budget_gb * 1024**3)
+        )
+        if not self.transcoder.available:
+            print("ffmpeg is not found in PATH. --transcode set to False.")
+            self.transcode = False
+
+    def _set_workers(self, workers: int) -> None:
+        """Set 'workers', the maximum number of concurrent uploads."""
+        if workers < 1:
+            err_msg = f"The number of workers {workers} is not a positive integer."
+            raise ValueError(err_msg)
+
+        self.workers = workers
+
+    def _timed_stage(self, name: str, func: Callable[..., _T]) -> Callable[..., _T]:
+        """Wrap the function of a stage, so that it is timed and profiled."""
+
+        def timed(*args):
+            with self.profiler.stage(name), self.metrics.time(
+                "stage_seconds", "stage_errors_total", stage=name
+            ):
+                return func(*args)
+
+        return timed
+
+    def _export_metrics(self) -> None:
+        """Write the metrics to the Prometheus textfile and the json summary."""
+        self.metrics.gauge("run_seconds").set(time.time() - self.metrics.started)
+        try:
+            if self.metrics_textfile is not None:
+                self.metrics.write_textfile(self.metrics_textfile)
+            if self.metrics_json is not None:
+                self.metrics.write_json(self.metrics_json)
+        except OSError as e:
+            print(f"Failed to write the metrics\n{type(e).__name__}: {e}", end="\n\n")
+
+    def _call_daemon(self, json_req: dict) -> dict:
+        """Post a request to lbrynet, retry transient errors, return 'result'."""
+        return self.retry_policy.call(
+            self.breakers["lbrynet"], self._post_daemon, json_req
+        )
+
+    async def _call_daemon_async(self, json_req: dict) -> dict:
+        """Coroutine version of '_call_daemon'."""
+        return await self.retry_policy.call_async(
+            self.breakers["lbrynet"], self._post_daemon_async, json_req
+        )
+
+    def _post_daemon(self, json_req: dict) -> dict:
+        """Post a single request to lbrynet, return 'result'."""
+        with self.metrics.time(
+            "rpc_seconds", "rpc_errors_total", method=json_req["method"]
+        ):
+            req_json: dict = self.client.post(self.port_url, json=json_req)
+            return self._get_req_info(req_json, "result")
+
+    async def _post_daemon_async(self, json_req: dict) -> dict:
+        """Coroutine version of '_post_daemon'."""
+        with self.metrics.time(
+            "rpc_seconds", "rpc_errors_total", method=json_req["method"]
+        ):
+            req_json: dict = await self.aclient.post(self.port_url, json=json_req)
+            return self._get_req_info(req_json, "result")
+
+    def _print_retry(self, error: BaseException, attempt: int, delay: float) -> None:
+        """Print a request that is retried after a transient error."""
+        retry_msg = (
+            f"Attempt {attempt} failed, retrying in {delay:.1f} seconds\n"
+            + f"{type(error).__name__}: {error}"
+        )
+        print(retry_msg, end="\n\n")
+
+    def _upload_file(self, file_params: dict) -> Tuple[str, str]:
+        """Upload a single file to LBRY, return claim id and txid."""
+        req_result = self.retry_policy.call(
+            self.breakers["lbrynet"], self._publish_file, file_params
+        )
         claim_id: str = req_result["outputs"][0]["claim_id"]
-        return claim_id
+        return claim_id, req_result.get("txid", "")
+
+    async def _upload_file_async(self, file_params: dict) -> Tuple[str, str]:
+        """Coroutine version of '_upload_file'."""
+        req_result = await self.retry_policy.call_async(
+            self.breakers["lbrynet"], self._publish_file_async, file_params
+        )
+        claim_id: str = req_result["outputs"][0]["claim_id"]
+        return claim_id, req_result.get("txid", "")
+
+    def _publish_file(self, file_params: dict) -> dict:
+        """Post a single publish, look it up if it might have gone through."""
+        json_uploadfile = {"method": "publish", "params": file_params}
+        try:
+            return self._post_daemon(json_uploadfile)
+        except Exception as e:
+            if not is_transient(e) or is_unsent(e):
+                raise
+            error = e
+
+        # Publishing again might create a second claim, and spend the bid twice
+        try:
+            req_result = self._call_daemon(self._get_published_request(file_params))
+        except Exception:
+            raise self._get_uncertain_error(file_params, error) from None
+        return self._get_published(file_params, req_result, error)
+
+    async def _publish_file_async(self, file_params: dict) -> dict:
+        """Coroutine version of '_publish_file'."""
+        json_uploadfile = {"method": "publish", "params": file_params}
+        try:
+            return await self._post_daemon_async(json_uploadfile)
+        except Exception as e:
+            if not is_transient(e) or is_unsent(e):
+                raise
+            error = e
+
+        json_txo = self._get_published_request(file_params)
+        try:
+            req_result = await self._call_daemon_async(json_txo)
+        except Exception:
+            raise self._get_uncertain_error(file_params, error) from None
+        return self._get_published(file_params, req_result, error)
+
+    def _get_published_request(self, file_params: dict) -> dict:
+        """Get the request listing the streams of the wallet at the claim name."""
+        return {
+            "method": "txo_list",
+            "params": {
+                "type": "stream",
+                "name": file_params["name"],
+                "is_my_output": True,
+                "is_not_spent": True,
+            },
+        }
+
+    def _get_published(
+        self, file_params: dict, req_result: dict, error: Exception
+    ) -> dict:
+        """Return the publish result of a file in the wallet, else raise 'error'."""
+        file_name = os.path.basename(file_params["file_path"])
+        for item in req_result.get("items") or []:
+            source = (item.get("value") or {}).get("source") or {}
+            if source.get("name") == file_name:
+                return {"outputs": [item], "txid": item.get("txid", "")}
+        # Never published, so it is safe to publish again
+        raise error
+
+    def _get_uncertain_error(
+        self, file_params: dict, error: Exception
+    ) -> UncertainPublishError:
+        """Get the error of a publish which may or may not have gone through."""
+        err_msg = (
+            f"{type(error).__name__}: {error}\n"
+            + f"The claim name {file_params['name']} could not be looked up, "
+            + "check the wallet before publishing it again."
+        )
+        return UncertainPublishError(err_msg)
 
     def _upload_thumbnail(self, t_name: str, t_path: str) -> str:
-        """Upload a single thumbnail to spee.ch, return thumbnail url."""
-        with open(t_path, "rb") as f:
-            thumbnail = f.read()
+        """Upload a single thumbnail unless already uploaded, return thumbnail url."""
+        if not self.thumbnail_cache:
+            return self._post_thumbnail(t_name, t_path)
 
-        req_json: dict = post_req(
-            "https://spee.ch/api/claim/publish",
-            files={"file": thumbnail},
-            data={"name": t_name},
+        key = self._get_thumbnail_key(t_path)
+        future, to_upload = self.thumbnail_urls.begin_upload(key)
+        if not to_upload:
+            return future.result()
+
+        try:
+            thumbnail_url = self._post_thumbnail(t_name, t_path)
+        except BaseException as e:
+            self.thumbnail_urls.end_upload(key, None, e)
+            raise
+        self.thumbnail_urls.end_upload(key, thumbnail_url)
+        return thumbnail_url
+
+    async def _upload_thumbnail_async(self, t_name: str, t_path: str) -> str:
+        """Coroutine version of '_upload_thumbnail'."""
+        if not self.thumbnail_cache:
+            return await self._post_thumbnail_async(t_name, t_path)
+
+        loop = asyncio.get_event_loop()
+        key = await loop.run_in_executor(None, self._get_thumbnail_key, t_path)
+        future, to_upload = self.thumbnail_urls.begin_upload(key)
+        if not to_upload:
+            return await asyncio.wrap_future(future)
+
+        try:
+            thumbnail_url = await self._post_thumbnail_async(t_name, t_path)
+        except BaseException as e:
+            self.thumbnail_urls.end_upload(key, None, e)
+            raise
+        self.thumbnail_urls.end_upload(key, thumbnail_url)
+        return thumbnail_url
+
+    def _get_thumbnail_key(self, t_path: str) -> str:
+        """Get the key of a thumbnail in the url cache, i.e. channel and hash."""
+        assert self.hash_cache is not None
+        digest = self.hash_cache.digest(t_path)
+        return ThumbnailUrlCache.key(self.base_params["channel_name"], digest)
+
+    def _post_thumbnail(self, t_name: str, t_path: str) -> str:
+        """Upload a single thumbnail to spee.ch, retry transient errors."""
+        return self.retry_policy.call(
+            self.breakers["spee.ch"], self._send_thumbnail, t_name, t_path
         )
-        req_data: dict = self._get_req_info(req_json, "data")
+
+    async def _post_thumbnail_async(self, t_name: str, t_path: str) -> str:
+        """Coroutine version of '_post_thumbnail'."""
+        return await self.retry_policy.call_async(
+            self.breakers["spee.ch"], self._send_thumbnail_async, t_name, t_path
+        )
+
+    def _send_thumbnail(self, t_name: str, t_path: str) -> str:
+        """Send a single thumbnail to spee.ch, return thumbnail url."""
+        with self.metrics.time(
+            "rpc_seconds", "rpc_errors_total", method="thumbnail_upload"
+        ):
+            with MultipartEncoder({"name": t_name}, {"file": t_path}) as body:
+                req_json: dict = self.client.post(self.speech_url, data=body)
+            req_data: dict = self._get_req_info(req_json, "data")
+        thumbnail_url: str = req_data["serveUrl"]
+        return thumbnail_url
+
+    async def _send_thumbnail_async(self, t_name: str, t_path: str) -> str:
+        """Coroutine version of '_send_thumbnail'."""
+        with self.metrics.time(
+            "rpc_seconds", "rpc_errors_total", method="thumbnail_upload"
+        ):
+            with MultipartEncoder({"name": t_name}, {"file": t_path}) as body:
+                req_json: dict = await self.aclient.post(self.speech_url, data=body)
+            req_data: dict = self._get_req_info(req_json, "data")
         thumbnail_url: str = req_data["serveUrl"]
         return thumbnail_url
 
 
-def post_req(port_url: str, **kwargs) -> dict:
-    """Helper function for submitting post request, return json response."""
-    try:
-        req_json: dict = requests.post(port_url, **kwargs).json()
-        return req_json
-    except RequestException as e:
-        raise e from None
+def _is_transient_daemon_error(name: str, message: str) -> bool:
+    """Helper function for telling whether a lbrynet error is worth retrying."""
+    message = message.lower()
+    return name in TRANSIENT_DAEMON_ERRORS or any(
+        hint in message for hint in ("busy", "timed out", "timeout", "try again")
+    )
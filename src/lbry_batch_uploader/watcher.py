@@ -0,0 +1,260 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from lbry_batch_uploader.scanner import classify_entries, classify_name
+
+# The inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+_CHANGED = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_REMOVED = IN_MOVED_FROM | IN_DELETE
+_GONE = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+
+# struct inotify_event, followed by a null-padded name of 'len' bytes
+_EVENT_HEADER = struct.Struct("iIII")
+
+# The watch descriptor, mask, cookie and file name of an inotify event
+InotifyEvent = Tuple[int, int, int, str]
+
+
+class Inotify:
+    """Class for a minimal ctypes binding of the Linux inotify api."""
+
+    def __init__(self) -> None:
+        """Initialize a non-blocking inotify instance."""
+        libc_name = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except (OSError, AttributeError):
+            raise OSError("inotify is not available on this platform.") from None
+
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._add_watch.restype = ctypes.c_int
+        fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd: int = fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """Watch the path for the events in 'mask', return the descriptor."""
+        wd: int = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read_events(self, timeout: Optional[float] = None) -> List[InotifyEvent]:
+        """Wait at most 'timeout' seconds, return the pending events."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            end = offset + length
+            name = os.fsdecode(buf[offset:end].rstrip(b"\0"))
+            offset = end
+            events.append((wd, mask, cookie, name))
+
+        return events
+
+    def close(self) -> None:
+        """Close the inotify instance, which removes all watches."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DirectoryWatcher:
+    """
+    Class for watching a directory for new files to be uploaded.
+
+    New media, description and thumbnail files are detected with inotify,
+    so the directory is never scanned again after 'start'. A media file is
+    ready once its own size and mtime, and those of its sidecar files, have
+    not changed for 'settle' seconds, i.e. the encoder has finished writing.
+    Hidden files, e.g. the temporary files of rsync, are ignored.
+    """
+
+    def __init__(self, path: str, settle: float = 5.0) -> None:
+        """Initialize the watcher, nothing is watched until 'start'."""
+        if settle < 0:
+            err_msg = f"The settle time {settle} is not a non-negative number."
+            raise ValueError(err_msg)
+
+        self.path = path
+        self.settle = settle
+        # Wake up often enough to notice a settled file without much delay
+        self.poll_interval = min(max(settle / 4, 0.05), 0.5)
+        self._inotify: Optional[Inotify] = None
+        self._closed = threading.Event()
+        self._iterating = False
+        # stem -> the names of its media and sidecar files
+        self._stems: Dict[str, Set[str]] = {}
+        # name -> (size, mtime_ns, time of the last change)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._emitted: Set[str] = set()
+
+    def start(self) -> Dict[str, Dict[str, str]]:
+        """
+        Start watching the directory.
+
+        Returns
+        -------
+        Dict[str, Dict[str, str]]
+            The files that are already in the directory and have settled,
+            as returned by classify_entries. The files still being written
+            are yielded later, by iterating over the watcher.
+
+        """
+
+        self._inotify = Inotify()
+        # Watch before scanning, so that no file could slip in between
+        self._inotify.add_watch(self.path, _WATCH_MASK)
+        self._rescan()
+
+        return self._pop_ready()
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Yield the name without extension and file names of ready files."""
+        if self._inotify is None:
+            raise RuntimeError("The watcher has not been started.")
+
+        self._iterating = True
+        try:
+            while not self._closed.is_set():
+                timeout = self.poll_interval if self._pending else 0.5
+                for _, mask, _, name in self._inotify.read_events(timeout):
+                    if mask & IN_Q_OVERFLOW:
+                        # Some events were dropped, fall back to a single scan
+                        self._rescan()
+                    elif mask & _GONE:
+                        return
+                    elif not mask & IN_ISDIR:
+                        self._handle(mask, name)
+
+                self._check_pending()
+                yield from self._pop_ready().items()
+        finally:
+            self._iterating = False
+            self._inotify.close()
+
+    def close(self) -> None:
+        """Stop watching, iterating over the watcher ends within a second."""
+        self._closed.set()
+        # Otherwise the iterating thread closes it, as it may be polling it
+        if self._inotify is not None and not self._iterating:
+            self._inotify.close()
+
+    def _handle(self, mask: int, name: str) -> None:
+        """Update the index of files according to a single event."""
+        classified = classify_name(name)
+        if classified is None or name.startswith("."):
+            return
+
+        stem, kind, _ = classified
+        if mask & _REMOVED:
+            names = self._stems.get(stem, set())
+            names.discard(name)
+            self._pending.pop(name, None)
+            if kind == "file_name":
+                # A media file that is replaced later is a new file
+                self._emitted.discard(stem)
+        elif mask & _CHANGED:
+            self._stems.setdefault(stem, set()).add(name)
+            # The stability check is done by _check_pending on every tick
+            self._pending[name] = (-1, -1, time.monotonic())
+
+    def _rescan(self) -> None:
+        """Scan the directory once, all recently modified files are pending."""
+        now = time.time()
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                classified = classify_name(entry.name)
+                if classified is None or entry.name.startswith("."):
+                    continue
+                if not entry.is_file():
+                    continue
+
+                self._stems.setdefault(classified[0], set()).add(entry.name)
+                st = entry.stat()
+                age = now - st.st_mtime
+                if age < self.settle:
+                    self._pending[entry.name] = (
+                        st.st_size,
+                        st.st_mtime_ns,
+                        time.monotonic() - max(age, 0),
+                    )
+
+    def _check_pending(self) -> None:
+        """Stat the pending files, drop those that have settled."""
+        now = time.monotonic()
+        for name, (size, mtime_ns, changed) in list(self._pending.items()):
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                self._pending.pop(name)
+                continue
+
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._pending[name] = (st.st_size, st.st_mtime_ns, now)
+            elif now - changed >= self.settle:
+                self._pending.pop(name)
+
+    def _pop_ready(self) -> Dict[str, Dict[str, str]]:
+        """Return the media files not yet emitted whose files have settled."""
+        busy = set()
+        for name in self._pending:
+            classified = classify_name(name)
+            if classified is not None:
+                busy.add(classified[0])
+
+        names = [
+            name
+            for stem, stem_names in self._stems.items()
+            if stem not in busy and stem not in self._emitted
+            for name in stem_names
+        ]
+        files_ready = classify_entries(names)
+        self._emitted.update(files_ready)
+
+        return files_ready
@@ -1,4 +1,40 @@
 import pytest
+import os
+import pathlib
+import stat
+from typing import Type
+
+FAKE_FFPROBE = """#!/bin/sh
+case "$*" in
+    *broken*) exit 1 ;;
+esac
+echo 10.0
+"""
+
+# Log the arguments, fail for audio files, write the last argument otherwise
+FAKE_FFMPEG = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/ffmpeg.log"
+case "$*" in
+    *.mp3*) exit 1 ;;
+esac
+for last; do :; done
+printf 'JPEG' > "$last"
+"""
+
+
+@pytest.fixture
+def fake_bin(
+    tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+) -> Type[pathlib.Path]:
+    """Put fake ffmpeg and ffprobe executables in front of PATH."""
+    d = tmp_path / "bin"
+    d.mkdir()
+    for name, script in (("ffmpeg", FAKE_FFMPEG), ("ffprobe", FAKE_FFPROBE)):
+        path = d / name
+        path.write_text(script)
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{d}{os.pathsep}{os.environ['PATH']}")
+    return d
 
 
 @pytest.fixture(autouse=True)
@@ -9,3 +45,17 @@ def no_requests(monkeypatch):
     Prevents "requests" from making http requests in all tests.
     """
     monkeypatch.delattr("requests.sessions.Session.request")
+
+
+@pytest.fixture(autouse=True)
+def capability_cache(
+    tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+) -> Type[pathlib.Path]:
+    """
+    Point XDG_CACHE_HOME to a temporary directory for all tests.
+
+    Prevents the tests from sharing the capability cache, or writing to ~/.cache.
+    """
+    d = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(d))
+    return d
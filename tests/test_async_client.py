@@ -0,0 +1,225 @@
+import pytest
+import asyncio
+import json
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lbry_batch_uploader.async_client import AsyncHttpClient
+from lbry_batch_uploader.multipart import MultipartEncoder
+from lbry_batch_uploader.retry import is_transient, is_unsent
+from lbry_batch_uploader.utils import TransientError
+from typing import Iterator, List, Tuple, Type
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    """Request handler that echoes the request back as json."""
+
+    protocol_version = "HTTP/1.1"
+    peers: List[Tuple[str, int]] = []
+
+    def do_POST(self) -> None:
+        self.peers.append(self.client_address)
+        length = int(self.headers["Content-Length"])
+        body = self.rfile.read(length)
+        if self.path == "/slow":
+            # Longer than the read timeout of the client
+            time.sleep(0.3)
+        if self.path == "/drop":
+            # Read, maybe handled, but the response is lost
+            self.close_connection = True
+            return
+        resp = json.dumps(
+            {
+                "result": {
+                    "content_type": self.headers["Content-Type"],
+                    "body": body.decode("latin-1"),
+                }
+            }
+        ).encode()
+
+        self.send_response(503 if self.path == "/unavailable" else 200)
+        self.send_header("Content-Type", "application/json")
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            half = len(resp) // 2
+            for chunk in (resp[:half], resp[half:]):
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(resp)))
+            self.end_headers()
+            self.wfile.write(resp)
+        if self.path == "/close":
+            # Without telling the client, as when an idle connection times out
+            self.close_connection = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    """Start a local http server in a background thread."""
+    JsonHandler.peers = []
+    server = ThreadingHTTPServer(("localhost", 0), JsonHandler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://localhost:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestAsyncHttpClient:
+    """Testing the AsyncHttpClient class."""
+
+    def test_wrong_pool_size(self) -> None:
+        """Test that a non-positive pool size is rejected."""
+        err_msg = "The pool size 0 is not a positive integer."
+        with pytest.raises(ValueError, match=err_msg):
+            _ = AsyncHttpClient(pool_size=0)
+
+    def test_post_json(self, server_url: str) -> None:
+        """Test that json requests are sent over a single kept-alive connection."""
+
+        async def main() -> List[dict]:
+            client = AsyncHttpClient(pool_size=1)
+            try:
+                return [
+                    await client.post(server_url, json={"method": "version"})
+                    for _ in range(3)
+                ]
+            finally:
+                await client.close()
+
+        for req_json in asyncio.run(main()):
+            assert req_json["result"]["content_type"] == "application/json"
+            assert json.loads(req_json["result"]["body"]) == {"method": "version"}
+        assert len(JsonHandler.peers) == 3
+        assert len(set(JsonHandler.peers)) == 1
+
+    def test_post_chunked(self, server_url: str) -> None:
+        """Test that chunked responses are decoded."""
+
+        async def main() -> dict:
+            client = AsyncHttpClient()
+            try:
+                return await client.post(f"{server_url}/chunked", json={"a": 1})
+            finally:
+                await client.close()
+
+        req_json = asyncio.run(main())
+        assert json.loads(req_json["result"]["body"]) == {"a": 1}
+
+    def test_post_concurrent(self, server_url: str) -> None:
+        """Test that concurrent requests never exceed the pool size."""
+
+        async def main() -> List[dict]:
+            client = AsyncHttpClient(pool_size=2)
+            try:
+                reqs = (client.post(server_url, json={"i": i}) for i in range(10))
+                return list(await asyncio.gather(*reqs))
+            finally:
+                await client.close()
+
+        results = asyncio.run(main())
+        bodies = [json.loads(r["result"]["body"]) for r in results]
+        assert bodies == [{"i": i} for i in range(10)]
+        assert len(set(JsonHandler.peers)) <= 2
+
+    def test_post_multipart(
+        self, server_url: str, tmp_path: Type[pathlib.Path]
+    ) -> None:
+        """Test that form fields and files are streamed as multipart/form-data."""
+        (tmp_path / "a.png").write_bytes(b"\x89PNG" * 1000)
+        body = MultipartEncoder(
+            {"name": "abc"}, {"file": str(tmp_path / "a.png")}, chunk_size=100
+        )
+
+        async def main() -> List[dict]:
+            client = AsyncHttpClient(pool_size=1)
+            try:
+                # The second request sends the same body again
+                return [await client.post(server_url, data=body) for _ in range(2)]
+            finally:
+                await client.close()
+
+        for req_json in asyncio.run(main()):
+            assert req_json["result"]["content_type"] == body.content_type
+            assert 'name="name"\r\n\r\nabc\r\n' in req_json["result"]["body"]
+            file_part = 'filename="file"\r\n\r\n' + "\x89PNG" * 1000 + "\r\n"
+            assert file_part in req_json["result"]["body"]
+
+    def test_post_unavailable(self, server_url: str) -> None:
+        """Test that 5xx responses raise TransientError."""
+
+        async def main() -> dict:
+            client = AsyncHttpClient()
+            try:
+                return await client.post(f"{server_url}/unavailable", json={})
+            finally:
+                await client.close()
+
+        with pytest.raises(TransientError, match="HTTP 503"):
+            asyncio.run(main())
+
+    def test_post_dropped(self, server_url: str) -> None:
+        """Test that a request read by the server is not sent again."""
+
+        async def main() -> dict:
+            client = AsyncHttpClient(pool_size=1)
+            try:
+                await client.post(server_url, json={"method": "version"})
+                # On the kept-alive connection
+                return await client.post(f"{server_url}/drop", json={})
+            finally:
+                await client.close()
+
+        with pytest.raises(ConnectionError) as exc_info:
+            asyncio.run(main())
+        assert not is_unsent(exc_info.value)
+        assert len(JsonHandler.peers) == 2
+
+    def test_post_stale(self, server_url: str) -> None:
+        """Test that a connection closed by the server while idle is replaced."""
+
+        async def main() -> List[dict]:
+            client = AsyncHttpClient(pool_size=1)
+            try:
+                first = await client.post(f"{server_url}/close", json={"i": 0})
+                await asyncio.sleep(0.1)
+                return [first, await client.post(server_url, json={"i": 1})]
+            finally:
+                await client.close()
+
+        results = asyncio.run(main())
+        assert [json.loads(r["result"]["body"]) for r in results] == [
+            {"i": 0},
+            {"i": 1},
+        ]
+        assert len(JsonHandler.peers) == 2
+
+    def test_post_timeout(self, server_url: str) -> None:
+        """Test that a response slower than the read timeout is not waited for."""
+
+        async def main() -> dict:
+            client = AsyncHttpClient(timeout=(1.0, 0.1))
+            try:
+                return await client.post(f"{server_url}/slow", json={})
+            finally:
+                await client.close()
+
+        with pytest.raises(asyncio.TimeoutError, match="timed out") as exc_info:
+            asyncio.run(main())
+        assert is_transient(exc_info.value)
+        assert not is_unsent(exc_info.value)
+
+    def test_connection_refused(self) -> None:
+        """Test that unreachable hosts raise ConnectionError."""
+
+        async def main() -> dict:
+            return await AsyncHttpClient().post("http://localhost:1", json={})
+
+        with pytest.raises(ConnectionError, match="localhost:1"):
+            asyncio.run(main())
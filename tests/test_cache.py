@@ -0,0 +1,39 @@
+import pathlib
+from lbry_batch_uploader.cache import JsonStore
+from typing import Type
+
+
+class TestJsonStore:
+    """Testing the JsonStore class."""
+
+    def test_missing(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a missing store is empty, and not written unless changed."""
+        path = tmp_path / "state" / "store.json"
+        store = JsonStore(str(path))
+        assert len(store) == 0
+        store.save()
+        assert not path.exists()
+
+    def test_set_save_load(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the values survive a save and load."""
+        path = str(tmp_path / "state" / "store.json")
+        store = JsonStore(path)
+        store.set("a", 1)
+        store.set("b", [1, "x"])
+        assert store.pop("a") == 1
+        store.save()
+
+        store = JsonStore(path)
+        assert "a" not in store
+        assert store.get("b") == [1, "x"]
+        assert store.get("c", "default") == "default"
+        assert list(store) == ["b"]
+
+    def test_corrupted(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a corrupted store is discarded and then overwritten."""
+        path = tmp_path / "store.json"
+        path.write_text('{"a": ')
+        store = JsonStore(str(path))
+        assert len(store) == 0
+        store.save()
+        assert path.read_text() == "{}"
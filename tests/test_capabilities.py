@@ -0,0 +1,121 @@
+import pytest
+import json
+import pathlib
+import socket
+import time
+from lbry_batch_uploader.capabilities import (
+    CapabilityCache,
+    check_alive,
+    default_cache_path,
+)
+from typing import Type
+
+
+@pytest.fixture
+def cache(tmp_path: Type[pathlib.Path]) -> Type[CapabilityCache]:
+    """Return an empty capability cache."""
+    return CapabilityCache(str(tmp_path / "capabilities.json"), ttl=60)
+
+
+class TestDefaultCachePath:
+    """Test default_cache_path."""
+
+    def test_xdg(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that XDG_CACHE_HOME is used if set."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        path = tmp_path / "lbry_batch_uploader" / "capabilities.json"
+        assert default_cache_path() == str(path)
+
+    def test_home(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that ~/.cache is used if XDG_CACHE_HOME is not set."""
+        monkeypatch.delenv("XDG_CACHE_HOME")
+        monkeypatch.setenv("HOME", str(tmp_path))
+        path = tmp_path / ".cache" / "lbry_batch_uploader" / "capabilities.json"
+        assert default_cache_path() == str(path)
+
+
+class TestCheckAlive:
+    """Test check_alive."""
+
+    def test_listening(self) -> None:
+        """Test that a listening port passes."""
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen()
+            check_alive("127.0.0.1", server.getsockname()[1])
+
+    def test_closed(self) -> None:
+        """Test that a closed port raises ConnectionError."""
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            port = server.getsockname()[1]
+        with pytest.raises(ConnectionError, match=f"127.0.0.1:{port}"):
+            check_alive("127.0.0.1", port)
+
+
+class TestCapabilityCache:
+    """Test CapabilityCache."""
+
+    def test_ttl(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a ttl which is not positive raises ValueError."""
+        with pytest.raises(ValueError):
+            CapabilityCache(str(tmp_path / "capabilities.json"), ttl=0)
+
+    def test_store(self, cache: Type[CapabilityCache]) -> None:
+        """Test that the answers are keyed by the port and the version."""
+        assert cache.version(5279) is None
+        cache.store_version(5279, "0.113.0")
+        cache.store_ffmpeg(5279, "0.113.0", True)
+
+        assert cache.version(5279) == "0.113.0"
+        assert cache.version(5280) is None
+        assert cache.ffmpeg(5279, "0.113.0")
+        assert cache.ffmpeg(5279, "0.114.0") is None
+
+        cache.store_ffmpeg(5279, "0.114.0", False)
+        assert cache.ffmpeg(5279, "0.114.0") is False
+
+    def test_persistent(self, cache: Type[CapabilityCache]) -> None:
+        """Test that the answers are read back by the next run."""
+        cache.store_version(5279, "0.113.0")
+        cache.store_ffmpeg(5279, "0.113.0", True)
+        cache.save()
+
+        reloaded = CapabilityCache(cache.path, ttl=60)
+        assert reloaded.version(5279) == "0.113.0"
+        assert reloaded.ffmpeg(5279, "0.113.0")
+
+    def test_expired(
+        self, cache: Type[CapabilityCache], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that the answers expire after the ttl, and are dropped."""
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now)
+        cache.store_version(5279, "0.113.0")
+        cache.store_ffmpeg(5279, "0.113.0", True)
+
+        monkeypatch.setattr(time, "time", lambda: now + 59)
+        assert cache.version(5279) == "0.113.0"
+        monkeypatch.setattr(time, "time", lambda: now + 61)
+        assert cache.version(5279) is None
+        assert cache.ffmpeg(5279, "0.113.0") is None
+        assert len(cache) == 0
+
+    def test_invalidate(self, cache: Type[CapabilityCache]) -> None:
+        """Test that invalidate only forgets the given port."""
+        for port in (5279, 52790):
+            cache.store_version(port, "0.113.0")
+            cache.store_ffmpeg(port, "0.113.0", True)
+        cache.invalidate(5279)
+        cache.save()
+
+        assert cache.version(5279) is None
+        assert cache.ffmpeg(5279, "0.113.0") is None
+        assert cache.version(52790) == "0.113.0"
+        assert cache.ffmpeg(52790, "0.113.0")
+        with open(cache.path, encoding="utf-8") as f:
+            assert sorted(json.load(f)) == ["52790", "52790:0.113.0"]
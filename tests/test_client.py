@@ -0,0 +1,112 @@
+import pytest
+import pathlib
+import requests
+from requests import ConnectionError
+from lbry_batch_uploader.client import HttpClient
+from lbry_batch_uploader.multipart import MultipartEncoder
+from lbry_batch_uploader.utils import TransientError
+from typing import Dict, Tuple, Type
+
+
+class MockResponseVersion:
+    """Mocking good request.Resopnse.json for the "version" query."""
+
+    status_code = 200
+
+    @staticmethod
+    def json() -> Dict[str, Dict[str, str]]:
+        return {"result": {"version": "0.107.1"}}
+
+
+class TestHttpClient:
+    """Testing the HttpClient class."""
+
+    def test_wrong_pool_size(self) -> None:
+        """Test that a non-positive pool size is rejected."""
+        err_msg = "The pool size 0 is not a positive integer."
+        with pytest.raises(ValueError, match=err_msg):
+            _ = HttpClient(pool_size=0)
+
+    @pytest.mark.parametrize("timeout", [(0.0, 300.0), (10.0, -1.0)])
+    def test_wrong_timeout(self, timeout: Tuple[float, float]) -> None:
+        """Test that a non-positive connect or read timeout is rejected."""
+        with pytest.raises(ValueError, match="timeout .* is not a positive number"):
+            _ = HttpClient(timeout=timeout)
+
+    @pytest.mark.parametrize("prefix", ["http://", "https://"])
+    def test_adapters(self, prefix: str) -> None:
+        """Test that both schemes share a blocking pool of the correct size."""
+        client = HttpClient(pool_size=4)
+        adapter = client.session.get_adapter(f"{prefix}localhost")
+        assert adapter._pool_maxsize == 4
+        assert adapter._pool_block
+        client.close()
+
+    def test_post_reuses_session(self, monkeypatch: Type[pytest.MonkeyPatch]) -> None:
+        """Test that every post goes through the same session."""
+        sessions = []
+
+        def mock_post(session, url, **kwargs):
+            sessions.append(session)
+            return MockResponseVersion()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        client = HttpClient()
+        for _ in range(3):
+            req_json = client.post("http://localhost:5279", json={"method": "version"})
+            assert req_json == {"result": {"version": "0.107.1"}}
+        assert sessions == [client.session] * 3
+
+    def test_post_multipart(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that a multipart body is passed on with its content type."""
+        calls = []
+
+        def mock_post(session, url, **kwargs):
+            calls.append(kwargs)
+            return MockResponseVersion()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        (tmp_path / "a.png").write_bytes(b"\x89PNG")
+        body = MultipartEncoder({"name": "abc"}, {"file": str(tmp_path / "a.png")})
+        HttpClient().post("https://spee.ch/api/claim/publish", data=body)
+
+        assert calls[0]["data"] is body
+        assert calls[0]["headers"] == {"Content-Type": body.content_type}
+
+    def test_post_timeout(self, monkeypatch: Type[pytest.MonkeyPatch]) -> None:
+        """Test that every post is sent with the (connect, read) timeout."""
+        calls = []
+
+        def mock_post(session, url, **kwargs):
+            calls.append(kwargs)
+            return MockResponseVersion()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        HttpClient(timeout=(2.0, 30.0)).post("http://localhost:5279", json={})
+
+        assert calls[0]["timeout"] == (2.0, 30.0)
+
+    def test_post_unavailable(self, monkeypatch: Type[pytest.MonkeyPatch]) -> None:
+        """Test that 5xx responses raise TransientError."""
+
+        class MockResponseUnavailable(MockResponseVersion):
+            status_code = 503
+
+        def mock_post(session, url, **kwargs):
+            return MockResponseUnavailable()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        with pytest.raises(TransientError, match="HTTP 503"):
+            HttpClient().post("http://localhost:5279", json={"method": "version"})
+
+    def test_post_error(self, monkeypatch: Type[pytest.MonkeyPatch]) -> None:
+        """Test that request exceptions are passed through."""
+
+        def mock_post(session, url, **kwargs):
+            raise ConnectionError("Connection refused")
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        with pytest.raises(ConnectionError, match="Connection refused"):
+            HttpClient().post("http://localhost:5279", json={"method": "version"})
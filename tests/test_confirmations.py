@@ -0,0 +1,96 @@
+import pytest
+import threading
+from lbry_batch_uploader.confirmations import ConfirmationTracker
+from typing import Dict, List
+
+
+class MockWallet:
+    """Dummy wallet that confirms a txid after it has been checked n times."""
+
+    def __init__(self, checks_needed: Dict[str, int]) -> None:
+        self.checks_needed = checks_needed
+        self.calls: List[List[str]] = []
+        self.lock = threading.Lock()
+
+    def check(self, txids: List[str]) -> Dict[str, int]:
+        with self.lock:
+            self.calls.append(list(txids))
+            confirmations = {}
+            for txid in txids:
+                if txid not in self.checks_needed:
+                    # Dropped from the wallet
+                    continue
+                self.checks_needed[txid] -= 1
+                confirmations[txid] = 1 if self.checks_needed[txid] <= 0 else 0
+            return confirmations
+
+
+class TestConfirmationTracker:
+    """Testing the ConfirmationTracker class."""
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [{"batch_size": 0}, {"interval": 0}, {"interval": 1, "max_interval": 0.5}],
+    )
+    def test_wrong_args(self, kwargs: dict) -> None:
+        """Test that invalid batch sizes and intervals raise ValueError."""
+        with pytest.raises(ValueError):
+            ConfirmationTracker(MockWallet({}).check, **kwargs)
+
+    def test_confirm(self) -> None:
+        """Test that txids are checked in batches until confirmed or dropped."""
+        wallet = MockWallet({"a": 1, "b": 1, "c": 3})
+        tracker = ConfirmationTracker(
+            wallet.check, batch_size=2, interval=0.01, max_interval=0.04
+        )
+        tracker.start()
+        for txid in ("a", "b", "c", "dropped"):
+            tracker.add(txid, f"{txid}.mp4")
+        tracker.close(timeout=5)
+
+        assert tracker.confirmed == {"a": "a.mp4", "b": "b.mp4", "c": "c.mp4"}
+        assert tracker.failed == {"dropped": "dropped.mp4"}
+        assert tracker.pending == {}
+        assert all(len(batch) <= 2 for batch in wallet.calls)
+        # "c" is checked twice more after the first round, never in a hot loop
+        assert sum(batch.count("c") for batch in wallet.calls) == 3
+
+    def test_backoff(self) -> None:
+        """Test that the interval of an unconfirmed txid doubles up to the max."""
+        tracker = ConfirmationTracker(MockWallet({}).check, interval=1, max_interval=3)
+        tracker.add("a", "a.mp4")
+        for interval in (2, 3, 3):
+            tracker._update(["a"], {"a": 0})
+            assert tracker._pending["a"][1] == interval
+
+    def test_timeout(self) -> None:
+        """Test that the unconfirmed txids stay pending after the timeout."""
+        wallet = MockWallet({"a": 1000})
+        tracker = ConfirmationTracker(wallet.check, interval=0.01, max_interval=0.01)
+        tracker.start()
+        tracker.add("a", "a.mp4")
+        tracker.close(timeout=0.1)
+
+        assert tracker.pending == {"a": "a.mp4"}
+        assert not tracker.confirmed
+        assert len(wallet.calls) > 1
+
+    def test_check_error(self, capsys: pytest.CaptureFixture) -> None:
+        """Test that a failed check is retried later."""
+        calls = []
+
+        def check(txids: List[str]) -> Dict[str, int]:
+            calls.append(txids)
+            if len(calls) == 1:
+                raise ConnectionError("lbrynet is down")
+            return {txid: 6 for txid in txids}
+
+        tracker = ConfirmationTracker(check, interval=0.01, max_interval=0.02)
+        tracker.start()
+        tracker.add("a", "a.mp4")
+        tracker.close(timeout=5)
+        captured = capsys.readouterr()
+
+        assert tracker.confirmed == {"a": "a.mp4"}
+        assert tracker.errors == 1
+        assert "Failed to check the transactions\nlbrynet is down" in captured.out
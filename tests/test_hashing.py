@@ -0,0 +1,81 @@
+import pytest
+import hashlib
+import os
+import pathlib
+from lbry_batch_uploader import hashing
+from lbry_batch_uploader.hashing import HashCache, hash_file
+from typing import List, Type
+
+
+@pytest.fixture
+def fake_file(tmp_path: Type[pathlib.Path]) -> Type[pathlib.Path]:
+    """Create a fake file that is larger than the read buffer."""
+    f = tmp_path / "video.mp4"
+    f.write_bytes(os.urandom(10000))
+    return f
+
+
+@pytest.fixture
+def count_hashes(monkeypatch: Type[pytest.MonkeyPatch]) -> List[str]:
+    """Record the paths passed to hash_file."""
+    hashed = []
+    real_hash_file = hashing.hash_file
+
+    def mock_hash_file(path: str, algorithm: str = "sha256") -> str:
+        hashed.append(path)
+        return real_hash_file(path, algorithm)
+
+    monkeypatch.setattr(hashing, "hash_file", mock_hash_file)
+    return hashed
+
+
+class TestHashFile:
+    """Testing the hash_file function."""
+
+    @pytest.mark.parametrize("algorithm", ["sha256", "blake2b"])
+    @pytest.mark.parametrize("buffer_size", [1, 4096, 1 << 20])
+    def test_digest(
+        self, fake_file: Type[pathlib.Path], algorithm: str, buffer_size: int
+    ) -> None:
+        """Test that the digest does not depend on the buffer size."""
+        expected = hashlib.new(algorithm, fake_file.read_bytes()).hexdigest()
+        assert hash_file(str(fake_file), algorithm, buffer_size) == expected
+
+    def test_wrong_algorithm(self, fake_file: Type[pathlib.Path]) -> None:
+        """Test that unsupported algorithms are rejected."""
+        with pytest.raises(ValueError, match="The hash algorithm should be one of"):
+            hash_file(str(fake_file), "md5")
+
+
+class TestHashCache:
+    """Testing the HashCache class."""
+
+    def test_cache_hit(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_file: Type[pathlib.Path],
+        count_hashes: List[str],
+    ) -> None:
+        """Test that unchanged files are hashed only once, even if renamed."""
+        cache_path = str(tmp_path / "hashes.json")
+        cache = HashCache(cache_path)
+        digest = cache.digest(str(fake_file))
+        cache.save()
+
+        renamed = fake_file.with_name("renamed.mp4")
+        fake_file.rename(renamed)
+        assert HashCache(cache_path).digest(str(renamed)) == digest
+        assert count_hashes == [str(fake_file)]
+
+    def test_cache_miss(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_file: Type[pathlib.Path],
+        count_hashes: List[str],
+    ) -> None:
+        """Test that modified files are hashed again."""
+        cache = HashCache(str(tmp_path / "hashes.json"), "blake2b")
+        digest = cache.digest(str(fake_file))
+        fake_file.write_bytes(b"new content")
+        assert cache.digest(str(fake_file)) != digest
+        assert len(count_hashes) == 2
@@ -0,0 +1,69 @@
+import json
+import pathlib
+from lbry_batch_uploader.journal import UploadJournal
+from typing import Type
+
+
+class TestUploadJournal:
+    """Testing the UploadJournal class."""
+
+    def test_load_missing(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a missing journal is loaded as empty."""
+        journal = UploadJournal(str(tmp_path / "state" / "journal.jsonl"))
+        assert journal.load() == {}
+
+    def test_record_and_load(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the records are appended and loaded by file name."""
+        path = tmp_path / "state" / "journal.jsonl"
+        journal = UploadJournal(str(path))
+        journal.record("0.mp4", "0", "abc", "lbry://0#abc", 1000.0, 1.5)
+        journal.record("1.mkv", "1", "def", "lbry://1#def", 1001.0, 2.25)
+        journal.close()
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[1])["claim_url"] == "lbry://1#def"
+
+        index = UploadJournal(str(path)).load()
+        assert set(index.keys()) == {"0.mp4", "1.mkv"}
+        assert index["0.mp4"]["claim_id"] == "abc"
+        assert index["1.mkv"]["elapsed"] == 2.25
+
+    def test_append_across_runs(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a later run appends, and its record wins."""
+        path = str(tmp_path / "journal.jsonl")
+        for claim_id in ("abc", "xyz"):
+            journal = UploadJournal(path)
+            journal.record("0.mp4", "0", claim_id, f"lbry://0#{claim_id}", 0, 0)
+            journal.close()
+
+        assert UploadJournal(path).load()["0.mp4"]["claim_id"] == "xyz"
+
+    def test_truncated_line(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a line cut short by a crash is ignored."""
+        path = tmp_path / "journal.jsonl"
+        journal = UploadJournal(str(path))
+        journal.record("0.mp4", "0", "abc", "lbry://0#abc", 0, 0)
+        journal.close()
+        with open(path, "a") as f:
+            f.write('{"file_name": "1.mkv", "claim')
+
+        assert list(UploadJournal(str(path)).load().keys()) == ["0.mp4"]
+
+    def test_append_after_truncated_line(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the next run does not append to a line cut short by a crash."""
+        path = tmp_path / "journal.jsonl"
+        journal = UploadJournal(str(path))
+        journal.record("0.mp4", "0", "abc", "lbry://0#abc", 0, 0)
+        journal.close()
+        with open(path, "a") as f:
+            f.write('{"file_name": "1.mkv", "claim')
+
+        journal = UploadJournal(str(path))
+        journal.record("2.webm", "2", "def", "lbry://2#def", 0, 0)
+        journal.record("3.mp3", "3", "ghi", "lbry://3#ghi", 0, 0)
+        journal.close()
+
+        index = UploadJournal(str(path)).load()
+        assert list(index.keys()) == ["0.mp4", "2.webm", "3.mp3"]
+        assert path.read_text().endswith("\n")
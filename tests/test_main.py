@@ -1,4 +1,6 @@
 import pytest
+import os
+import runpy
 import sys
 import time
 import requests
@@ -9,7 +11,7 @@ import pathlib
 class MockResponse:
     """Dummy mock request.Resopnse class."""
 
-    pass
+    status_code = 200
 
 
 class MockResponseVersion(MockResponse):
@@ -46,9 +48,9 @@ class MockResponseThumbnail(MockResponse):
 
 @pytest.fixture
 def mock_response_good(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
-    """Mock Requests.post() to return MockResponse instead."""
+    """Mock Requests.Session.post() to return MockResponse instead."""
 
-    def mock_post(*args, **kwargs):
+    def mock_post(session, url, **kwargs):
         try:
             method = kwargs["json"]["method"]
             if method == "version":
@@ -61,7 +63,7 @@ def mock_response_good(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
             mock_response_instance = MockResponseThumbnail()
         return mock_response_instance
 
-    monkeypatch.setattr(requests, "post", mock_post)
+    monkeypatch.setattr(requests.Session, "post", mock_post)
 
 
 @pytest.fixture
@@ -140,3 +142,22 @@ class TestMain:
         from lbry_batch_uploader import __main__
 
         del __main__
+
+    def test_main_profile(
+        self,
+        mock_response_good,
+        mock_time,
+        mock_sys,
+        tmp_path: Type[pathlib.Path],
+        monkeypatch: Type[pytest.MonkeyPatch],
+    ) -> None:
+        """Run __main__ with --profile, and check the phases are profiled."""
+        run_dir = tmp_path / "profile"
+        monkeypatch.setattr(sys, "argv", sys.argv + ["--profile", str(run_dir)])
+        # Run it again even if imported by another test
+        monkeypatch.delitem(sys.modules, "lbry_batch_uploader.__main__", False)
+        runpy.run_module("lbry_batch_uploader", run_name="__main__")
+
+        names = os.listdir(run_dir)
+        assert "get_all_files.pstats" in names
+        assert "upload_all_files.pstats" in names
@@ -0,0 +1,101 @@
+import pytest
+import json
+import pathlib
+from lbry_batch_uploader.manifest import iter_manifest
+from typing import Type
+
+
+class TestIterManifest:
+    """Testing the iter_manifest function."""
+
+    def test_csv(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the CSV rows are converted to file parameters."""
+        manifest = tmp_path / "manifest.csv"
+        manifest.write_text(
+            "path,title,description,tags,bid,thumbnail,ignored\n"
+            + 'a/1.mp4,First,"Line 1\nLine 2","x, y",0.1,1.png,z\n'
+            + "b/2.mkv,,,,,https://abc123.xyz/2.png,\n",
+            encoding="utf-8-sig",
+        )
+
+        assert list(iter_manifest(str(manifest))) == [
+            (
+                "a/1",
+                {
+                    "file_name": "a/1.mp4",
+                    "desc_name": "",
+                    "thumbnail_name": "1.png",
+                    "title": "First",
+                    "description": "Line 1\nLine 2",
+                    "bid": "0.1",
+                    "tags": "x, y",
+                },
+            ),
+            (
+                "b/2",
+                {
+                    "file_name": "b/2.mkv",
+                    "desc_name": "",
+                    "thumbnail_name": "",
+                    "thumbnail_url": "https://abc123.xyz/2.png",
+                },
+            ),
+        ]
+
+    def test_jsonl(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the json lines are converted, and tags may be a list."""
+        manifest = tmp_path / "manifest.jsonl"
+        rows = [{"path": "1.mp4", "tags": ["x", "y"], "bid": 0.5}, {"path": "2.mp3"}]
+        manifest.write_text("\n".join(json.dumps(row) for row in rows) + "\n\n")
+
+        files = list(iter_manifest(str(manifest)))
+        assert [name_no_ext for name_no_ext, _ in files] == ["1", "2"]
+        assert files[0][1]["tags"] == "x,y"
+        assert files[0][1]["bid"] == "0.5"
+        assert "tags" not in files[1][1]
+
+    def test_invalid_rows(
+        self, tmp_path: Type[pathlib.Path], capsys: Type[pytest.CaptureFixture]
+    ) -> None:
+        """Test that invalid rows are reported and skipped."""
+        manifest = tmp_path / "manifest.jsonl"
+        lines = [
+            '{"path": "1.mp4"}',
+            "{not json",
+            "[1]",
+            '{"title": "x"}',
+            '{"path": "5.mp4"}',
+        ]
+        manifest.write_text("\n".join(lines))
+
+        files = list(iter_manifest(str(manifest)))
+        captured = capsys.readouterr()
+
+        assert [name_no_ext for name_no_ext, _ in files] == ["1", "5"]
+        assert "Skipped line 2 of" in captured.out
+        assert "The line is not valid json" in captured.out
+        assert "Skipped line 3 of" in captured.out
+        assert "Skipped line 4 of" in captured.out
+        assert "The row has no path." in captured.out
+
+    def test_streaming(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the first row is yielded before the rest is read."""
+        manifest = tmp_path / "manifest.csv"
+        with open(manifest, "w") as f:
+            f.write("path\n")
+            for idx in range(100_000):
+                f.write(f"{idx}.mp4\n")
+
+        files = iter_manifest(str(manifest))
+        assert next(files)[0] == "0"
+        file_obj = files.gi_frame.f_locals["f"]
+        assert file_obj.buffer.tell() < manifest.stat().st_size
+        files.close()
+        assert file_obj.closed
+
+    def test_wrong_format(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that an unknown extension raises ValueError."""
+        manifest = tmp_path / "manifest.xlsx"
+        manifest.touch()
+        with pytest.raises(ValueError):
+            next(iter_manifest(str(manifest)))
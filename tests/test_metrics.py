@@ -0,0 +1,119 @@
+import pytest
+import json
+import pathlib
+import threading
+from lbry_batch_uploader.metrics import Histogram, MetricsRegistry
+from typing import Type
+
+
+@pytest.fixture
+def registry() -> MetricsRegistry:
+    """Return an empty MetricsRegistry with a short namespace."""
+    return MetricsRegistry("test")
+
+
+class TestHistogram:
+    """Testing the Histogram class."""
+
+    def test_observe(self) -> None:
+        """Test that the observations land in their buckets."""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(5.65)
+        assert histogram.min == 0.05
+        assert histogram.max == 5.0
+
+    def test_quantile(self) -> None:
+        """Test that a quantile is the upper bound of its bucket."""
+        histogram = Histogram((0.1, 1.0, 10.0))
+        assert histogram.quantile(0.5) == 0.0
+        for value in [0.05] * 9 + [2.0]:
+            histogram.observe(value)
+
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.95) == 2.0
+
+    def test_threads(self) -> None:
+        """Test that no observation is lost between threads."""
+        histogram = Histogram()
+
+        def observe() -> None:
+            for _ in range(1000):
+                histogram.observe(0.01)
+
+        threads = [threading.Thread(target=observe) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert histogram.count == 4000
+
+
+class TestMetricsRegistry:
+    """Testing the MetricsRegistry class."""
+
+    def test_labels(self, registry: MetricsRegistry) -> None:
+        """Test that a metric is identified by its name and labels."""
+        registry.counter("files_total", outcome="failed").inc()
+        registry.counter("files_total", outcome="failed").inc(2)
+        registry.counter("files_total", outcome="uploaded").inc()
+
+        assert registry.counter("files_total", outcome="failed").value == 3
+        assert registry.counter("files_total", outcome="uploaded").value == 1
+
+    def test_time(self, registry: MetricsRegistry) -> None:
+        """Test that the block is timed, and its errors are counted."""
+        with registry.time("rpc_seconds", "rpc_errors_total", method="version"):
+            pass
+        with pytest.raises(KeyError):
+            with registry.time("rpc_seconds", "rpc_errors_total", method="version"):
+                raise KeyError("result")
+
+        assert registry.histogram("rpc_seconds", method="version").count == 2
+        assert registry.counter("rpc_errors_total", method="version").value == 1
+
+    def test_to_prometheus(self, registry: MetricsRegistry) -> None:
+        """Test the text exposition format, with cumulative buckets."""
+        registry.describe("rpc_seconds", "Seconds spent on a request.")
+        histogram = registry.histogram("rpc_seconds", method="publish")
+        histogram.observe(0.002)
+        histogram.observe(0.2)
+        registry.gauge("run_seconds").set(12.5)
+        text = registry.to_prometheus()
+
+        assert "# HELP test_rpc_seconds Seconds spent on a request.\n" in text
+        assert "# TYPE test_rpc_seconds histogram\n" in text
+        assert 'test_rpc_seconds_bucket{method="publish",le="0.001"} 0\n' in text
+        assert 'test_rpc_seconds_bucket{method="publish",le="0.005"} 1\n' in text
+        assert 'test_rpc_seconds_bucket{method="publish",le="+Inf"} 2\n' in text
+        assert 'test_rpc_seconds_count{method="publish"} 2\n' in text
+        assert "# TYPE test_run_seconds gauge\ntest_run_seconds 12.5\n" in text
+
+    def test_escape(self, registry: MetricsRegistry) -> None:
+        """Test that the quotes in a label value are escaped."""
+        registry.counter("files_total", outcome='a "b"').inc()
+        assert 'test_files_total{outcome="a \\"b\\""} 1' in registry.to_prometheus()
+
+    def test_write(
+        self, tmp_path: Type[pathlib.Path], registry: MetricsRegistry
+    ) -> None:
+        """Test that both files are written, without leaving temporary files."""
+        registry.histogram("stage_seconds", stage="hash").observe(0.5)
+        registry.write_textfile(str(tmp_path / "textfile" / "uploader.prom"))
+        registry.write_json(str(tmp_path / "summary.json"))
+
+        assert sorted(p.name for p in tmp_path.rglob("*")) == [
+            "summary.json",
+            "textfile",
+            "uploader.prom",
+        ]
+        summary = json.loads((tmp_path / "summary.json").read_text())
+        item = summary["histograms"]["stage_seconds"][0]
+        assert item["labels"] == {"stage": "hash"}
+        assert item["count"] == 1
+        assert item["mean"] == 0.5
+        assert item["p50"] == 0.5
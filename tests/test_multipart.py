@@ -0,0 +1,68 @@
+import pytest
+import pathlib
+import requests
+from lbry_batch_uploader.multipart import MultipartEncoder
+from typing import Type
+
+
+@pytest.fixture
+def encoder(tmp_path: Type[pathlib.Path]) -> MultipartEncoder:
+    """Return a MultipartEncoder of a field and a 1000 bytes file."""
+    (tmp_path / "a.png").write_bytes(bytes(range(250)) * 4)
+    return MultipartEncoder(
+        {"name": "abc"}, {"file": str(tmp_path / "a.png")}, chunk_size=64
+    )
+
+
+class TestMultipartEncoder:
+    """Testing the MultipartEncoder class."""
+
+    def test_body(self, encoder: MultipartEncoder) -> None:
+        """Test that all parts are delimited by the boundary."""
+        body = encoder.read()
+        boundary = encoder.content_type.split("boundary=")[-1]
+        assert len(body) == len(encoder)
+        assert body.startswith(f"--{boundary}\r\n".encode())
+        assert body.endswith(f"--{boundary}--\r\n".encode())
+        assert body.count(boundary.encode()) == 3
+        assert b'name="name"\r\n\r\nabc\r\n' in body
+        assert b'filename="file"\r\n\r\n' + bytes(range(250)) * 4 + b"\r\n" in body
+        assert encoder.read() == b""
+
+    def test_chunks(self, encoder: MultipartEncoder) -> None:
+        """Test that the body is read in bounded chunks, and could be read again."""
+        chunks = list(encoder)
+        assert all(len(chunk) <= 64 for chunk in chunks)
+        assert len(chunks) == -(-len(encoder) // 64)
+
+        encoder.seek(0)
+        assert encoder.tell() == 0
+        assert b"".join(chunks) == encoder.read()
+
+    def test_seek(self, encoder: MultipartEncoder) -> None:
+        """Test that reading from any position gives the rest of the body."""
+        body = encoder.read()
+        for offset in (0, 1, 150, len(body) - 1):
+            encoder.seek(offset)
+            end = offset + 300
+            assert encoder.read(300) == body[offset:end]
+        encoder.seek(-10, 2)
+        assert encoder.read() == body[-10:]
+
+    def test_file_changed(
+        self, tmp_path: Type[pathlib.Path], encoder: MultipartEncoder
+    ) -> None:
+        """Test that a file truncated while being uploaded raises OSError."""
+        (tmp_path / "a.png").write_bytes(b"short")
+        with pytest.raises(OSError):
+            encoder.read()
+
+    def test_requests_stream(self, encoder: MultipartEncoder) -> None:
+        """Test that requests streams the body with a Content-Length header."""
+        headers = {"Content-Type": encoder.content_type}
+        req = requests.Request(
+            "POST", "http://localhost", data=encoder, headers=headers
+        ).prepare()
+        assert req.body is encoder
+        assert req.headers["Content-Length"] == str(len(encoder))
+        assert "Transfer-Encoding" not in req.headers
@@ -0,0 +1,88 @@
+import pytest
+import itertools
+import pathlib
+import threading
+import time
+from lbry_batch_uploader.names import (
+    NameCache,
+    channel_claim_url,
+    iter_batches,
+    iter_suffixed_names,
+)
+from typing import Iterator, Type
+
+
+class TestHelpers:
+    """Testing the helper functions for claim names."""
+
+    def test_channel_claim_url(self) -> None:
+        """Test that the url is scoped to the channel."""
+        assert channel_claim_url("@ch", "video") == "lbry://@ch/video"
+
+    def test_iter_suffixed_names(self) -> None:
+        """Test that the suffixes start from -2 and keep increasing."""
+        names = iter_suffixed_names("video")
+        assert list(itertools.islice(names, 3)) == ["video-2", "video-3", "video-4"]
+
+    def test_iter_batches(self) -> None:
+        """Test that the items are batched in order, the last batch is partial."""
+        batches = list(iter_batches(range(7), 3, 10.0))
+        assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+    def test_iter_batches_stalled(self) -> None:
+        """Test that a partial batch is yielded once the items stall."""
+        resume = threading.Event()
+
+        def items() -> Iterator[int]:
+            yield 0
+            yield 1
+            # e.g. a watcher waiting for new files
+            resume.wait(5)
+            yield 2
+
+        batches = iter_batches(items(), 200, 0.05)
+        assert next(batches) == [0, 1]
+        resume.set()
+        assert list(batches) == [[2]]
+
+    def test_iter_batches_error(self) -> None:
+        """Test that an error from the items is raised after their batches."""
+
+        def items() -> Iterator[int]:
+            yield 0
+            raise OSError("disk is gone")
+
+        batches = iter_batches(items(), 3, 10.0)
+        assert next(batches) == [0]
+        with pytest.raises(OSError, match="disk is gone"):
+            next(batches)
+
+
+class TestNameCache:
+    """Testing the NameCache class."""
+
+    def test_lookup(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that taken and free urls are cached across instances."""
+        path = str(tmp_path / "names.json")
+        cache = NameCache(path)
+        assert cache.lookup("lbry://@ch/a") is None
+        cache.store("lbry://@ch/a", "123abc")
+        cache.store("lbry://@ch/b", "")
+        cache.save()
+
+        cache = NameCache(path)
+        assert cache.lookup("lbry://@ch/a") == "123abc"
+        assert cache.lookup("lbry://@ch/b") == ""
+
+    def test_free_ttl(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that only the free urls expire."""
+        cache = NameCache(str(tmp_path / "names.json"), free_ttl=60)
+        cache.store("lbry://@ch/a", "123abc")
+        cache.store("lbry://@ch/b", "")
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 61)
+        assert cache.lookup("lbry://@ch/a") == "123abc"
+        assert cache.lookup("lbry://@ch/b") is None
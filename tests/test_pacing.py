@@ -0,0 +1,87 @@
+import pytest
+import time
+from lbry_batch_uploader.pacing import AimdRateLimiter, TokenBucket
+from typing import List, Type
+
+
+@pytest.fixture
+def fake_clock(monkeypatch: Type[pytest.MonkeyPatch]) -> List[float]:
+    """Mock time.monotonic and time.sleep with a manually advanced clock."""
+    clock = [1000.0]
+
+    def monotonic() -> float:
+        return clock[0]
+
+    def sleep(secs: float) -> None:
+        clock[0] += secs
+
+    monkeypatch.setattr(time, "monotonic", monotonic)
+    monkeypatch.setattr(time, "sleep", sleep)
+    return clock
+
+
+class TestTokenBucket:
+    """Testing the TokenBucket class."""
+
+    @pytest.mark.parametrize(
+        "rate, burst, err_msg",
+        [
+            (0, 1, "The rate 0 is not a positive number."),
+            (-1.5, 1, "The rate -1.5 is not a positive number."),
+            (1.0, 0, "The burst 0 is not a positive integer."),
+        ],
+    )
+    def test_wrong_args(self, rate: float, burst: int, err_msg: str) -> None:
+        """Test that invalid rate or burst are rejected."""
+        with pytest.raises(ValueError, match=err_msg):
+            _ = TokenBucket(rate, burst)
+
+    def test_burst_then_rate(self, fake_clock: List[float]) -> None:
+        """Test that 'burst' tokens are free and the rest are spaced out."""
+        bucket = TokenBucket(2.0, 3)
+        delays = [bucket.reserve() for _ in range(5)]
+        assert delays == [0.0, 0.0, 0.0, 0.5, 1.0]
+
+    def test_refill(self, fake_clock: List[float]) -> None:
+        """Test that tokens are refilled over time, up to 'burst'."""
+        bucket = TokenBucket(1.0, 2)
+        bucket.reserve()
+        bucket.reserve()
+        fake_clock[0] += 100
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+    def test_acquire_sleeps(self, fake_clock: List[float]) -> None:
+        """Test that acquire sleeps for the reserved delay."""
+        bucket = TokenBucket(4.0, 1)
+        bucket.acquire()
+        bucket.acquire()
+        assert fake_clock[0] == pytest.approx(1000.25)
+
+
+class TestAimdRateLimiter:
+    """Testing the AimdRateLimiter class."""
+
+    def test_wrong_decrease(self) -> None:
+        """Test that the decrease factor must be between 0 and 1."""
+        with pytest.raises(ValueError, match="The decrease 1.5 is not between"):
+            _ = AimdRateLimiter(1.0, 1, decrease=1.5)
+
+    def test_decrease_and_recover(self, fake_clock: List[float]) -> None:
+        """Test that errors halve the rate and successes restore it."""
+        limiter = AimdRateLimiter(1.0, 1, min_rate=0.2, increase=0.25)
+        limiter.on_error()
+        assert limiter.rate == pytest.approx(0.5)
+        for _ in range(5):
+            limiter.on_error()
+        assert limiter.rate == pytest.approx(0.2)
+        for _ in range(10):
+            limiter.on_success()
+        assert limiter.rate == pytest.approx(1.0)
+
+    def test_slower_after_error(self, fake_clock: List[float]) -> None:
+        """Test that the delays grow after an error."""
+        limiter = AimdRateLimiter(2.0, 1)
+        assert limiter.reserve() == 0.0
+        assert limiter.reserve() == pytest.approx(0.5)
+        limiter.on_error()
+        assert limiter.reserve() == pytest.approx(2.0)
@@ -1,5 +1,8 @@
 import pytest
-from lbry_batch_uploader.parser import Parser
+import subprocess
+import sys
+from argparse import ArgumentTypeError
+from lbry_batch_uploader.parser import Parser, language_tag
 from typing import Type, Optional, Sequence
 
 
@@ -417,3 +420,243 @@ class TestHelpOption:
         assert help_string_head in captured.out
         assert captured.err == ""
         check_no_args(parser)
+
+
+class TestPerformanceArgs:
+    """Tests related to the optional arguments for tuning performance."""
+
+    def test_defaults(self, parser: Type[Parser]) -> None:
+        """Test the default values when no tuning argument is specified."""
+        parser.parse(("path/to/dir", "test_ch"))
+        assert parser.args.workers == 1
+        assert not parser.args.use_async
+        assert not parser.args.recursive
+        assert parser.args.scan_workers == 4
+        assert not parser.args.scan_cache
+        assert parser.args.rate == 1.0
+        assert parser.args.burst == 3
+        assert parser.args.adaptive
+        assert parser.args.retries == 3
+        assert parser.args.retry_delay == 1.0
+        assert parser.args.connect_timeout == 10.0
+        assert parser.args.read_timeout == 300.0
+        assert parser.args.metrics_textfile is None
+        assert parser.args.metrics_json is None
+        assert parser.args.speech_url is None
+        assert parser.args.capability_ttl == 3600.0
+        assert not parser.args.refresh_capabilities
+        assert parser.args.profile is None
+        assert parser.args.profile_mode == "cprofile"
+        assert parser.args.profile_interval == 0.01
+        assert not parser.args.resume
+        assert parser.args.state_dir is None
+        assert not parser.args.dedup
+        assert parser.args.hash_algorithm == "sha256"
+        assert not parser.args.watch
+        assert parser.args.manifest is None
+        assert parser.args.check_names == "off"
+        assert not parser.args.track_confirmations
+        assert not parser.args.generate_thumbnails
+        assert parser.args.thumbnail_workers is None
+        assert not parser.args.compress_thumbnails
+        assert parser.args.thumbnail_max_size == 1280
+        assert parser.args.thumbnail_format == "jpeg"
+        assert parser.args.thumbnail_quality == 85
+        assert not parser.args.thumbnail_cache
+        assert parser.args.thumbnail_cache_ttl == 30.0
+        assert parser.args.thumbnail_cache_size == 10000
+        assert not parser.args.transcode
+        assert parser.args.transcode_workers is None
+        assert parser.args.transcode_budget == 10.0
+        assert parser.args.confirm_timeout == 600.0
+        assert parser.args.settle_seconds == 5.0
+
+    def test_workers(self, parser: Type[Parser]) -> None:
+        """Test that --workers is parsed as an integer."""
+        parser.parse(("path/to/dir", "test_ch", "--workers", "8", "--async"))
+        assert parser.args.workers == 8
+        assert parser.args.use_async
+
+    def test_pacing(self, parser: Type[Parser]) -> None:
+        """Test that the pacing arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--rate", "0.2", "--burst", "1")
+        parser.parse(args + ("--no-adaptive",))
+        assert parser.args.rate == 0.2
+        assert parser.args.burst == 1
+        assert not parser.args.adaptive
+
+    def test_recursive(self, parser: Type[Parser]) -> None:
+        """Test that the recursive scanning arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--recursive", "--scan-workers", "16")
+        parser.parse(args + ("--scan-cache",))
+        assert parser.args.recursive
+        assert parser.args.scan_cache
+        assert parser.args.scan_workers == 16
+
+    def test_watch(self, parser: Type[Parser]) -> None:
+        """Test that the watch mode arguments are parsed correctly."""
+        parser.parse(("path/to/dir", "test_ch", "--watch", "--settle-seconds", "1.5"))
+        assert parser.args.watch
+        assert parser.args.settle_seconds == 1.5
+
+    def test_manifest(self, parser: Type[Parser]) -> None:
+        """Test that --manifest is parsed as a path."""
+        parser.parse(("path/to/dir", "test_ch", "--manifest", "files.csv"))
+        assert parser.args.manifest == "files.csv"
+
+    def test_check_names(self, parser: Type[Parser]) -> None:
+        """Test that --check-names only accepts the known modes."""
+        parser.parse(("path/to/dir", "test_ch", "--check-names", "suffix"))
+        assert parser.args.check_names == "suffix"
+        with pytest.raises(SystemExit):
+            parser.parse(("path/to/dir", "test_ch", "--check-names", "rename"))
+
+    def test_track_confirmations(self, parser: Type[Parser]) -> None:
+        """Test that the confirmation tracking arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--track-confirmations")
+        parser.parse(args + ("--confirm-timeout", "30"))
+        assert parser.args.track_confirmations
+        assert parser.args.confirm_timeout == 30.0
+
+    def test_generate_thumbnails(self, parser: Type[Parser]) -> None:
+        """Test that the thumbnail generation arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--generate-thumbnails")
+        parser.parse(args + ("--thumbnail-workers", "2"))
+        assert parser.args.generate_thumbnails
+        assert parser.args.thumbnail_workers == 2
+
+    def test_compress_thumbnails(self, parser: Type[Parser]) -> None:
+        """Test that the thumbnail compression arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--compress-thumbnails")
+        args += ("--thumbnail-max-size", "720", "--thumbnail-format", "webp")
+        parser.parse(args + ("--thumbnail-quality", "60"))
+        assert parser.args.compress_thumbnails
+        assert parser.args.thumbnail_max_size == 720
+        assert parser.args.thumbnail_format == "webp"
+        assert parser.args.thumbnail_quality == 60
+        with pytest.raises(SystemExit):
+            parser.parse(("path/to/dir", "test_ch", "--thumbnail-format", "png"))
+
+    def test_thumbnail_cache(self, parser: Type[Parser]) -> None:
+        """Test that the thumbnail url cache arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--thumbnail-cache")
+        args += ("--thumbnail-cache-ttl", "7", "--thumbnail-cache-size", "500")
+        parser.parse(args)
+        assert parser.args.thumbnail_cache
+        assert parser.args.thumbnail_cache_ttl == 7.0
+        assert parser.args.thumbnail_cache_size == 500
+
+    def test_transcode(self, parser: Type[Parser]) -> None:
+        """Test that the transcoding arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--transcode", "--transcode-workers", "3")
+        parser.parse(args + ("--transcode-budget", "2.5"))
+        assert parser.args.transcode
+        assert parser.args.transcode_workers == 3
+        assert parser.args.transcode_budget == 2.5
+
+    def test_retries(self, parser: Type[Parser]) -> None:
+        """Test that the retry arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--retries", "5", "--retry-delay", "0.5")
+        parser.parse(args)
+        assert parser.args.retries == 5
+        assert parser.args.retry_delay == 0.5
+
+    def test_timeouts(self, parser: Type[Parser]) -> None:
+        """Test that the timeout arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--connect-timeout", "2")
+        parser.parse(args + ("--read-timeout", "30"))
+        assert parser.args.connect_timeout == 2.0
+        assert parser.args.read_timeout == 30.0
+
+    def test_metrics(self, parser: Type[Parser]) -> None:
+        """Test that the metrics arguments are parsed correctly."""
+        args = (
+            "path/to/dir",
+            "test_ch",
+            "--metrics-textfile",
+            "uploader.prom",
+            "--metrics-json",
+            "metrics.json",
+        )
+        parser.parse(args)
+        assert parser.args.metrics_textfile == "uploader.prom"
+        assert parser.args.metrics_json == "metrics.json"
+
+    def test_speech_url(self, parser: Type[Parser]) -> None:
+        """Test that the spee.ch endpoint is parsed correctly."""
+        url = "http://localhost:3000/api/claim/publish"
+        parser.parse(("path/to/dir", "test_ch", "--speech-url", url))
+        assert parser.args.speech_url == url
+
+    def test_capabilities(self, parser: Type[Parser]) -> None:
+        """Test that the capability cache arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--capability-ttl", "0")
+        parser.parse(args + ("--refresh-capabilities",))
+        assert parser.args.capability_ttl == 0.0
+        assert parser.args.refresh_capabilities
+
+    def test_profile(self, parser: Type[Parser]) -> None:
+        """Test that the profiling arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--profile", "run", "--profile-mode")
+        parser.parse(args + ("sampling", "--profile-interval", "0.05"))
+        assert parser.args.profile == "run"
+        assert parser.args.profile_mode == "sampling"
+        assert parser.args.profile_interval == 0.05
+
+    def test_resume(self, parser: Type[Parser]) -> None:
+        """Test that the journal arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--resume", "--state-dir", "/tmp/state")
+        parser.parse(args)
+        assert parser.args.resume
+        assert parser.args.state_dir == "/tmp/state"
+
+    def test_dedup(self, parser: Type[Parser]) -> None:
+        """Test that the deduplication arguments are parsed correctly."""
+        args = ("path/to/dir", "test_ch", "--dedup", "--hash-algorithm", "blake2b")
+        parser.parse(args)
+        assert parser.args.dedup
+        assert parser.args.hash_algorithm == "blake2b"
+
+    @pytest.mark.parametrize("args", [("path/to/dir", "test_ch", "--workers", "a")])
+    def test_workers_misspec(
+        self,
+        parser: Type[Parser],
+        args: Sequence[str],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test when --workers is not an integer."""
+        with pytest.raises(SystemExit):
+            parser.parse(args)
+
+        captured = capsys.readouterr()
+        err_msg = f"{parser.argparser.prog}: error: argument --workers"
+        assert captured.out == ""
+        assert err_msg in captured.err
+        check_no_args(parser)
+
+
+class TestStartup:
+    """Tests related to the startup time of the command line."""
+
+    def test_language_tag(self) -> None:
+        """Test that only the tags in the table are accepted."""
+        assert language_tag("zh-TW") == "zh-TW"
+        with pytest.raises(ArgumentTypeError, match="invalid choice: 'xx'"):
+            language_tag("xx")
+
+    def test_lazy_imports(self) -> None:
+        """Test that --help loads neither requests nor the language table."""
+        code = (
+            "import sys\n"
+            + "sys.argv = ['lbry_batch_uploader', '--help']\n"
+            + "try:\n"
+            + "    import lbry_batch_uploader.__main__\n"
+            + "except SystemExit:\n"
+            + "    pass\n"
+            + "heavy = ('requests', 'asyncio', 'lbry_batch_uploader.languages')\n"
+            + "print(sorted(name for name in heavy if name in sys.modules))\n"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert proc.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,134 @@
+import pytest
+import _thread
+import threading
+from lbry_batch_uploader.pipeline import Pipeline, Stage
+from typing import Iterator, List
+
+
+def double(x: int) -> int:
+    return 2 * x
+
+
+def fail_on_six(x: int) -> int:
+    if x == 6:
+        raise ValueError("six is not allowed")
+    return x + 1
+
+
+class TestPipeline:
+    """Testing the Pipeline class."""
+
+    @pytest.mark.parametrize(
+        "stages, maxsize, err_msg",
+        [
+            ([], 1, "A pipeline needs at least one stage."),
+            ([Stage("a", double, 1)], 0, "The queue size 0 is not a positive"),
+        ],
+    )
+    def test_wrong_args(self, stages: List[Stage], maxsize: int, err_msg: str):
+        """Test that invalid stages or queue size are rejected."""
+        with pytest.raises(ValueError, match=err_msg):
+            _ = Pipeline(stages, maxsize)
+
+    def test_wrong_workers(self) -> None:
+        """Test that a stage needs at least one worker."""
+        err_msg = "The number of workers 0 is not a positive integer."
+        with pytest.raises(ValueError, match=err_msg):
+            _ = Stage("a", double, 0)
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_results(self, workers: int) -> None:
+        """Test that every item runs through all stages in order."""
+        pipeline = Pipeline(
+            [Stage("a", double, workers), Stage("b", fail_on_six, workers)], 2
+        )
+        results = {}
+        errors = {}
+        for item, future in pipeline.run(range(10)):
+            if future.exception() is None:
+                results[item] = future.result()
+            else:
+                errors[item] = str(future.exception())
+
+        assert results == {i: 2 * i + 1 for i in range(10) if i != 3}
+        assert errors == {3: "six is not allowed"}
+
+    def test_source_error(self) -> None:
+        """Test that an error from the items is raised after the others."""
+
+        def items() -> Iterator[int]:
+            yield 1
+            yield 2
+            raise OSError("disk is gone")
+
+        pipeline = Pipeline([Stage("a", double, 2)], 1)
+        results = []
+        with pytest.raises(OSError, match="disk is gone"):
+            for _, future in pipeline.run(items()):
+                results.append(future.result())
+        assert sorted(results) == [2, 4]
+
+    def test_overlap(self) -> None:
+        """Test that the first stage keeps going while the second is busy."""
+        prepared = []
+        all_prepared = threading.Event()
+
+        def prepare(x: int) -> int:
+            prepared.append(x)
+            if len(prepared) == 3:
+                all_prepared.set()
+            return x
+
+        def publish(x: int) -> int:
+            # Block the first item until the next two have been prepared
+            if x == 0:
+                assert all_prepared.wait(timeout=5)
+            return x
+
+        pipeline = Pipeline([Stage("a", prepare, 1), Stage("b", publish, 1)], 2)
+        results = [future.result() for _, future in pipeline.run(range(3))]
+        assert results == [0, 1, 2]
+
+    def test_backpressure(self) -> None:
+        """Test that the items are consumed lazily."""
+        consumed = []
+
+        def items() -> Iterator[int]:
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        pipeline = Pipeline([Stage("a", double, 1)], 1)
+        for _, future in pipeline.run(items()):
+            assert future.result() == 0
+            break
+        assert len(consumed) < 10
+
+    def test_interrupt(self) -> None:
+        """Test that Ctrl-C stops taking items, but finishes those already taken."""
+        started = threading.Event()
+        closed = threading.Event()
+
+        def items() -> Iterator[int]:
+            yield 0
+            # e.g. a watcher waiting for new files until it is closed
+            closed.wait(5)
+            yield from range(1, 100)
+
+        def publish(x: int) -> int:
+            started.set()
+            # Still running when the main thread is interrupted
+            assert closed.wait(5)
+            return x
+
+        def interrupt() -> None:
+            started.wait(5)
+            _thread.interrupt_main()
+
+        pipeline = Pipeline([Stage("a", publish, 1)], 1, on_close=closed.set)
+        results = []
+        threading.Thread(target=interrupt).start()
+        with pytest.raises(KeyboardInterrupt):
+            for _, future in pipeline.run(items()):
+                results.append(future.result())
+        assert results == [0]
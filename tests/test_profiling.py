@@ -0,0 +1,133 @@
+import pytest
+import cProfile
+import os
+import pathlib
+import pstats
+import threading
+import time
+from lbry_batch_uploader.profiling import Profiler
+from typing import Set, Type
+
+
+def busy_function() -> int:
+    """Do a bit of work to show up in the profiles."""
+    return sum(i * i for i in range(10000))
+
+
+class TestProfiler:
+    """Testing the Profiler class."""
+
+    @pytest.mark.parametrize("kwargs", [{"mode": "perf"}, {"interval": 0}])
+    def test_invalid(self, kwargs: dict) -> None:
+        """Test that an unknown mode or a zero interval raises ValueError."""
+        with pytest.raises(ValueError):
+            Profiler("run", **kwargs)
+
+    def test_disabled(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that nothing is profiled or written without a run directory."""
+        profiler = Profiler()
+        with profiler:
+            with profiler.phase("upload_all_files"), profiler.stage("publish"):
+                busy_function()
+
+        assert not profiler.enabled
+        assert profiler._phases == {}
+        assert profiler._stages == {}
+
+    def test_cprofile(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the phases and the stages are written as .pstats files."""
+        run_dir = tmp_path / "profile"
+        profiler = Profiler(str(run_dir))
+
+        def work() -> None:
+            for _ in range(2):
+                with profiler.stage("publish"):
+                    busy_function()
+
+        with profiler:
+            with profiler.phase("upload_all_files"):
+                threads = [threading.Thread(target=work) for _ in range(2)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                # Already profiled as part of the phase
+                with profiler.stage("metadata"):
+                    busy_function()
+
+        assert sorted(os.listdir(run_dir)) == [
+            "stage_publish.pstats",
+            "upload_all_files.pstats",
+        ]
+        stats = pstats.Stats(str(run_dir / "stage_publish.pstats"))
+        calls = {
+            func[2]: value[1] for func, value in stats.stats.items()  # type: ignore
+        }
+        # Merged across both threads
+        assert calls["busy_function"] == 4
+
+    def test_cprofile_one_at_a_time(
+        self,
+        tmp_path: Type[pathlib.Path],
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a skipped stage is warned about once, as on python 3.12+."""
+
+        class SingleProfile(cProfile.Profile):
+            active: Set[int] = set()
+
+            def enable(self, *args, **kwargs) -> None:
+                if self.active - {id(self)}:
+                    raise ValueError("Another profiling tool is already active")
+                self.active.add(id(self))
+                super().enable(*args, **kwargs)
+
+            def disable(self) -> None:
+                self.active.discard(id(self))
+                super().disable()
+
+        monkeypatch.setattr(cProfile, "Profile", SingleProfile)
+        run_dir = tmp_path / "profile"
+        profiler = Profiler(str(run_dir))
+
+        def work() -> None:
+            for _ in range(2):
+                with profiler.stage("publish"):
+                    busy_function()
+
+        with profiler:
+            with profiler.phase("upload_all_files"):
+                thread = threading.Thread(target=work)
+                thread.start()
+                thread.join()
+        captured = capsys.readouterr()
+
+        assert os.listdir(run_dir) == ["upload_all_files.pstats"]
+        assert captured.out.count("Skipped profiling stage publish") == 1
+        assert "use --profile-mode sampling" in captured.out
+
+    def test_sampling(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the stacks are collapsed, rooted at the thread group."""
+        run_dir = tmp_path / "profile"
+        stop = threading.Event()
+
+        def work() -> None:
+            while not stop.is_set():
+                busy_function()
+
+        with Profiler(str(run_dir), "sampling", 0.001) as profiler:
+            thread = threading.Thread(target=work, name="publish-0")
+            thread.start()
+            time.sleep(0.2)
+            stop.set()
+            thread.join()
+
+        assert os.listdir(run_dir) == ["samples.collapsed"]
+        lines = (run_dir / "samples.collapsed").read_text().splitlines()
+        assert sum(profiler.samples.values()) == sum(
+            int(line.rsplit(" ", 1)[1]) for line in lines
+        )
+        publish = [line for line in lines if line.startswith("publish;")]
+        assert publish
+        assert any("busy_function (test_profiling.py:" in line for line in publish)
@@ -0,0 +1,237 @@
+import pytest
+import asyncio
+import time
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from lbry_batch_uploader.retry import (
+    CircuitBreaker,
+    RetryPolicy,
+    is_transient,
+    is_unsent,
+)
+from lbry_batch_uploader.utils import (
+    CircuitOpenError,
+    ConnectFailedError,
+    TransientDaemonError,
+    TransientError,
+)
+from typing import List, Type
+
+
+class FakeClock:
+    """A monotonic clock that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch: Type[pytest.MonkeyPatch]) -> FakeClock:
+    """Replace time.monotonic and time.sleep with a fake clock."""
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(time, "sleep", fake.sleep)
+    return fake
+
+
+def flaky(errors: List[Exception], result: str = "ok"):
+    """Return a function raising the errors in turn, then returning 'result'."""
+    calls = []
+
+    def func(*args):
+        calls.append(args)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    func.calls = calls
+    return func
+
+
+class TestIsTransient:
+    """Testing the is_transient function."""
+
+    @pytest.mark.parametrize(
+        "error",
+        (
+            TransientError("HTTP 503"),
+            requests.ConnectionError("Connection reset by peer"),
+            requests.Timeout("Read timed out"),
+            ConnectionError("Connection to localhost:5279 failed"),
+            asyncio.TimeoutError(),
+        ),
+    )
+    def test_transient(self, error: Exception) -> None:
+        """Test that dropped connections, timeouts and 5xx are retried."""
+        assert is_transient(error)
+
+    @pytest.mark.parametrize(
+        "error",
+        (ValueError("Invalid claim name"), KeyError("error"), FileNotFoundError()),
+    )
+    def test_permanent(self, error: Exception) -> None:
+        """Test that invalid requests and missing files are not retried."""
+        assert not is_transient(error)
+
+
+class TestIsUnsent:
+    """Testing the is_unsent function."""
+
+    @pytest.mark.parametrize(
+        "error",
+        (
+            requests.ConnectionError(
+                MaxRetryError(
+                    None,
+                    "http://localhost:5279/",
+                    NewConnectionError(None, "Connection refused"),
+                )
+            ),
+            requests.ConnectTimeout("Connection to localhost timed out"),
+            CircuitOpenError("The circuit of lbrynet is open"),
+            TransientDaemonError("Exception: The wallet is busy"),
+            ConnectFailedError("Connection to localhost:5279 failed"),
+        ),
+    )
+    def test_unsent(self, error: Exception) -> None:
+        """Test that refused connections and daemon errors are safe to send again."""
+        assert is_unsent(error)
+
+    @pytest.mark.parametrize(
+        "error",
+        (
+            requests.ConnectionError("Connection reset by peer"),
+            requests.ReadTimeout("Read timed out"),
+            requests.exceptions.ChunkedEncodingError("Connection broken"),
+            TransientError("HTTP 504 from http://localhost:5279"),
+            ConnectionError("Connection to localhost:5279 failed"),
+        ),
+    )
+    def test_maybe_sent(self, error: Exception) -> None:
+        """Test that errors after the request was sent are not safe to send again."""
+        assert is_transient(error)
+        assert not is_unsent(error)
+
+
+class TestCircuitBreaker:
+    """Testing the CircuitBreaker class."""
+
+    def test_opens_after_threshold(self, clock: FakeClock) -> None:
+        """Test that the calls fail fast once the threshold is reached."""
+        breaker = CircuitBreaker("lbrynet", threshold=2, reset_timeout=10)
+        breaker.on_failure()
+        breaker.before_call()
+        breaker.on_failure()
+        assert breaker.state == "open"
+
+        clock.now += 4
+        with pytest.raises(CircuitOpenError) as excinfo:
+            breaker.before_call()
+        assert excinfo.value.retry_after == 6
+
+    def test_half_open(self, clock: FakeClock) -> None:
+        """Test that a single trial call either closes or reopens the circuit."""
+        breaker = CircuitBreaker("lbrynet", threshold=1, reset_timeout=10)
+        breaker.on_failure()
+        clock.now += 10
+        assert breaker.state == "half-open"
+
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.on_failure()
+        assert breaker.state == "open"
+
+        clock.now += 10
+        breaker.before_call()
+        breaker.on_success()
+        assert breaker.state == "closed"
+        breaker.before_call()
+
+    def test_invalid(self) -> None:
+        """Test that a non-positive threshold or timeout raises ValueError."""
+        with pytest.raises(ValueError):
+            CircuitBreaker("lbrynet", threshold=0)
+        with pytest.raises(ValueError):
+            CircuitBreaker("lbrynet", reset_timeout=0)
+
+
+class TestRetryPolicy:
+    """Testing the RetryPolicy class."""
+
+    def test_retry_transient(self, clock: FakeClock) -> None:
+        """Test that transient errors are retried with growing delays."""
+        retries = []
+        policy = RetryPolicy(4, 1.0, on_retry=lambda *args: retries.append(args))
+        breaker = CircuitBreaker("lbrynet")
+        func = flaky([TransientError("busy"), requests.ConnectionError("reset")])
+
+        assert policy.call(breaker, func, "a") == "ok"
+        assert func.calls == [("a",)] * 3
+        assert [attempt for _, attempt, _ in retries] == [1, 2]
+        assert 0 <= clock.sleeps[0] <= 1.0
+        assert 0 <= clock.sleeps[1] <= 2.0
+        assert breaker.failures == 0
+
+    def test_permanent(self, clock: FakeClock) -> None:
+        """Test that permanent errors are raised right away."""
+        policy = RetryPolicy(4)
+        func = flaky([ValueError("Invalid claim name")])
+        with pytest.raises(ValueError):
+            policy.call(CircuitBreaker("lbrynet"), func)
+        assert len(func.calls) == 1
+        assert clock.sleeps == []
+
+    def test_give_up(self, clock: FakeClock) -> None:
+        """Test that the last transient error is raised after all attempts."""
+        policy = RetryPolicy(3)
+        breaker = CircuitBreaker("lbrynet", threshold=10)
+        func = flaky([TransientError(str(idx)) for idx in range(5)])
+        with pytest.raises(TransientError, match="2"):
+            policy.call(breaker, func)
+        assert len(func.calls) == 3
+        assert breaker.failures == 3
+
+    def test_backoff_cap(self) -> None:
+        """Test that the delays never exceed 'max_delay'."""
+        policy = RetryPolicy(10, base_delay=1.0, max_delay=5.0)
+        assert all(0 <= policy.backoff(attempt) <= 5.0 for attempt in range(1, 20))
+
+    def test_wait_for_open_circuit(self, clock: FakeClock) -> None:
+        """Test that an open circuit is waited for, without calling 'func'."""
+        policy = RetryPolicy(3, base_delay=0.1)
+        breaker = CircuitBreaker("spee.ch", threshold=1, reset_timeout=30)
+        breaker.on_failure()
+        func = flaky([])
+
+        assert policy.call(breaker, func) == "ok"
+        assert len(func.calls) == 1
+        assert clock.sleeps[0] >= 30
+
+    def test_call_async(self, clock: FakeClock) -> None:
+        """Test that coroutines are retried the same way."""
+        policy = RetryPolicy(3, base_delay=0.0)
+        errors = [ConnectionError("reset")]
+
+        async def func(value: str) -> str:
+            if errors:
+                raise errors.pop(0)
+            return value
+
+        result = asyncio.run(policy.call_async(CircuitBreaker("lbrynet"), func, "a"))
+        assert result == "a"
+
+    def test_invalid(self) -> None:
+        """Test that invalid attempts or delays raise ValueError."""
+        with pytest.raises(ValueError):
+            RetryPolicy(0)
+        with pytest.raises(ValueError):
+            RetryPolicy(3, base_delay=10.0, max_delay=1.0)
@@ -0,0 +1,221 @@
+import pytest
+import os
+import pathlib
+from lbry_batch_uploader.scanner import (
+    ScanCache,
+    classify_entries,
+    scan_directory,
+    walk_directories,
+)
+from typing import List, Type
+
+
+class TestClassifyEntries:
+    """Testing the classify_entries function."""
+
+    def test_classify(self) -> None:
+        """Test that media files are paired with their sidecar files."""
+        names = ["b.mkv", "b.png", "a.mp4", "a.txt", "a.jpg", "c.md", "d.txt"]
+        assert classify_entries(names) == {
+            "a": {
+                "file_name": "a.mp4",
+                "desc_name": "a.txt",
+                "thumbnail_name": "a.jpg",
+            },
+            "b": {"file_name": "b.mkv", "desc_name": "", "thumbnail_name": "b.png"},
+        }
+
+    def test_sorted(self) -> None:
+        """Test that the media files are sorted by their file names."""
+        names = [f"{i}.mp3" for i in (3, 10, 1, 2)]
+        files_valid = classify_entries(names)
+        assert list(files_valid.keys()) == ["1", "10", "2", "3"]
+
+    @pytest.mark.parametrize(
+        "names, desc_name, thumbnail_name",
+        [
+            (["x.webm", "x.description", "x.txt"], "x.txt", ""),
+            (["x.webm", "x.webp", "x.png", "x.gif"], "", "x.gif"),
+            (["x.webm", "x.WEBP", "x.Description"], "x.Description", "x.WEBP"),
+        ],
+    )
+    def test_sidecar_priority(
+        self, names: List[str], desc_name: str, thumbnail_name: str
+    ) -> None:
+        """Test that the sidecar extensions are matched in priority order."""
+        finfos = classify_entries(names)["x"]
+        assert finfos["desc_name"] == desc_name
+        assert finfos["thumbnail_name"] == thumbnail_name
+
+    @pytest.mark.parametrize(
+        "names",
+        [
+            ["no_extension", "mp4"],
+            ["video.mov", "video.txt", "video.png"],
+            ["video.mp4.part"],
+        ],
+    )
+    def test_ignored(self, names: List[str]) -> None:
+        """Test that names without a valid media extension are ignored."""
+        assert classify_entries(names) == {}
+
+    def test_dots_in_name(self) -> None:
+        """Test that only the last extension is stripped off."""
+        names = ["a.b.c.MP4", "a.b.c.txt", "a.b.jpg"]
+        assert classify_entries(names)["a.b.c"] == {
+            "file_name": "a.b.c.MP4",
+            "desc_name": "a.b.c.txt",
+            "thumbnail_name": "",
+        }
+
+
+@pytest.fixture
+def fake_tree(tmp_path: Type[pathlib.Path]) -> Type[pathlib.Path]:
+    """Create a fake directory tree of shows and seasons."""
+    root = tmp_path / "archive"
+    for rel_dir in ("", "show_a/season_1", "show_a/season_2", "show_b", ".state"):
+        d = root / rel_dir
+        d.mkdir(parents=True, exist_ok=True)
+        for ext in ("mp4", "txt", "png"):
+            (d / f"episode.{ext}").touch()
+    (root / "show_b" / "extra.md").touch()
+    os.symlink(root / "show_a", root / "show_b" / "link_to_a")
+    return root
+
+
+class TestWalkDirectories:
+    """Testing the walk_directories function."""
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_walk(self, fake_tree: Type[pathlib.Path], workers: int) -> None:
+        """Test that every visible directory is classified exactly once."""
+        found = dict(walk_directories(str(fake_tree), workers))
+        rel_dirs = [
+            "",
+            "show_a",
+            os.path.join("show_a", "season_1"),
+            os.path.join("show_a", "season_2"),
+            "show_b",
+        ]
+        assert sorted(found.keys()) == rel_dirs
+        assert found["show_a"] == {}
+        for rel_dir in rel_dirs[:1] + rel_dirs[2:]:
+            assert found[rel_dir] == {
+                "episode": {
+                    "file_name": "episode.mp4",
+                    "desc_name": "episode.txt",
+                    "thumbnail_name": "episode.png",
+                }
+            }
+
+    def test_top_first(self, fake_tree: Type[pathlib.Path]) -> None:
+        """Test that the top directory is yielded before the tree is walked."""
+        walker = walk_directories(str(fake_tree))
+        rel_dir, _ = next(walker)
+        assert rel_dir == ""
+        walker.close()
+
+    def test_missing_root(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a missing top directory raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            next(walk_directories(str(tmp_path / "missing")))
+
+
+def age_tree(root: Type[pathlib.Path], seconds: float = 60) -> None:
+    """Move the mtime of every directory in the tree into the past."""
+    # Avoid os.walk, which would be recorded by no_scandir
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            age_tree(path, seconds)
+    age_dir(root, seconds)
+
+
+def age_dir(path: Type[pathlib.Path], seconds: float) -> None:
+    """Move the mtime of a single directory into the past."""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - int(seconds * 1e9)))
+
+
+@pytest.fixture
+def no_scandir(monkeypatch: Type[pytest.MonkeyPatch]) -> List[str]:
+    """Record the directories listed by os.scandir."""
+    listed = []
+    real_scandir = os.scandir
+
+    def mock_scandir(path):
+        listed.append(os.path.basename(os.path.normpath(path)))
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", mock_scandir)
+    return listed
+
+
+class TestScanCache:
+    """Testing the ScanCache class with scan_directory and walk_directories."""
+
+    def test_scan_cached(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_tree: Type[pathlib.Path],
+        no_scandir: List[str],
+    ) -> None:
+        """Test that unchanged directories are not listed again."""
+        age_tree(fake_tree)
+        cache_path = str(tmp_path / "scan_cache.json")
+        cache = ScanCache(cache_path)
+        result = scan_directory(str(fake_tree), "", cache)
+        cache.save()
+
+        assert scan_directory(str(fake_tree), "", ScanCache(cache_path)) == result
+        assert no_scandir == ["archive"]
+
+    def test_scan_changed(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_tree: Type[pathlib.Path],
+        no_scandir: List[str],
+    ) -> None:
+        """Test that directories with a new mtime are listed again."""
+        age_tree(fake_tree)
+        cache = ScanCache(str(tmp_path / "scan_cache.json"))
+        scan_directory(str(fake_tree), "", cache)
+
+        (fake_tree / "new.mkv").touch()
+        age_dir(fake_tree, 30)
+        _, files_valid, _ = scan_directory(str(fake_tree), "", cache)
+        assert list(files_valid.keys()) == ["episode", "new"]
+        assert no_scandir == ["archive", "archive"]
+
+    def test_scan_racy(
+        self, tmp_path: Type[pathlib.Path], fake_tree: Type[pathlib.Path]
+    ) -> None:
+        """Test that recently modified directories are not cached."""
+        cache = ScanCache(str(tmp_path / "scan_cache.json"))
+        scan_directory(str(fake_tree), "", cache)
+        assert "" not in cache
+
+    def test_walk_cached(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_tree: Type[pathlib.Path],
+        no_scandir: List[str],
+    ) -> None:
+        """Test that only the changed directory is listed, and deleted ones pruned."""
+        age_tree(fake_tree)
+        cache = ScanCache(str(tmp_path / "scan_cache.json"))
+        found = dict(walk_directories(str(fake_tree), 2, cache))
+        assert len(no_scandir) == 5
+
+        season_2 = fake_tree / "show_a" / "season_2"
+        for child in season_2.iterdir():
+            child.unlink()
+        season_2.rmdir()
+        age_dir(fake_tree / "show_a", 30)
+        no_scandir.clear()
+
+        found_again = dict(walk_directories(str(fake_tree), 2, cache))
+        assert no_scandir == ["show_a"]
+        del found[os.path.join("show_a", "season_2")]
+        assert found_again == found
+        assert os.path.join("show_a", "season_2") not in cache
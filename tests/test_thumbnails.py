@@ -0,0 +1,263 @@
+import pytest
+import os
+import pathlib
+import threading
+import time
+from lbry_batch_uploader.hashing import HashCache
+from lbry_batch_uploader.thumbnails import (
+    ThumbnailCompressor,
+    ThumbnailGenerator,
+    ThumbnailUrlCache,
+    compress_command,
+    extract_frame,
+    probe_duration,
+)
+from typing import Type
+
+
+@pytest.fixture
+def generator(
+    tmp_path: Type[pathlib.Path], fake_bin: Type[pathlib.Path]
+) -> ThumbnailGenerator:
+    """Return a ThumbnailGenerator using the fake executables."""
+    hash_cache = HashCache(str(tmp_path / "hashes.json"))
+    return ThumbnailGenerator(str(tmp_path / "thumbnails"), hash_cache)
+
+
+@pytest.fixture
+def compressor(
+    tmp_path: Type[pathlib.Path], fake_bin: Type[pathlib.Path]
+) -> ThumbnailCompressor:
+    """Return a ThumbnailCompressor using the fake ffmpeg."""
+    hash_cache = HashCache(str(tmp_path / "hashes.json"))
+    return ThumbnailCompressor(str(tmp_path / "compressed"), hash_cache, 640)
+
+
+class TestFfmpegHelpers:
+    """Testing the probe_duration and extract_frame functions."""
+
+    def test_probe_duration(self, fake_bin: Type[pathlib.Path]) -> None:
+        """Test that the duration is parsed, and None is returned on errors."""
+        assert probe_duration("video.mp4") == 10.0
+        assert probe_duration("broken.mp4") is None
+        assert probe_duration("video.mp4", ffprobe="no-such-ffprobe") is None
+
+    def test_extract_frame(
+        self, tmp_path: Type[pathlib.Path], fake_bin: Type[pathlib.Path]
+    ) -> None:
+        """Test that the frame is picked after seeking into the media."""
+        out_path = tmp_path / "out.jpg"
+        assert extract_frame("video.mp4", str(out_path), seek=1.5)
+        assert out_path.read_bytes() == b"JPEG"
+        args = (fake_bin / "ffmpeg.log").read_text()
+        assert "-ss 1.500 -i video.mp4" in args
+        assert "thumbnail=100" in args
+
+        assert not extract_frame("audio.mp3", str(tmp_path / "audio.jpg"))
+
+
+class TestThumbnailGenerator:
+    """Testing the ThumbnailGenerator class."""
+
+    def test_cached_by_content(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_bin: Type[pathlib.Path],
+        generator: ThumbnailGenerator,
+    ) -> None:
+        """Test that files with the same content share a single thumbnail."""
+        for name in ("a.mp4", "b.mp4"):
+            (tmp_path / name).write_bytes(b"same content")
+
+        path_a = generator.thumbnail(str(tmp_path / "a.mp4"))
+        path_b = generator.thumbnail(str(tmp_path / "b.mp4"))
+
+        assert path_a is not None
+        assert path_a == path_b
+        assert os.path.dirname(path_a) == str(tmp_path / "thumbnails")
+        assert len((fake_bin / "ffmpeg.log").read_text().splitlines()) == 1
+        assert os.listdir(tmp_path / "thumbnails") == [os.path.basename(path_a)]
+
+    def test_no_frame(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_bin: Type[pathlib.Path],
+        generator: ThumbnailGenerator,
+    ) -> None:
+        """Test that None is returned, and cached by content, if ffmpeg fails."""
+        for name in ("audio.mp3", "copy.mp3"):
+            (tmp_path / name).write_bytes(b"audio")
+
+        assert generator.thumbnail(str(tmp_path / "audio.mp3")) is None
+        assert generator.thumbnail(str(tmp_path / "audio.mp3")) is None
+        assert generator.thumbnail(str(tmp_path / "copy.mp3")) is None
+
+        assert len((fake_bin / "ffmpeg.log").read_text().splitlines()) == 1
+        digest = generator.hash_cache.digest(str(tmp_path / "audio.mp3"))
+        assert os.listdir(tmp_path / "thumbnails") == [f"{digest}.noframe"]
+
+    def test_unavailable(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that nothing is generated if ffmpeg is not installed."""
+        monkeypatch.setenv("PATH", str(tmp_path))
+        hash_cache = HashCache(str(tmp_path / "hashes.json"))
+        generator = ThumbnailGenerator(str(tmp_path / "thumbnails"), hash_cache)
+        (tmp_path / "a.mp4").touch()
+
+        assert not generator.available
+        assert generator.thumbnail(str(tmp_path / "a.mp4")) is None
+
+
+class TestThumbnailCompressor:
+    """Testing the compress_command function and ThumbnailCompressor class."""
+
+    def test_command(self) -> None:
+        """Test that the codec and its quality follow the format."""
+        cmd = compress_command("in.png", "out.jpg", 640, "jpeg", 100)
+        assert cmd[-1] == "out.jpg"
+        assert cmd[cmd.index("-c:v") + 1] == "mjpeg"
+        assert cmd[cmd.index("-q:v") + 1] == "2"
+        assert "min(640,iw)" in cmd[cmd.index("-vf") + 1]
+
+        cmd = compress_command("in.png", "out.webp", image_format="webp", quality=70)
+        assert cmd[cmd.index("-c:v") + 1] == "libwebp"
+        assert cmd[cmd.index("-quality") + 1] == "70"
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        ({"image_format": "png"}, {"quality": 0}, {"quality": 101}, {"max_size": 1}),
+    )
+    def test_invalid_settings(self, tmp_path: Type[pathlib.Path], kwargs) -> None:
+        """Test that invalid settings raise ValueError."""
+        hash_cache = HashCache(str(tmp_path / "hashes.json"))
+        with pytest.raises(ValueError):
+            ThumbnailCompressor(str(tmp_path / "compressed"), hash_cache, **kwargs)
+
+    def test_cached_by_content_and_settings(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_bin: Type[pathlib.Path],
+        compressor: ThumbnailCompressor,
+    ) -> None:
+        """Test that the compressed thumbnails are reused until the settings change."""
+        for name in ("a.png", "b.png"):
+            (tmp_path / name).write_bytes(b"a large png")
+
+        path_a = compressor.compress(str(tmp_path / "a.png"))
+        path_b = compressor.compress(str(tmp_path / "b.png"))
+        assert path_a == path_b
+        assert os.path.dirname(path_a) == str(tmp_path / "compressed")
+        assert path_a.endswith("_640_q85.jpg")
+        assert len((fake_bin / "ffmpeg.log").read_text().splitlines()) == 1
+
+        compressor.quality = 50
+        path_c = compressor.compress(str(tmp_path / "a.png"))
+        assert path_c != path_a
+        assert len((fake_bin / "ffmpeg.log").read_text().splitlines()) == 2
+
+    def test_larger_than_source(
+        self, tmp_path: Type[pathlib.Path], compressor: ThumbnailCompressor
+    ) -> None:
+        """Test that the source is kept if compressing does not shrink it."""
+        (tmp_path / "tiny.jpg").write_bytes(b"jpg")
+        assert compressor.compress(str(tmp_path / "tiny.jpg")) == str(
+            tmp_path / "tiny.jpg"
+        )
+
+    def test_failure(
+        self, tmp_path: Type[pathlib.Path], compressor: ThumbnailCompressor
+    ) -> None:
+        """Test that the source is kept, and nothing cached, if ffmpeg fails."""
+        (tmp_path / "cover.mp3.png").write_bytes(b"a large png")
+        path = str(tmp_path / "cover.mp3.png")
+        assert compressor.compress(path) == path
+        assert os.listdir(tmp_path / "compressed") == []
+
+
+class TestThumbnailUrlCache:
+    """Testing the ThumbnailUrlCache class."""
+
+    def test_lookup(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the urls are cached across instances, per channel."""
+        path = str(tmp_path / "thumbnail_urls.json")
+        cache = ThumbnailUrlCache(path)
+        key = ThumbnailUrlCache.key("@ch", "abc")
+        assert cache.lookup(key) is None
+        cache.store(key, "https://spee.ch/abc.jpg")
+        cache.save()
+
+        cache = ThumbnailUrlCache(path)
+        assert cache.lookup(key) == "https://spee.ch/abc.jpg"
+        assert cache.lookup(ThumbnailUrlCache.key("@other", "abc")) is None
+
+    def test_ttl(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that the urls expire after the ttl."""
+        cache = ThumbnailUrlCache(str(tmp_path / "thumbnail_urls.json"), ttl=60)
+        cache.store("@ch:abc", "https://spee.ch/abc.jpg")
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 61)
+        assert cache.lookup("@ch:abc") is None
+        assert "@ch:abc" not in cache
+
+    def test_eviction(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that the oldest urls are evicted once the cache is full."""
+        cache = ThumbnailUrlCache(str(tmp_path / "thumbnail_urls.json"), max_entries=10)
+        now = time.time()
+        for idx in range(11):
+            monkeypatch.setattr(time, "time", lambda: now + idx)
+            cache.store(f"@ch:{idx}", f"https://spee.ch/{idx}.jpg")
+
+        assert len(cache) == 9
+        assert "@ch:0" not in cache
+        assert "@ch:1" not in cache
+        assert cache.lookup("@ch:10") == "https://spee.ch/10.jpg"
+
+    @pytest.mark.parametrize("kwargs", ({"ttl": 0}, {"max_entries": 0}))
+    def test_invalid(self, tmp_path: Type[pathlib.Path], kwargs) -> None:
+        """Test that a non-positive ttl or size raises ValueError."""
+        with pytest.raises(ValueError):
+            ThumbnailUrlCache(str(tmp_path / "thumbnail_urls.json"), **kwargs)
+
+    def test_single_upload(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that concurrent callers wait for a single upload."""
+        cache = ThumbnailUrlCache(str(tmp_path / "thumbnail_urls.json"))
+        future, to_upload = cache.begin_upload("@ch:abc")
+        assert to_upload
+
+        results = []
+
+        def wait() -> None:
+            other, other_to_upload = cache.begin_upload("@ch:abc")
+            assert not other_to_upload
+            results.append(other.result(timeout=5))
+
+        threads = [threading.Thread(target=wait) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        cache.end_upload("@ch:abc", "https://spee.ch/abc.jpg")
+        for thread in threads:
+            thread.join()
+
+        assert results == ["https://spee.ch/abc.jpg"] * 3
+        future, to_upload = cache.begin_upload("@ch:abc")
+        assert not to_upload
+        assert future.result() == "https://spee.ch/abc.jpg"
+
+    def test_failed_upload(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a failed upload is passed on, and tried again later."""
+        cache = ThumbnailUrlCache(str(tmp_path / "thumbnail_urls.json"))
+        future, _ = cache.begin_upload("@ch:abc")
+        other, to_upload = cache.begin_upload("@ch:abc")
+        assert not to_upload
+        cache.end_upload("@ch:abc", None, OSError("spee.ch is down"))
+
+        with pytest.raises(OSError):
+            other.result()
+        _, to_upload = cache.begin_upload("@ch:abc")
+        assert to_upload
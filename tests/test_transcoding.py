@@ -0,0 +1,127 @@
+import pytest
+import os
+import pathlib
+import threading
+from lbry_batch_uploader.transcoding import DiskBudget, Transcoder, transcode_command
+from lbry_batch_uploader.utils import TranscodingError
+from typing import Type
+
+
+@pytest.fixture
+def transcoder(
+    tmp_path: Type[pathlib.Path], fake_bin: Type[pathlib.Path]
+) -> Transcoder:
+    """Return a Transcoder using the fake ffmpeg, within a 100 bytes budget."""
+    return Transcoder(str(tmp_path / "transcoded"), 100)
+
+
+class TestDiskBudget:
+    """Testing the DiskBudget class."""
+
+    def test_not_positive(self) -> None:
+        """Test that a budget of 0 bytes raises ValueError."""
+        with pytest.raises(ValueError):
+            DiskBudget(0)
+
+    def test_blocks_until_released(self) -> None:
+        """Test that 'acquire' waits for the bytes to fit within the limit."""
+        budget = DiskBudget(10)
+        budget.acquire(8)
+        acquired = threading.Event()
+
+        def acquire() -> None:
+            budget.acquire(5)
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        assert not acquired.wait(0.1)
+        budget.release(8)
+        assert acquired.wait(5)
+        thread.join()
+        assert budget.used == 5
+
+    def test_oversized(self) -> None:
+        """Test that a file larger than the limit passes on its own."""
+        budget = DiskBudget(10)
+        budget.acquire(50)
+        assert budget.used == 50
+        budget.release(50)
+        assert budget.used == 0
+
+
+class TestTranscoder:
+    """Testing the Transcoder class."""
+
+    def test_command(self) -> None:
+        """Test that the command writes a streamable h264 mp4."""
+        cmd = transcode_command("in.mkv", "out.mp4")
+        assert cmd[0] == "ffmpeg"
+        assert cmd[-1] == "out.mp4"
+        assert "libx264" in cmd
+        assert "+faststart" in cmd
+
+    def test_transcode_and_release(
+        self,
+        tmp_path: Type[pathlib.Path],
+        fake_bin: Type[pathlib.Path],
+        transcoder: Transcoder,
+    ) -> None:
+        """Test that the output is reserved until it is released."""
+        (tmp_path / "video.mkv").write_bytes(b"x" * 40)
+        dst_path = str(tmp_path / "transcoded" / "video_fixed.mp4")
+        transcoder.transcode(str(tmp_path / "video.mkv"), dst_path)
+
+        assert pathlib.Path(dst_path).read_bytes() == b"JPEG"
+        assert transcoder.budget.used == 4
+        assert "video.mkv" in (fake_bin / "ffmpeg.log").read_text()
+
+        transcoder.release(dst_path)
+        assert not os.path.exists(dst_path)
+        assert transcoder.budget.used == 0
+        # Releasing twice is harmless
+        transcoder.release(dst_path)
+        assert transcoder.budget.used == 0
+
+    def test_failure(
+        self, tmp_path: Type[pathlib.Path], transcoder: Transcoder
+    ) -> None:
+        """Test that TranscodingError is raised, and nothing is left over."""
+        (tmp_path / "audio.mp3").write_bytes(b"x" * 40)
+        with pytest.raises(TranscodingError):
+            transcoder.transcode(
+                str(tmp_path / "audio.mp3"), str(tmp_path / "transcoded" / "a.mp4")
+            )
+
+        assert os.listdir(tmp_path / "transcoded") == []
+        assert transcoder.budget.used == 0
+
+    def test_release_all(
+        self, tmp_path: Type[pathlib.Path], transcoder: Transcoder
+    ) -> None:
+        """Test that all the transcoded files are removed."""
+        for idx in range(3):
+            (tmp_path / f"{idx}.mp4").write_bytes(b"video")
+            transcoder.transcode(
+                str(tmp_path / f"{idx}.mp4"),
+                str(tmp_path / "transcoded" / f"{idx}.mp4"),
+            )
+        assert len(os.listdir(tmp_path / "transcoded")) == 3
+
+        transcoder.release_all()
+        assert os.listdir(tmp_path / "transcoded") == []
+        assert transcoder.budget.used == 0
+
+    def test_unavailable(
+        self, tmp_path: Type[pathlib.Path], monkeypatch: Type[pytest.MonkeyPatch]
+    ) -> None:
+        """Test that TranscodingError is raised if ffmpeg is not installed."""
+        monkeypatch.setenv("PATH", str(tmp_path))
+        transcoder = Transcoder(str(tmp_path / "transcoded"), 100)
+        (tmp_path / "video.mp4").write_bytes(b"video")
+
+        assert not transcoder.available
+        with pytest.raises(TranscodingError):
+            transcoder.transcode(
+                str(tmp_path / "video.mp4"), str(tmp_path / "transcoded" / "v.mp4")
+            )
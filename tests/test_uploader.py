@@ -1,19 +1,32 @@
 import pytest
+import _thread
+import asyncio
 import os
 import time
 import requests
+import socket
 from requests import RequestException, ConnectionError
 from lbry_batch_uploader.parser import Parser
+from lbry_batch_uploader import uploader as uploader_module
+from lbry_batch_uploader.async_client import AsyncHttpClient
+from lbry_batch_uploader.cache import JsonStore
+from lbry_batch_uploader.confirmations import ConfirmationTracker
+from lbry_batch_uploader.journal import UploadJournal
 from lbry_batch_uploader.uploader import Uploader
-from typing import Dict, Type
+from lbry_batch_uploader.pacing import AimdRateLimiter
+from typing import Dict, List, Type
 import argparse
+import functools
+import json
 import pathlib
+import sys
+import threading
 
 
 class MockResponse:
     """Dummy mock request.Resopnse class."""
 
-    pass
+    status_code = 200
 
 
 class MockResponseVersion(MockResponse):
@@ -56,11 +69,24 @@ class MockResponseThumbnail(MockResponse):
         return {"data": {"serveUrl": "https://abc123.xyz"}}
 
 
+class MockResponsePublishError(MockResponse):
+    """Mocking bad request.Resopnse.json for file upload."""
+
+    @staticmethod
+    def json() -> Dict[str, Dict[str, object]]:
+        return {
+            "error": {
+                "data": {"name": "InsufficientFundsError"},
+                "message": "Not enough funds to cover this transaction.",
+            }
+        }
+
+
 @pytest.fixture
 def mock_response_good(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
-    """Mock Requests.post() to return MockResponse instead."""
+    """Mock Requests.Session.post() to return MockResponse instead."""
 
-    def mock_post(*args, **kwargs):
+    def mock_post(session, url, **kwargs):
         try:
             method = kwargs["json"]["method"]
             if method == "version":
@@ -73,31 +99,31 @@ def mock_response_good(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
             mock_response_instance = MockResponseThumbnail()
         return mock_response_instance
 
-    monkeypatch.setattr(requests, "post", mock_post)
+    monkeypatch.setattr(requests.Session, "post", mock_post)
 
 
 @pytest.fixture
 def mock_response_badport(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
-    """Mock Requests.post() to raise requests.ConnectionError instead."""
+    """Mock Requests.Session.post() to raise requests.ConnectionError instead."""
 
-    def mock_post(*args, **kwargs):
+    def mock_post(session, url, **kwargs):
         method = kwargs["json"]["method"]
         if method == "version":
-            port = int(args[0].split(":")[-1])
+            port = int(url.split(":")[-1])
             err_msg = f"HTTPConnectionPool(host='localhost', {port=})"
             raise ConnectionError(err_msg)
         elif method == "ffmpeg_find":
             mock_response_instance = MockResponseFfmpeg()
         return mock_response_instance
 
-    monkeypatch.setattr(requests, "post", mock_post)
+    monkeypatch.setattr(requests.Session, "post", mock_post)
 
 
 @pytest.fixture
 def mock_response_noffmpeg(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
-    """Mock Requests.post() to return MockResponseFfmpegMissing instead."""
+    """Mock Requests.Session.post() to return MockResponseFfmpegMissing instead."""
 
-    def mock_post(*args, **kwargs):
+    def mock_post(session, url, **kwargs):
         method = kwargs["json"]["method"]
         if method == "version":
             mock_response_instance = MockResponseVersion()
@@ -105,7 +131,81 @@ def mock_response_noffmpeg(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
             mock_response_instance = MockResponseFfmpegMissing()
         return mock_response_instance
 
-    monkeypatch.setattr(requests, "post", mock_post)
+    monkeypatch.setattr(requests.Session, "post", mock_post)
+
+
+@pytest.fixture
+def mock_response_publish_error(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
+    """Mock Requests.Session.post() so that publishing "1.mkv" fails in lbrynet."""
+
+    def mock_post(session, url, **kwargs):
+        try:
+            method = kwargs["json"]["method"]
+            if method == "version":
+                mock_response_instance = MockResponseVersion()
+            elif method == "ffmpeg_find":
+                mock_response_instance = MockResponseFfmpeg()
+            elif kwargs["json"]["params"]["file_path"].endswith("1.mkv"):
+                mock_response_instance = MockResponsePublishError()
+            else:
+                mock_response_instance = MockResponseFile()
+        except KeyError:
+            mock_response_instance = MockResponseThumbnail()
+        return mock_response_instance
+
+    monkeypatch.setattr(requests.Session, "post", mock_post)
+
+
+@pytest.fixture
+def mock_response_async(monkeypatch: Type[pytest.MonkeyPatch]) -> None:
+    """Mock AsyncHttpClient.post() to return the json of MockResponse instead."""
+
+    async def mock_post(client, url, **kwargs):
+        await asyncio.sleep(0)
+        if "json" in kwargs:
+            if kwargs["json"]["params"]["file_path"].endswith("1.mkv"):
+                return MockResponsePublishError.json()
+            return MockResponseFile.json()
+        return MockResponseThumbnail.json()
+
+    monkeypatch.setattr(AsyncHttpClient, "post", mock_post)
+
+
+@pytest.fixture
+def mock_response_resolve(monkeypatch: Type[pytest.MonkeyPatch]) -> list:
+    """Mock Requests.Session.post() so that the names "1" and "1-2" are taken."""
+    calls: list = []
+
+    class MockResponseResolve(MockResponse):
+        def __init__(self, urls):
+            self.urls = urls
+
+        def json(self):
+            taken = {
+                "lbry://@batch-upload-testing/1",
+                "lbry://@batch-upload-testing/1-2",
+            }
+            not_found = {"error": {"name": "NOT_FOUND", "text": "Not found."}}
+            return {
+                "result": {
+                    url: {"claim_id": "taken0"} if url in taken else not_found
+                    for url in self.urls
+                }
+            }
+
+    def mock_post(session, url, **kwargs):
+        if "json" not in kwargs:
+            return MockResponseThumbnail()
+        method = kwargs["json"]["method"]
+        if method == "version":
+            return MockResponseVersion()
+        elif method == "resolve":
+            calls.append(kwargs["json"]["params"]["urls"])
+            return MockResponseResolve(kwargs["json"]["params"]["urls"])
+        return MockResponseFile()
+
+    monkeypatch.setattr(requests.Session, "post", mock_post)
+    return calls
 
 
 @pytest.fixture
@@ -211,6 +311,176 @@ def args_normal_no_optimize(
     return parser.args
 
 
+@pytest.fixture
+def args_workers(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, with 3 workers."""
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--workers",
+        "3",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_async(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, in async mode."""
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--async",
+        "--workers",
+        "3",
+        "--rate",
+        "1000",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_resume(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, resuming from journal."""
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--resume",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_dedup(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, skipping duplicates."""
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--dedup",
+        "--workers",
+        "2",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_recursive(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, walking subdirectories."""
+    for rel_dir in ("show/season 1", "show/season 2"):
+        d = fake_dir / rel_dir
+        d.mkdir(parents=True)
+        (d / "episode 1.mp4").touch()
+        (d / "episode 1.png").touch()
+
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--recursive",
+        "--scan-workers",
+        "2",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_watch(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, in watch mode."""
+    # The existing files have settled long ago
+    for path in fake_dir.iterdir():
+        os.utime(path, (time.time() - 60, time.time() - 60))
+
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--watch",
+        "--settle-seconds",
+        "0.1",
+        "--rate",
+        "1000",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_manifest(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, with a CSV manifest."""
+    (fake_dir / "show").mkdir()
+    (fake_dir / "show" / "episode 1.mp4").touch()
+    manifest = fake_dir / "manifest.csv"
+    manifest.write_text(
+        "path,title,description,tags,bid,thumbnail\n"
+        + "show/episode 1.mp4,The Pilot,First episode,pilot,1.0,0.gif\n"
+        + "0.mp4,,,,,https://abc123.xyz/0.png\n"
+        + ",,,,,\n"
+    )
+
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--manifest",
+        str(manifest),
+        "--tags",
+        "tag0",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_check_names(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a well-behaved argparse.Namespace object, suffixing taken names."""
+    # Both of them are cleaned to the claim name "ab"
+    (fake_dir / "a b.mp4").touch()
+    (fake_dir / "ab.mp4").touch()
+
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--check-names",
+        "suffix",
+        "--rate",
+        "1000",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
+@pytest.fixture
+def args_wrong_workers(
+    parser: Type[Parser], fake_dir: Type[pathlib.Path]
+) -> Type[argparse.Namespace]:
+    """Return a argparse.Namespace object, with non-positive workers."""
+    args = [
+        str(fake_dir),
+        "@batch-upload-testing",
+        "--workers",
+        "0",
+    ]
+    parser.parse(args)
+    return parser.args
+
+
 @pytest.fixture
 def args_wrong_path(parser: Type[Parser]) -> Type[argparse.Namespace]:
     """Return a argparse.Namespace object, with wrong file directory."""
@@ -307,6 +577,117 @@ class TestInit:
         with pytest.raises(RequestException, match=f"port={wrong_port}"):
             _ = Uploader(args_wrong_port1)
 
+    def test_wrong_workers(
+        self, args_wrong_workers: Type[argparse.Namespace], mock_response_good: None
+    ) -> None:
+        """Test the case when the specified number of workers is not positive."""
+        err_msg = "The number of workers 0 is not a positive integer."
+        with pytest.raises(ValueError, match=err_msg):
+            _ = Uploader(args_wrong_workers)
+
+    def test_wrong_scan_workers(
+        self, args_recursive: Type[argparse.Namespace], mock_response_good: None
+    ) -> None:
+        """Test the case when the number of scan workers is not positive."""
+        args_recursive.scan_workers = 0
+        err_msg = "The number of scan workers 0 is not a positive integer."
+        with pytest.raises(ValueError, match=err_msg):
+            _ = Uploader(args_recursive)
+
+    def test_wrong_timeout(
+        self, args_normal: Type[argparse.Namespace], mock_response_good: None
+    ) -> None:
+        """Test the case when the read timeout is not positive."""
+        args_normal.read_timeout = 0.0
+        err_msg = "The read timeout 0.0 is not a positive number."
+        with pytest.raises(ValueError, match=err_msg):
+            _ = Uploader(args_normal)
+
+    def test_watch_recursive(
+        self, args_watch: Type[argparse.Namespace], mock_response_good: None
+    ) -> None:
+        """Test that combining --watch with --recursive raises ValueError."""
+        args_watch.recursive = True
+        with pytest.raises(ValueError):
+            Uploader(args_watch)
+
+    def test_manifest_missing(
+        self, args_manifest: Type[argparse.Namespace], mock_response_good: None
+    ) -> None:
+        """Test that a missing manifest raises FileNotFoundError."""
+        args_manifest.manifest = "this/is/a/wrong/manifest.csv"
+        with pytest.raises(FileNotFoundError):
+            Uploader(args_manifest)
+
+    def test_manifest_recursive(
+        self, args_manifest: Type[argparse.Namespace], mock_response_good: None
+    ) -> None:
+        """Test that combining --manifest with --recursive raises ValueError."""
+        args_manifest.recursive = True
+        with pytest.raises(ValueError):
+            Uploader(args_manifest)
+
+    def test_no_local_ffmpeg(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_response_good: None,
+        tmp_path: Type[pathlib.Path],
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that --generate-thumbnails is disabled without ffmpeg."""
+        monkeypatch.setenv("PATH", str(tmp_path))
+        args_normal_no_optimize.generate_thumbnails = True
+        uploader = Uploader(args_normal_no_optimize)
+        captured = capsys.readouterr()
+
+        assert not uploader.generate_thumbnails
+        assert "--generate-thumbnails set to False." in captured.out
+
+    def test_transcode_no_local_ffmpeg(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_response_good: None,
+        tmp_path: Type[pathlib.Path],
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that --transcode is disabled without ffmpeg."""
+        monkeypatch.setenv("PATH", str(tmp_path))
+        args_normal_no_optimize.transcode = True
+        uploader = Uploader(args_normal_no_optimize)
+        captured = capsys.readouterr()
+
+        assert not uploader.transcode
+        assert "--transcode set to False." in captured.out
+
+    def test_compress_no_local_ffmpeg(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_response_good: None,
+        tmp_path: Type[pathlib.Path],
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that --compress-thumbnails is disabled without ffmpeg."""
+        monkeypatch.setenv("PATH", str(tmp_path))
+        args_normal_no_optimize.compress_thumbnails = True
+        uploader = Uploader(args_normal_no_optimize)
+        captured = capsys.readouterr()
+
+        assert not uploader.compress_thumbnails
+        assert "--compress-thumbnails set to False." in captured.out
+
+    def test_transcode_budget(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_response_good: None,
+    ) -> None:
+        """Test that a transcode budget of 0 GB raises ValueError."""
+        args_normal_no_optimize.transcode_budget = 0.0
+        with pytest.raises(ValueError):
+            Uploader(args_normal_no_optimize)
+
     def test_no_ffmpeg(
         self,
         args_no_ffmpeg: Type[argparse.Namespace],
@@ -322,6 +703,25 @@ class TestInit:
         assert msg in captured.out
         assert captured.err == ""
 
+    def test_probes_concurrent(
+        self,
+        args_normal: Type[argparse.Namespace],
+        monkeypatch: Type[pytest.MonkeyPatch],
+    ) -> None:
+        """Test that the version and ffmpeg_find requests are in flight together."""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def mock_post(session, url, **kwargs):
+            # Only passes if the other request is waiting too
+            barrier.wait()
+            if kwargs["json"]["method"] == "version":
+                return MockResponseVersion()
+            return MockResponseFfmpeg()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        uploader = Uploader(args_normal)
+        assert uploader.base_params["optimize_file"]
+
     def test_normal(self, uploader_normal: Type[Uploader]) -> None:
         """Test that the attributes are correct with the correct input."""
         assert uploader_normal.base_path is not None
@@ -338,6 +738,100 @@ class TestInit:
         assert base_params["license"] == "Other"
         assert base_params["license_url"] == "https://www.123.xyz"
 
+        assert isinstance(uploader_normal.pacer, AimdRateLimiter)
+        assert uploader_normal.pacer.rate == 1.0
+        assert uploader_normal.pacer.burst == 3
+
+    def test_capabilities_cached(
+        self,
+        args_normal: Type[argparse.Namespace],
+        monkeypatch: Type[pytest.MonkeyPatch],
+    ) -> None:
+        """Test that a second run only checks that lbrynet is listening."""
+        methods = []
+        alive = []
+
+        def mock_post(session, url, **kwargs):
+            method = kwargs["json"]["method"]
+            methods.append(method)
+            if method == "version":
+                return MockResponseVersion()
+            return MockResponseFfmpeg()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        monkeypatch.setattr(
+            uploader_module, "check_alive", lambda host, port: alive.append(port)
+        )
+        Uploader(args_normal)
+        assert sorted(methods) == ["ffmpeg_find", "version"]
+        assert alive == []
+
+        methods.clear()
+        uploader = Uploader(args_normal)
+        assert methods == []
+        assert alive == [5279]
+        assert uploader.base_params["optimize_file"]
+
+        args_normal.refresh_capabilities = True
+        Uploader(args_normal)
+        assert sorted(methods) == ["ffmpeg_find", "version"]
+
+    def test_capabilities_disabled(
+        self,
+        args_normal: Type[argparse.Namespace],
+        mock_response_good: None,
+        capability_cache: Type[pathlib.Path],
+    ) -> None:
+        """Test that a capability ttl of 0 disables the cache."""
+        args_normal.capability_ttl = 0.0
+        uploader = Uploader(args_normal)
+        assert uploader.capabilities is None
+        assert not capability_cache.exists()
+
+        args_normal.capability_ttl = -1.0
+        with pytest.raises(ValueError):
+            Uploader(args_normal)
+
+    def test_capabilities_daemon_down(
+        self,
+        args_normal: Type[argparse.Namespace],
+        mock_response_good: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+    ) -> None:
+        """Test that a cached lbrynet which is down is forgotten and probed again."""
+        Uploader(args_normal)
+
+        def create_connection(address, timeout):
+            raise ConnectionRefusedError(111, "Connection refused")
+
+        def mock_post(session, url, **kwargs):
+            raise ConnectionError(f"HTTPConnectionPool(host='localhost', {url=})")
+
+        monkeypatch.setattr(socket, "create_connection", create_connection)
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        with pytest.raises(RequestException, match="HTTPConnectionPool"):
+            Uploader(args_normal)
+
+        # Forgotten, so that the next run probes lbrynet again
+        cache = JsonStore(uploader_module.default_cache_path())
+        assert len(cache) == 0
+
+    def test_capabilities_no_ffmpeg_cached(
+        self,
+        args_no_ffmpeg: Type[argparse.Namespace],
+        mock_response_noffmpeg: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a cached missing ffmpeg still sets --optimize-file to False."""
+        Uploader(args_no_ffmpeg)
+        capsys.readouterr()
+
+        monkeypatch.setattr(uploader_module, "check_alive", lambda host, port: None)
+        uploader = Uploader(args_no_ffmpeg)
+        assert not uploader.base_params["optimize_file"]
+        assert "--optimize-file set to False." in capsys.readouterr().out
+
 
 class TestGetReqInfo:
     """Testing the _get_req_info helper function."""
@@ -422,6 +916,9 @@ class TestGetReqInfo:
         with pytest.raises(KeyError, match=f"{info_type}"):
             uploader_normal._get_req_info(req_json, info_type)
 
+        if info_type == "result":
+            assert uploader_normal.pacer.rate == 0.5
+
         captured = capsys.readouterr()
         out_msg_0 = "Error msg from lbrynet api:"
         out_msg_1 = "OtherError: This is a test error message."
@@ -458,14 +955,24 @@ class TestGetAllFiles:
             ignore_file = f"this_file_is_ignored_{idx}"
             assert ignore_file not in list(files_valid.keys())
 
-    def test_get_invalid_ftypes(self, uploader_normal: Type[Uploader]) -> None:
-        """Test that the correct exception is raised for invalid ftypes."""
-        base_path = pathlib.Path(uploader_normal.base_path)
-        files = list(base_path.iterdir())
+    def test_get_all_case_insensitive(
+        self, uploader_normal: Type[Uploader], fake_dir: Type[pathlib.Path]
+    ) -> None:
+        """Test that upper-cased extensions and .webp thumbnails are caught."""
+        for name in ("5.MP4", "5.TXT", "5.webp", "6.Mkv", "6.WEBP"):
+            (fake_dir / name).touch()
+        (fake_dir / "7.mp4").mkdir()
 
-        err_msg = "Only support getting thumbnails or descriptions."
-        with pytest.raises(ValueError, match=err_msg):
-            uploader_normal._get_valid_ftypes(files, "abc", ("abc",))
+        uploader_normal.get_all_files()
+        files_valid = uploader_normal.files_valid
+        assert len(files_valid) == 7
+        assert files_valid["5"] == {
+            "file_name": "5.MP4",
+            "desc_name": "5.TXT",
+            "thumbnail_name": "5.webp",
+        }
+        assert files_valid["6"]["thumbnail_name"] == "6.WEBP"
+        assert "7" not in files_valid
 
 
 class TestUploadAllFiles:
@@ -512,3 +1019,1033 @@ class TestUploadAllFiles:
             assert out_msg in captured.out
 
         assert captured.err == ""
+
+    def test_upload_all_workers(
+        self,
+        args_workers: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_time: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that every file is uploaded once when using multiple workers."""
+        uploader = Uploader(args_workers)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert uploader.workers == 3
+        assert uploader.client.pool_size == 4
+        assert len(uploader.claim_ids) == 5
+        assert not uploader.failures
+        for params in uploader.files_valid.values():
+            assert captured.out.count(f"uploaded {params['file_name']}\n") == 1
+        assert "Uploaded 5 of 5 files, 0 failed." in captured.out
+
+    def test_upload_all_failure(
+        self,
+        args_workers: Type[argparse.Namespace],
+        mock_response_publish_error: None,
+        mock_time: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a failed file is reported without aborting the others."""
+        uploader = Uploader(args_workers)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert list(uploader.failures.keys()) == ["1.mkv"]
+        assert "1.mkv" not in uploader.claim_ids
+        assert len(uploader.claim_ids) == 4
+        assert "Failed to upload 1.mkv\nKeyError" in captured.out
+        assert "Uploaded 4 of 5 files, 1 failed." in captured.out
+
+    def test_upload_all_metrics(
+        self,
+        tmp_path: Type[pathlib.Path],
+        args_workers: Type[argparse.Namespace],
+        mock_response_publish_error: None,
+        mock_time: None,
+    ) -> None:
+        """Test that the stages and requests are timed, and the metrics exported."""
+        args_workers.metrics_textfile = str(tmp_path / "metrics" / "uploader.prom")
+        args_workers.metrics_json = str(tmp_path / "metrics.json")
+        uploader = Uploader(args_workers)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+
+        summary = json.loads((tmp_path / "metrics.json").read_text())
+        files = {
+            item["labels"]["outcome"]: item["value"]
+            for item in summary["counters"]["files_total"]
+        }
+        assert files == {"uploaded": 4, "failed": 1}
+        rpcs = {
+            item["labels"]["method"]: item["count"]
+            for item in summary["histograms"]["rpc_seconds"]
+        }
+        assert rpcs["version"] == 1
+        assert rpcs["publish"] == 5
+        stages = {
+            item["labels"]["stage"]: item["count"]
+            for item in summary["histograms"]["stage_seconds"]
+        }
+        assert stages == {"scan": 1, "metadata": 5, "publish": 5}
+        assert summary["counters"]["stage_errors_total"] == [
+            {"labels": {"stage": "publish"}, "value": 1}
+        ]
+
+        textfile = (tmp_path / "metrics" / "uploader.prom").read_text()
+        assert "# TYPE lbry_batch_uploader_rpc_seconds histogram" in textfile
+        assert 'lbry_batch_uploader_rpc_errors_total{method="publish"} 1' in textfile
+        assert 'lbry_batch_uploader_files_total{outcome="uploaded"} 4' in textfile
+
+    def test_upload_all_profile(
+        self,
+        tmp_path: Type[pathlib.Path],
+        args_workers: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_time: None,
+    ) -> None:
+        """Test that every stage is profiled across its threads."""
+        args_workers.profile = str(tmp_path / "profile")
+        args_workers.dedup = True
+        uploader = Uploader(args_workers)
+        with uploader.profiler:
+            uploader.get_all_files()
+            uploader.upload_all_files()
+
+        assert sorted(os.listdir(tmp_path / "profile")) == [
+            "stage_hash.pstats",
+            "stage_metadata.pstats",
+            "stage_publish.pstats",
+        ]
+
+    def test_upload_all_transient(
+        self,
+        args_workers: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that transient errors are retried, and permanent ones are not."""
+        calls: Dict[str, int] = {}
+
+        class MockResponseBusy(MockResponse):
+            @staticmethod
+            def json() -> dict:
+                message = "The wallet is busy, please try again later."
+                return {"error": {"data": {"name": "Exception"}, "message": message}}
+
+        class MockResponseUnavailable(MockResponse):
+            status_code = 503
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                calls["thumbnail"] = calls.get("thumbnail", 0) + 1
+                if calls["thumbnail"] == 1:
+                    return MockResponseUnavailable()
+                return MockResponseThumbnail()
+            if kwargs["json"]["method"] == "version":
+                return MockResponseVersion()
+            file_path = kwargs["json"]["params"]["file_path"]
+            calls[file_path] = calls.get(file_path, 0) + 1
+            if file_path.endswith("1.mkv"):
+                return MockResponsePublishError()
+            if file_path.endswith("2.webm") and calls[file_path] < 3:
+                return MockResponseBusy()
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        uploader = Uploader(args_workers)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert list(uploader.failures.keys()) == ["1.mkv"]
+        assert "Uploaded 4 of 5 files, 1 failed." in captured.out
+        attempts = {os.path.basename(k): v for k, v in calls.items()}
+        assert attempts["1.mkv"] == 1
+        assert attempts["2.webm"] == 3
+        assert attempts["thumbnail"] == 6
+        assert "TransientError: HTTP 503 from https://spee.ch" in captured.out
+        assert captured.out.count("failed, retrying in") == 3
+
+    @pytest.mark.parametrize("in_wallet", (True, False))
+    def test_upload_all_publish_maybe_sent(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+        in_wallet: bool,
+    ) -> None:
+        """Test that a publish which might have gone through is looked up first."""
+        calls: List[str] = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            params = kwargs["json"]["params"]
+            if method == "txo_list":
+                calls.append(f"txo_list {params['name']}")
+                source = {"name": "2.webm"} if in_wallet else {}
+                items = [
+                    {"claim_id": "456def", "txid": "tx2", "value": {"source": source}}
+                ]
+
+                class MockResponseTxo(MockResponse):
+                    @staticmethod
+                    def json() -> dict:
+                        return {"result": {"items": items}}
+
+                return MockResponseTxo()
+            calls.append(f"publish {params['name']}")
+            if params["name"] == "2" and calls.count("publish 2") == 1:
+                # Sent, but the response was lost
+                raise ConnectionError("Connection reset by peer")
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert "Uploaded 5 of 5 files, 0 failed." in captured.out
+        assert calls.count("txo_list 2") == 1
+        if in_wallet:
+            # Not published a second time
+            assert calls.count("publish 2") == 1
+            assert uploader.claim_ids["2.webm"] == "456def"
+        else:
+            assert calls.count("publish 2") == 2
+            assert uploader.claim_ids["2.webm"] == "123abc"
+
+    def test_upload_all_publish_uncertain(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a publish is not sent again if it cannot be looked up."""
+        calls: List[str] = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            calls.append(method)
+            if method == "publish" and calls.count("publish") == 1:
+                raise requests.ReadTimeout("Read timed out")
+            if method == "txo_list":
+                raise ConnectionError("Connection reset by peer")
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        args_normal_no_optimize.workers = 1
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert calls.count("publish") == 5
+        assert "Uploaded 4 of 5 files, 1 failed." in captured.out
+        assert "UncertainPublishError: ReadTimeout: Read timed out" in captured.out
+        assert "check the wallet before publishing it again" in captured.out
+
+    def test_upload_all_publish_lookup_retried(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a transient error of the lookup is retried."""
+        calls: List[str] = []
+
+        class MockResponseTxo(MockResponse):
+            @staticmethod
+            def json() -> dict:
+                items = [
+                    {"claim_id": "456def", "value": {"source": {"name": "2.webm"}}}
+                ]
+                return {"result": {"items": items}}
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            name = kwargs["json"]["params"]["name"]
+            calls.append(f"{method} {name}")
+            if method == "txo_list":
+                if calls.count("txo_list 2") == 1:
+                    raise ConnectionError("Connection reset by peer")
+                return MockResponseTxo()
+            if name == "2":
+                raise requests.ReadTimeout("Read timed out")
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert "Uploaded 5 of 5 files, 0 failed." in captured.out
+        assert calls.count("txo_list 2") == 2
+        assert calls.count("publish 2") == 1
+        assert uploader.claim_ids["2.webm"] == "456def"
+
+    def test_upload_all_retries_exhausted(
+        self,
+        args_workers: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a file fails once its retries are exhausted."""
+        n_thumbnails = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                n_thumbnails.append(url)
+                raise ConnectionError("Connection reset by peer")
+            return MockResponseVersion()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        args_workers.retries = 1
+        uploader = Uploader(args_workers)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert "Uploaded 0 of 5 files, 5 failed." in captured.out
+        assert captured.out.count("Failed to upload") == 5
+        # The circuit of spee.ch opens after 5 failures in a row
+        assert 5 <= len(n_thumbnails) < 10
+        assert uploader.breakers["spee.ch"].state == "open"
+
+    def test_upload_all_async(
+        self,
+        args_async: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_response_async: None,
+        mock_time: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the --async mode uploads and reports every file."""
+        uploader = Uploader(args_async)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert uploader.use_async
+        assert list(uploader.failures.keys()) == ["1.mkv"]
+        assert len(uploader.claim_ids) == 4
+        for file_name in uploader.claim_ids:
+            out_msg = f"Sucessfully uploaded {file_name}\nThe claim id is 123abc\n"
+            assert out_msg in captured.out
+        assert "Uploaded 4 of 5 files, 1 failed." in captured.out
+
+    def test_upload_all_journal(
+        self,
+        uploader_normal_no_optimize: Type[Uploader],
+        mock_response_good: None,
+        mock_time: None,
+    ) -> None:
+        """Test that every uploaded file is recorded in the journal."""
+        uploader_normal_no_optimize.get_all_files()
+        uploader_normal_no_optimize.upload_all_files()
+
+        journal_path = uploader_normal_no_optimize.journal.path
+        assert journal_path == os.path.join(
+            uploader_normal_no_optimize.base_path,
+            ".lbry_batch_uploader",
+            "journal.jsonl",
+        )
+        index = UploadJournal(journal_path).load()
+        assert set(index.keys()) == set(uploader_normal_no_optimize.claim_ids.keys())
+        for file_name, entry in index.items():
+            claim_name = file_name.split(".")[0]
+            assert entry["claim_url"] == f"lbry://{claim_name}#123abc"
+            assert entry["elapsed"] >= 0
+
+    def test_upload_all_resume(
+        self,
+        args_resume: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_time: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that --resume skips the files in the journal."""
+        uploader = Uploader(args_resume)
+        for file_name in ("0.mp4", "3.mp3"):
+            uploader.journal.record(file_name, "x", "y", "lbry://x#y", 0, 0)
+        uploader.journal.close()
+
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert set(uploader.claim_ids.keys()) == {"1.mkv", "2.webm", "4.opus"}
+        assert "Skipped 2 files already in the journal." in captured.out
+        assert "Uploaded 3 of 3 files, 0 failed." in captured.out
+        assert len(UploadJournal(uploader.journal.path).load()) == 5
+
+    def test_upload_all_dedup(
+        self,
+        args_dedup: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_time: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that files with identical content are published only once."""
+        # All the fake files are empty, i.e. they have the same content
+        uploader = Uploader(args_dedup)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert len(uploader.claim_ids) == 1
+        assert len(uploader.skipped) == 4
+        assert "The same content is being uploaded as" in captured.out
+        assert "Skipped 4 files with duplicate content." in captured.out
+
+        # The published content is remembered across runs
+        uploader = Uploader(args_dedup)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert not uploader.claim_ids
+        assert len(uploader.skipped) == 5
+        assert "has been published as claim 123abc" in captured.out
+
+    def test_upload_all_dedup_failed(
+        self,
+        args_dedup: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that a failed upload does not skip the files with its content."""
+        published = []
+
+        async def mock_post(client, url, **kwargs):
+            await asyncio.sleep(0)
+            if "json" not in kwargs:
+                return MockResponseThumbnail.json()
+            published.append(kwargs["json"]["params"]["file_path"])
+            if len(published) == 1:
+                return MockResponsePublishError.json()
+            return MockResponseFile.json()
+
+        monkeypatch.setattr(AsyncHttpClient, "post", mock_post)
+        # One file at a time, so that the first one fails before the second starts
+        args_dedup.use_async = True
+        args_dedup.workers = 1
+        args_dedup.rate = 1000.0
+        uploader = Uploader(args_dedup)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert len(published) == 2
+        assert len(uploader.failures) == 1
+        assert len(uploader.claim_ids) == 1
+        assert len(uploader.skipped) == 3
+        assert "has been published as claim 123abc" in captured.out
+
+    def test_upload_all_recursive(
+        self,
+        args_recursive: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_time: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the files in subdirectories are found and uploaded."""
+        uploader = Uploader(args_recursive)
+        uploader.get_all_files()
+        assert uploader.files_valid == {}
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert len(uploader.files_valid) == 7
+        params = uploader.files_valid[os.path.join("show", "season 2", "episode 1")]
+        assert params["file_name"] == os.path.join("show", "season 2", "episode 1.mp4")
+        assert params["thumbnail_name"] == os.path.join(
+            "show", "season 2", "episode 1.png"
+        )
+        assert params["desc_name"] == ""
+        # The same file name in two subdirectories, but not the same claim name
+        assert "The claim url is lbry://show-season1-episode1#123abc" in captured.out
+        assert "The claim url is lbry://show-season2-episode1#123abc" in captured.out
+        assert "The claim url is lbry://0#123abc" in captured.out
+        assert "Uploaded 7 of 7 files, 0 failed." in captured.out
+
+    def test_get_all_scan_cache(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_response_good: None,
+    ) -> None:
+        """Test that --scan-cache gives the same files, and saves the cache."""
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        files_valid = uploader.files_valid
+
+        args_normal_no_optimize.scan_cache = True
+        uploader = Uploader(args_normal_no_optimize)
+        base_path = pathlib.Path(uploader.base_path)
+        st = base_path.stat()
+        os.utime(base_path, ns=(st.st_atime_ns, st.st_mtime_ns - int(60e9)))
+        for _ in range(2):
+            uploader.get_all_files()
+            assert uploader.files_valid == files_valid
+        assert os.path.exists(os.path.join(uploader.state_dir, "scan_cache.json"))
+
+    def test_upload_all_manifest(
+        self,
+        args_manifest: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that only the manifest rows are uploaded, with their metadata."""
+        published = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            published.append(kwargs["json"]["params"])
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        uploader = Uploader(args_manifest)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert uploader.files_valid == {}
+        assert "Skipped line 4 of" in captured.out
+        assert "Uploaded 2 of 2 files, 0 failed." in captured.out
+        params = {p["file_path"]: p for p in published}
+        episode = params[os.path.join(uploader.base_path, "show", "episode 1.mp4")]
+        assert episode["title"] == "The Pilot"
+        assert episode["name"] == "ThePilot"
+        assert episode["description"] == "First episode"
+        assert episode["tags"] == ["pilot"]
+        assert episode["bid"] == "1.0"
+        assert episode["thumbnail_url"] == "https://abc123.xyz"
+        other = params[os.path.join(uploader.base_path, "0.mp4")]
+        assert other["title"] == "0"
+        assert other["tags"] == ["tag0"]
+        assert other["thumbnail_url"] == "https://abc123.xyz/0.png"
+        assert "description" not in other
+
+    def test_upload_all_check_names_suffix(
+        self,
+        args_check_names: Type[argparse.Namespace],
+        mock_response_resolve: list,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that taken names are suffixed, with one resolve per round."""
+        uploader = Uploader(args_check_names)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        # The planned names, then a few suffixes of the taken ones
+        assert len(mock_response_resolve) == 2
+        assert len(mock_response_resolve[0]) == 6
+        assert "lbry://@batch-upload-testing/1-3" in mock_response_resolve[1]
+        assert "Renamed 1.mkv\nThe claim name 1 is already taken" in captured.out
+        assert "The claim name is 1-3 instead." in captured.out
+        assert "The claim name ab is also used by a b.mp4." in captured.out
+        assert "The claim url is lbry://1-3#123abc" in captured.out
+        assert "The claim url is lbry://ab-2#123abc" in captured.out
+        assert "Uploaded 7 of 7 files, 0 failed." in captured.out
+
+    def test_upload_all_check_names_report(
+        self,
+        args_check_names: Type[argparse.Namespace],
+        mock_response_resolve: list,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that taken names are skipped, and published names are cached."""
+        args_check_names.check_names = "report"
+        uploader = Uploader(args_check_names)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert len(mock_response_resolve) == 1
+        assert set(uploader.collisions.keys()) == {"1.mkv", "ab.mp4"}
+        assert "Skipped 1.mkv\nThe claim name 1 is already taken" in captured.out
+        assert "Skipped 2 files whose claim name is already taken." in captured.out
+        assert "Uploaded 5 of 7 files, 0 failed." in captured.out
+
+        # Every name is either taken or has just been published
+        uploader = Uploader(args_check_names)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert len(mock_response_resolve) == 1
+        assert len(uploader.collisions) == 7
+        assert "is already taken by claim 123abc" in captured.out
+
+    def test_upload_all_track_confirmations(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the publish transactions are tracked in batches."""
+        txo_calls = []
+
+        class MockResponsePublish(MockResponse):
+            def __init__(self, file_path):
+                self.txid = os.path.basename(file_path)
+
+            def json(self):
+                outputs = {0: {"claim_id": "123abc"}}
+                return {"result": {"outputs": outputs, "txid": self.txid}}
+
+        class MockResponseTxoList(MockResponse):
+            def __init__(self, txids):
+                # The transaction of "1.mkv" has been dropped
+                self.txids = [txid for txid in txids if txid != "1.mkv"]
+
+            def json(self):
+                items = [{"txid": txid, "confirmations": 1} for txid in self.txids]
+                return {"result": {"items": items}}
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            elif method == "txo_list":
+                txo_calls.append(kwargs["json"]["params"]["txid"])
+                return MockResponseTxoList(kwargs["json"]["params"]["txid"])
+            return MockResponsePublish(kwargs["json"]["params"]["file_path"])
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        monkeypatch.setattr(
+            uploader_module,
+            "ConfirmationTracker",
+            functools.partial(ConfirmationTracker, interval=0.01, max_interval=0.02),
+        )
+        args_normal_no_optimize.track_confirmations = True
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert sum(len(txids) for txids in txo_calls) == 5
+        assert uploader.tracker.failed == {"1.mkv": "1.mkv"}
+        assert "Failed to confirm 1.mkv\nThe transaction 1.mkv" in captured.out
+        assert (
+            "Confirmed 4 of 5 transactions, 1 failed, 0 still pending." in captured.out
+        )
+        report = JsonStore(os.path.join(uploader.state_dir, "confirmations.json"))
+        assert report.get("1.mkv") == {"txid": "1.mkv", "status": "failed"}
+        assert report.get("0.mp4") == {"txid": "0.mp4", "status": "confirmed"}
+
+    def test_upload_all_generate_thumbnails(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        fake_bin: Type[pathlib.Path],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the missing thumbnails are generated and uploaded."""
+        thumbnails = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                thumbnails.append(kwargs["data"].read().split(b"\r\n")[-3])
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        base_path = pathlib.Path(args_normal_no_optimize.file_directory)
+        (base_path / "no thumbnail.mp4").write_bytes(b"video")
+        (base_path / "no frame.mp3").write_bytes(b"audio")
+        args_normal_no_optimize.generate_thumbnails = True
+        args_normal_no_optimize.thumbnail_workers = 2
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert uploader.generate_thumbnails
+        assert "Uploaded 7 of 7 files, 0 failed." in captured.out
+        # The 5 existing thumbnails are empty, only one could be generated
+        assert sorted(thumbnails) == [b""] * 5 + [b"JPEG"]
+        cached = os.listdir(os.path.join(uploader.state_dir, "thumbnails"))
+        # The mp3 without a frame is cached too, so that ffmpeg skips it next time
+        assert sorted(os.path.splitext(name)[1] for name in cached) == [
+            ".jpg",
+            ".noframe",
+        ]
+        assert uploader.files_valid["no thumbnail"]["thumbnail_name"] == ""
+
+    def test_upload_all_transcode(
+        self,
+        args_normal: Type[argparse.Namespace],
+        fake_bin: Type[pathlib.Path],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the videos are transcoded locally, then removed."""
+        published = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            if method == "publish":
+                params = kwargs["json"]["params"]
+                published.append(params)
+                if params["file_path"].endswith("_fixed.mp4"):
+                    assert os.path.exists(params["file_path"])
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        args_normal.transcode = True
+        args_normal.transcode_workers = 2
+        uploader = Uploader(args_normal)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert uploader.transcode
+        assert "Uploaded 5 of 5 files, 0 failed." in captured.out
+        out_dir = os.path.join(uploader.state_dir, "transcoded")
+        file_paths = sorted(p["file_path"] for p in published)
+        # Only the videos are transcoded, and lbrynet does not optimize them
+        assert [os.path.dirname(p) for p in file_paths[:3]] == [out_dir] * 3
+        assert file_paths[3].endswith("3.mp3")
+        assert file_paths[4].endswith("4.opus")
+        assert not any(p.get("optimize_file") for p in published)
+        assert os.listdir(out_dir) == []
+        assert uploader.transcoder.budget.used == 0
+
+    @pytest.mark.parametrize("use_async", (False, True))
+    def test_upload_all_thumbnail_cache(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_response_good: None,
+        mock_response_async: None,
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+        use_async: bool,
+    ) -> None:
+        """Test that identical thumbnails are uploaded once across runs."""
+        n_uploads = []
+        post_thumbnail = Uploader._post_thumbnail
+        post_thumbnail_async = Uploader._post_thumbnail_async
+
+        def mock_post_thumbnail(self, t_name, t_path):
+            n_uploads.append(t_path)
+            return post_thumbnail(self, t_name, t_path)
+
+        async def mock_post_thumbnail_async(self, t_name, t_path):
+            n_uploads.append(t_path)
+            return await post_thumbnail_async(self, t_name, t_path)
+
+        monkeypatch.setattr(Uploader, "_post_thumbnail", mock_post_thumbnail)
+        monkeypatch.setattr(
+            Uploader, "_post_thumbnail_async", mock_post_thumbnail_async
+        )
+        args_normal_no_optimize.thumbnail_cache = True
+        args_normal_no_optimize.use_async = use_async
+        # The async pacing sleeps on the event loop, which mock_time does not patch
+        args_normal_no_optimize.rate = 1000.0
+        for _ in range(2):
+            uploader = Uploader(args_normal_no_optimize)
+            uploader.get_all_files()
+            uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        # The async mock fails to publish 1.mkv, never the thumbnails
+        n_failed = 1 if use_async else 0
+        summary = f"Uploaded {5 - n_failed} of 5 files, {n_failed} failed."
+        assert captured.out.count(summary) == 2
+        # The 5 thumbnails are all empty, i.e. the same content
+        assert len(n_uploads) == 1
+        urls = JsonStore(os.path.join(uploader.state_dir, "thumbnail_urls.json"))
+        assert len(urls) == 1
+
+    def test_upload_all_compress_thumbnails(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        fake_bin: Type[pathlib.Path],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the thumbnails are compressed before they are uploaded."""
+        thumbnails = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                thumbnails.append(kwargs["data"].read().split(b"\r\n")[-3])
+                return MockResponseThumbnail()
+            method = kwargs["json"]["method"]
+            if method == "version":
+                return MockResponseVersion()
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        base_path = pathlib.Path(args_normal_no_optimize.file_directory)
+        for idx in range(3):
+            (base_path / f"{idx}.{('gif', 'jpg', 'jpg')[idx]}").write_bytes(
+                b"a huge thumbnail %d" % idx
+            )
+        args_normal_no_optimize.compress_thumbnails = True
+        args_normal_no_optimize.thumbnail_format = "webp"
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert uploader.compress_thumbnails
+        assert "Uploaded 5 of 5 files, 0 failed." in captured.out
+        # The 2 empty thumbnails could not be shrunk, and are uploaded as is
+        assert sorted(thumbnails) == [b""] * 2 + [b"JPEG"] * 3
+        compressed = os.listdir(os.path.join(uploader.state_dir, "compressed"))
+        assert len([name for name in compressed if name.endswith(".webp")]) == 4
+        assert "libwebp" in (fake_bin / "ffmpeg.log").read_text()
+
+    def test_upload_all_speech_url(
+        self,
+        args_normal_no_optimize: Type[argparse.Namespace],
+        mock_time: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that the thumbnails are uploaded to the given spee.ch endpoint."""
+        urls = []
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                urls.append(url)
+                return MockResponseThumbnail()
+            if kwargs["json"]["method"] == "version":
+                return MockResponseVersion()
+            return MockResponseFile()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        speech_url = "http://localhost:3000/api/claim/publish"
+        args_normal_no_optimize.speech_url = speech_url
+        uploader = Uploader(args_normal_no_optimize)
+        uploader.get_all_files()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert "Uploaded 5 of 5 files, 0 failed." in captured.out
+        assert urls == [speech_url] * 5
+
+    @pytest.mark.skipif(
+        not sys.platform.startswith("linux"), reason="--watch needs inotify"
+    )
+    def test_upload_all_watch(
+        self,
+        args_watch: Type[argparse.Namespace],
+        mock_response_good: None,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that --watch uploads the existing files, then the new ones."""
+        uploader = Uploader(args_watch)
+        uploader.get_all_files()
+        assert len(uploader.files_valid) == 5
+
+        def drop_file() -> None:
+            base_path = pathlib.Path(uploader.base_path)
+            (base_path / "new.mp4").write_bytes(b"new")
+            (base_path / "new.txt").write_text("A new file")
+            deadline = time.monotonic() + 10
+            while "new.mp4" not in uploader.claim_ids:
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            uploader.watcher.close()
+
+        encoder = threading.Thread(target=drop_file)
+        encoder.start()
+        uploader.upload_all_files()
+        encoder.join()
+        captured = capsys.readouterr()
+
+        assert len(uploader.claim_ids) == 6
+        assert uploader.files_valid["new"]["desc_name"] == "new.txt"
+        assert "Uploaded 6 of 6 files, 0 failed." in captured.out
+
+    @pytest.mark.skipif(
+        not sys.platform.startswith("linux"), reason="--watch needs inotify"
+    )
+    def test_upload_all_watch_check_names(
+        self,
+        args_watch: Type[argparse.Namespace],
+        mock_response_resolve: list,
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that --check-names resolves the new files while watching."""
+        args_watch.check_names = "report"
+        uploader = Uploader(args_watch)
+        uploader.get_all_files()
+
+        def drop_file() -> None:
+            # Once the existing files have been resolved
+            deadline = time.monotonic() + 10
+            while not mock_response_resolve and time.monotonic() < deadline:
+                time.sleep(0.05)
+            base_path = pathlib.Path(uploader.base_path)
+            (base_path / "new.mp4").write_bytes(b"new")
+            while "new.mp4" not in uploader.claim_ids:
+                if time.monotonic() > deadline:
+                    break
+                time.sleep(0.05)
+            uploader.watcher.close()
+
+        encoder = threading.Thread(target=drop_file)
+        encoder.start()
+        uploader.upload_all_files()
+        encoder.join()
+        captured = capsys.readouterr()
+
+        # The new file is resolved on its own, without waiting for a full batch
+        assert "new.mp4" in uploader.claim_ids
+        assert ["lbry://@batch-upload-testing/new"] in mock_response_resolve
+        assert set(uploader.collisions.keys()) == {"1.mkv"}
+        assert "Uploaded 5 of 6 files, 0 failed." in captured.out
+
+    @pytest.mark.skipif(
+        not sys.platform.startswith("linux"), reason="--watch needs inotify"
+    )
+    def test_upload_all_watch_interrupt(
+        self,
+        args_watch: Type[argparse.Namespace],
+        mock_response_good: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that Ctrl-C stops watching and prints the summary."""
+
+        def interrupt(*args, **kwargs):
+            raise KeyboardInterrupt
+
+        uploader = Uploader(args_watch)
+        uploader.get_all_files()
+        monkeypatch.setattr(uploader, "_upload_all_files_threaded", interrupt)
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert f"Stopped watching {uploader.base_path}" in captured.out
+        assert "Uploaded 0 of 0 files, 0 failed." in captured.out
+        assert uploader.watcher._closed.is_set()
+
+    @pytest.mark.skipif(
+        not sys.platform.startswith("linux"), reason="--watch needs inotify"
+    )
+    def test_upload_all_watch_interrupt_drain(
+        self,
+        args_watch: Type[argparse.Namespace],
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that Ctrl-C still records the file being published."""
+        publishing = threading.Event()
+
+        def mock_post(session, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail()
+            if kwargs["json"]["method"] == "version":
+                return MockResponseVersion()
+            publishing.set()
+            # Still publishing when Ctrl-C is pressed
+            assert uploader.watcher._closed.wait(5)
+            return MockResponseFile()
+
+        def interrupt() -> None:
+            publishing.wait(5)
+            _thread.interrupt_main()
+
+        monkeypatch.setattr(requests.Session, "post", mock_post)
+        uploader = Uploader(args_watch)
+        uploader.get_all_files()
+        threading.Thread(target=interrupt).start()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert "press Ctrl-C again to abort" in captured.out
+        assert f"Stopped watching {uploader.base_path}" in captured.out
+        # The files taken before Ctrl-C are published, and in the journal
+        assert uploader.claim_ids
+        assert not uploader.failures
+        journal = UploadJournal(uploader.journal.path).load()
+        assert set(journal) == set(uploader.claim_ids)
+
+    def test_upload_all_watch_interrupt_drain_async(
+        self,
+        args_watch: Type[argparse.Namespace],
+        mock_response_good: None,
+        monkeypatch: Type[pytest.MonkeyPatch],
+        capsys: Type[pytest.CaptureFixture],
+    ) -> None:
+        """Test that Ctrl-C does not cancel the coroutines being published."""
+        publishing = threading.Event()
+
+        async def mock_post(client, url, **kwargs):
+            if "json" not in kwargs:
+                return MockResponseThumbnail.json()
+            publishing.set()
+            # Still publishing when Ctrl-C is pressed
+            while not uploader.watcher._closed.is_set():
+                await asyncio.sleep(0.01)
+            return MockResponseFile.json()
+
+        def interrupt() -> None:
+            publishing.wait(5)
+            _thread.interrupt_main()
+
+        monkeypatch.setattr(AsyncHttpClient, "post", mock_post)
+        args_watch.use_async = True
+        uploader = Uploader(args_watch)
+        uploader.get_all_files()
+        threading.Thread(target=interrupt).start()
+        uploader.upload_all_files()
+        captured = capsys.readouterr()
+
+        assert "press Ctrl-C again to abort" in captured.out
+        assert f"Stopped watching {uploader.base_path}" in captured.out
+        # The files taken before Ctrl-C are published, and in the journal
+        assert uploader.claim_ids
+        assert not uploader.failures
+        journal = UploadJournal(uploader.journal.path).load()
+        assert set(journal) == set(uploader.claim_ids)
@@ -0,0 +1,169 @@
+import pytest
+import os
+import pathlib
+import sys
+import threading
+import time
+from lbry_batch_uploader.scanner import classify_name
+from lbry_batch_uploader.watcher import DirectoryWatcher, Inotify, IN_CREATE
+from typing import Iterator, Type
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is only available on Linux"
+)
+
+
+def age(path: pathlib.Path, seconds: float = 60) -> None:
+    """Set the mtime of the file to 'seconds' ago."""
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def watcher(tmp_path: Type[pathlib.Path]) -> Iterator[DirectoryWatcher]:
+    """Return a DirectoryWatcher with a short settle time, closed after 10s."""
+    watcher = DirectoryWatcher(str(tmp_path), settle=0.2)
+    # Never hang the test suite, even if a file never settles
+    timer = threading.Timer(10, watcher.close)
+    timer.start()
+    yield watcher
+    timer.cancel()
+    watcher.close()
+
+
+class TestClassifyName:
+    """Testing the classify_name function."""
+
+    def test_classify(self) -> None:
+        """Test the stem, kind and priority of a single name."""
+        assert classify_name("a.b.MP4") == ("a.b", "file_name", 0)
+        assert classify_name("a.description") == ("a", "desc_name", 1)
+        assert classify_name("a.png") == ("a", "thumbnail_name", 2)
+        assert classify_name("a.mov") is None
+        assert classify_name("mp4") is None
+
+
+class TestInotify:
+    """Testing the Inotify class."""
+
+    def test_read_events(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the name of a created file is reported."""
+        inotify = Inotify()
+        try:
+            inotify.add_watch(str(tmp_path), IN_CREATE)
+            assert inotify.read_events(0) == []
+            (tmp_path / "a.mp4").touch()
+            events = inotify.read_events(1)
+            assert [(e[1] & IN_CREATE, e[3]) for e in events] == [(IN_CREATE, "a.mp4")]
+        finally:
+            inotify.close()
+
+    def test_missing_path(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that watching a missing directory raises FileNotFoundError."""
+        inotify = Inotify()
+        try:
+            with pytest.raises(FileNotFoundError):
+                inotify.add_watch(str(tmp_path / "missing"), IN_CREATE)
+        finally:
+            inotify.close()
+
+
+class TestDirectoryWatcher:
+    """Testing the DirectoryWatcher class."""
+
+    def test_wrong_settle(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that a negative settle time raises ValueError."""
+        with pytest.raises(ValueError):
+            DirectoryWatcher(str(tmp_path), settle=-1)
+
+    def test_not_started(self, watcher: DirectoryWatcher) -> None:
+        """Test that iterating before start raises RuntimeError."""
+        with pytest.raises(RuntimeError):
+            next(iter(watcher))
+
+    def test_start(
+        self, tmp_path: Type[pathlib.Path], watcher: DirectoryWatcher
+    ) -> None:
+        """Test that only the existing files that have settled are returned."""
+        for name in ("old.mp4", "old.txt", "new.mkv", ".hidden.mp4"):
+            (tmp_path / name).touch()
+            if name != "new.mkv":
+                age(tmp_path / name)
+
+        files_ready = watcher.start()
+        assert files_ready == {
+            "old": {
+                "file_name": "old.mp4",
+                "desc_name": "old.txt",
+                "thumbnail_name": "",
+            }
+        }
+        # The recent file is yielded once it has settled
+        assert next(iter(watcher))[0] == "new"
+
+    def test_new_files(
+        self, tmp_path: Type[pathlib.Path], watcher: DirectoryWatcher
+    ) -> None:
+        """Test that a new file is yielded with its sidecars once settled."""
+        assert watcher.start() == {}
+        files = iter(watcher)
+
+        def write() -> None:
+            with open(tmp_path / "a.mp4", "wb") as f:
+                for _ in range(3):
+                    f.write(b"x" * 1024)
+                    f.flush()
+                    time.sleep(0.05)
+            (tmp_path / "a.png").touch()
+            (tmp_path / "a.mov").touch()
+
+        writer = threading.Thread(target=write)
+        started = time.monotonic()
+        writer.start()
+        name_no_ext, params = next(files)
+        writer.join()
+
+        assert time.monotonic() - started >= 0.2
+        assert name_no_ext == "a"
+        assert params == {
+            "file_name": "a.mp4",
+            "desc_name": "",
+            "thumbnail_name": "a.png",
+        }
+        assert os.path.getsize(tmp_path / "a.mp4") == 3 * 1024
+
+    def test_each_file_once(
+        self, tmp_path: Type[pathlib.Path], watcher: DirectoryWatcher
+    ) -> None:
+        """Test that a file is yielded once, unless it is deleted and replaced."""
+        watcher.start()
+        files = iter(watcher)
+        (tmp_path / "a.mp4").touch()
+        assert next(files)[0] == "a"
+
+        (tmp_path / "a.mp4").write_bytes(b"changed")
+        (tmp_path / "b.mp4").touch()
+        assert next(files)[0] == "b"
+
+        (tmp_path / "a.mp4").unlink()
+        (tmp_path / "a.mp4").touch()
+        assert next(files)[0] == "a"
+
+    def test_close(
+        self, tmp_path: Type[pathlib.Path], watcher: DirectoryWatcher
+    ) -> None:
+        """Test that closing the watcher ends the iteration."""
+        watcher.start()
+        threading.Timer(0.1, watcher.close).start()
+        assert list(watcher) == []
+        assert watcher._inotify is not None
+        assert watcher._inotify.fd == -1
+
+    def test_directory_removed(self, tmp_path: Type[pathlib.Path]) -> None:
+        """Test that the iteration ends if the directory is removed."""
+        d = tmp_path / "watched"
+        d.mkdir()
+        watcher = DirectoryWatcher(str(d), settle=0.2)
+        watcher.start()
+        d.rmdir()
+        assert list(watcher) == []